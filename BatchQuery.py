@@ -0,0 +1,260 @@
+# Jennifer Pillow pillje@hotmail.com
+# Answers package status queries without the console menu: the delivery day is simulated once
+# and every query is answered from the recorded timeline, written as JSON Lines or CSV.
+#
+# Usage: python BatchQuery.py [--names "Distance Names.csv"] [--data "Distance Data.csv"]
+#                             [--packages "Package File.csv"] [--times 0900 1030] [--ids 1 2 3]
+#                             [--query-file queries.csv] [--format jsonl|csv] [--output results]
+#                             [--improve]
+#
+# A query file is CSV with a time and an optional package ID per row (an optional header row is
+# skipped); a row without a package ID asks for every package.
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import Main
+from DistanceGraph import Graph
+from HashTable import HashTable
+from Package import STATUS_NAMES, SECONDS_PER_DAY, format_time, parse_clock
+from Timeline import DeliveryTimeline
+from Truck import Truck
+
+RESULT_FIELDS = ("time", "package_id", "status", "truck", "delivery_time", "deadline", "late", "total_miles",
+                 "error")
+
+
+class DeliveryDay:
+    """
+    A class that holds one simulated delivery day and answers status queries about it.
+
+    Attributes
+    ----------
+    table : HashTable
+        the packages of the day
+    trucks : list
+        the trucks
+    timeline : DeliveryTimeline
+        the recorded day
+    end_time : int
+        the time the last route was completed
+    report : IngestReport
+        the report of loading the package file
+
+    Methods
+    --------
+    answer(query_time, package_id)
+        Returns the result row of a status query.
+    """
+
+    def __init__(self, dist_name_file=Main.DIST_NAME_FILE, dist_data_file=Main.DIST_DATA_FILE,
+                 package_file=Main.PACKAGE_FILE, improve=False):
+        """
+        Constructor for the DeliveryDay class.  Builds the graph, loads the packages and
+        simulates the whole day, on the fleet and start times of the shipped day.
+
+        :param dist_name_file: optional path of the CSV file of location names and addresses
+        :type dist_name_file: str
+        :param dist_data_file: optional path of the CSV file of lower-triangular distance data
+        :type dist_data_file: str
+        :param package_file: optional path of the package CSV file
+        :type package_file: str
+        :param improve: optional, shorten the greedy routes with local search (default False)
+        :type improve: bool
+        """
+        graph = Graph(compact=True)
+        Main.build_graph(graph, dist_name_file, dist_data_file)
+        self.table = HashTable()
+        self.report = Main.load_packages(self.table, graph, package_file)
+        self.trucks = [Truck(1), Truck(2), Truck(3)]
+        self.timeline = DeliveryTimeline()
+        ready_times = [Main.start_time if i < Main.NUM_DRIVERS else Main.LATE_TRUCK_TIME
+                       for i in range(len(self.trucks))]
+        self.end_time = Main.simulate_day(graph, list(self.table), self.trucks, ready_times, Main.NUM_DRIVERS,
+                                          Main.TRUCK_SPEED, SECONDS_PER_DAY, self.timeline, improve)
+
+    def answer(self, query_time, package_id):
+        """
+        Returns the result row of a status query: the status of the package at the time, the
+        truck carrying or having delivered it, its delivery time and the miles all trucks have
+        driven by then.  An unknown package ID gets an error in the row.
+
+        :param query_time: the time in seconds after midnight
+        :type query_time: int
+        :param package_id: the package ID
+        :type package_id: int
+        :return: a dictionary of RESULT_FIELDS -> value
+        :rtype: dict
+        """
+        row = dict.fromkeys(RESULT_FIELDS)
+        row.update(time=format_time(query_time), package_id=package_id)
+        package = self.table.search(package_id)
+        if package is None:
+            row["error"] = "unknown package ID"
+            return row
+        status_code, truck_id, delivery_time = self.timeline.status_code_at(package_id, query_time)
+        row.update(status=STATUS_NAMES[status_code], truck=truck_id or None, deadline=package.deadline,
+                   total_miles=round(self.timeline.total_mileage_at(query_time), 1))
+        if delivery_time >= 0:
+            row.update(delivery_time=format_time(delivery_time),
+                       late=delivery_time > package.deadline_time)
+        return row
+
+
+def parse_query_time(text):
+    """
+    Converts a time of day written as HHMM, HH:MM or HH:MM:SS to seconds after midnight.  Only
+    times on the day itself, before 24:00, are accepted.
+
+    :param text: the time
+    :type text: str
+    :return: the time in seconds after midnight
+    :rtype: int
+    :raises ValueError: if the time is not in one of the formats or not on the day
+    """
+    query_time = parse_clock(text)
+    if query_time >= SECONDS_PER_DAY:
+        raise ValueError("invalid time: " + repr(text))
+    return query_time
+
+
+def read_query_file(query_file):
+    """
+    Reads the queries of a CSV query file, one time and optional package ID per row.  A first
+    row whose time is not a valid time is taken as a header and skipped.
+
+    :param query_file: path of the query file
+    :type query_file: str
+    :return: a generator of (time text, package ID text) pairs, the ID "" for every package
+    :rtype: generator
+    """
+    with open(query_file, 'r', newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            if reader.line_num == 1:
+                try:
+                    parse_query_time(row[0])
+                except ValueError:
+                    continue
+            yield row[0], row[1].strip() if len(row) > 1 else ""
+
+
+def answer_queries(day, queries):
+    """
+    Answers status queries about a simulated day.  A query without a package ID is answered for
+    every package; a query with an invalid time or package ID gets one row with its error.
+
+    :param day: the simulated day
+    :type day: DeliveryDay
+    :param queries: (time text, package ID text) pairs
+    :type queries: iterable
+    :return: a generator of result rows, dictionaries of RESULT_FIELDS -> value
+    :rtype: generator
+    """
+    all_ids = sorted(package.package_id for package in day.table)
+    times = {}     # time text -> seconds after midnight, as the same times are usually asked about many packages
+    for time_text, id_text in queries:
+        query_time = times.get(time_text)
+        if query_time is None:
+            try:
+                query_time = times[time_text] = parse_query_time(time_text)
+            except ValueError as error:
+                yield _error_row(time_text, id_text, str(error))
+                continue
+        if not id_text:
+            for package_id in all_ids:
+                yield day.answer(query_time, package_id)
+        elif id_text.isdigit():
+            yield day.answer(query_time, int(id_text))
+        else:
+            yield _error_row(time_text, id_text, "invalid package ID: " + repr(id_text))
+
+
+def write_jsonl(rows, output):
+    """
+    Writes result rows as JSON Lines, one object per row.
+
+    :param rows: the result rows
+    :type rows: iterable
+    :param output: a text file opened for writing
+    :type output: file
+    :return: the number of rows written
+    :rtype: int
+    """
+    count = 0
+    for row in rows:
+        output.write(json.dumps(row) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(rows, output):
+    """
+    Writes result rows as CSV with a header row.
+
+    :param rows: the result rows
+    :type rows: iterable
+    :param output: a text file opened for writing
+    :type output: file
+    :return: the number of rows written
+    :rtype: int
+    """
+    writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _error_row(time_text, id_text, error):
+    """
+    Returns the result row of a query that cannot be answered.
+    """
+    row = dict.fromkeys(RESULT_FIELDS)
+    row.update(time=time_text, package_id=id_text or None, error=error)
+    return row
+
+
+def main(argv=None):
+    """
+    Simulates the day once, answers the queries from the command line and the query file, and
+    writes the results.
+    """
+    parser = argparse.ArgumentParser(description="Answer package status queries for the delivery day.")
+    parser.add_argument("--names", default=Main.DIST_NAME_FILE, help="CSV file of location names and addresses")
+    parser.add_argument("--data", default=Main.DIST_DATA_FILE, help="CSV file of lower-triangular distances")
+    parser.add_argument("--packages", default=Main.PACKAGE_FILE, help="package CSV file")
+    parser.add_argument("--times", nargs="+", default=[], help="query times, HHMM or HH:MM[:SS]")
+    parser.add_argument("--ids", nargs="+", default=[], help="package IDs to query at each time (default: all)")
+    parser.add_argument("--query-file", default=None, help="CSV file of time, package ID queries")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="output format")
+    parser.add_argument("--output", default=None, help="output file (default: stdout)")
+    parser.add_argument("--improve", action="store_true", help="shorten routes with local search")
+    args = parser.parse_args(argv)
+    if not args.times and args.query_file is None:
+        parser.error("give query --times or a --query-file")
+
+    queries = [(time_text, id_text) for time_text in args.times for id_text in (args.ids or [""])]
+    day = DeliveryDay(args.names, args.data, args.packages, args.improve)
+    if day.report.rejected:
+        print("{}: {} rows rejected".format(args.packages, day.report.rejected), file=sys.stderr)
+    if args.query_file is not None:
+        queries = itertools.chain(queries, read_query_file(args.query_file))
+
+    write = write_csv if args.format == "csv" else write_jsonl
+    rows = answer_queries(day, queries)
+    if args.output is None:
+        write(rows, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            write(rows, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from DistanceGraph import Location
+from DistanceMatrix import DistanceMatrix, MatrixRows
+
+# File layout, all integers little-endian:
+#   magic (8 bytes) | version, byte order, location count, table length (4 x uint32) | key (32 bytes)
+#   location table as UTF-8 JSON, zero-padded to a multiple of 8 bytes
+#   route distances: packed lower triangle, n * (n + 1) / 2 doubles
+#   shortest distances: n * n doubles, row by row
+CACHE_MAGIC = b"DDMATRIX"
+CACHE_VERSION = 1
+CACHE_PREFIX = "distances-"     # cache files are named CACHE_PREFIX + 12 hex digits of the key + ".bin"
+_HEADER = struct.Struct("<8s4I32s")
+_LITTLE_ENDIAN = 1 if sys.byteorder == "little" else 0
+
+
+def cache_key(*file_paths):
+    """
+    Returns a SHA-256 content hash of the files and the cache format version.  The cache is only
+    used when the key stored in it matches, so editing either CSV file rebuilds the cache.
+
+    :param file_paths: paths of the files the cached data is computed from
+    :type file_paths: str
+    :return: the 32 byte hash
+    :rtype: bytes
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for file_path in file_paths:
+        with open(file_path, 'rb') as source:
+            content = source.read()
+        digest.update(struct.pack("<Q", len(content)))
+        digest.update(content)
+    return digest.digest()
+
+
+def cache_path(key, directory="."):
+    """
+    Returns the path of the cache file for a key.  The name holds the first 12 hex digits of the
+    key, so each set of input files, and each cache format version, has its own cache file.
+
+    :param key: the content hash of the files the cached data is computed from
+    :type key: bytes
+    :param directory: optional directory of the cache file (default the working directory)
+    :type directory: str
+    :return: the path of the cache file
+    :rtype: str
+    """
+    return os.path.join(directory, CACHE_PREFIX + key.hex()[:12] + ".bin")
+
+
+def save_cache(cache_file, key, graph):
+    """
+    Writes the locations, route distances and shortest distances of the graph to a binary cache
+    file.  The file is written under a temporary name and renamed, so readers never see a
+    partially written cache.
+
+    :param cache_file: path of the cache file
+    :type cache_file: str
+    :param key: the content hash of the files the graph was built from
+    :type key: bytes
+    :param graph: a graph with its shortest distances computed
+    :type graph: Graph
+    """
+    locations = graph.get_locations()
+    size = len(locations)
+    table = json.dumps([[loc.name, loc.address, loc.zipcode] for loc in locations]).encode("utf-8")
+    table += b"\0" * (-len(table) % 8)    # keep the matrices 8-byte aligned for the memoryview
+
+    if graph.compact:
+        route_data = array('d', graph.distance.data)
+    else:
+        rows = graph.edge_matrix()
+        route_data = array('d', [rows[i][j] for i in range(size) for j in range(i + 1)])
+
+    temp_file = cache_file + ".tmp"
+    with open(temp_file, 'wb') as cache:
+        cache.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, _LITTLE_ENDIAN, size, len(table), key))
+        cache.write(table)
+        route_data.tofile(cache)
+        for i in range(size):
+            array('d', graph.shortest[i]).tofile(cache)
+    os.replace(temp_file, cache_file)
+
+
+def load_cache(cache_file, key, graph):
+    """
+    Loads the locations and distances from a binary cache file into an empty graph, if the cache
+    exists and was built from files with the same content hash.
+
+    The distance matrices are not read into memory: the file is memory-mapped read-only and the
+    graph's distance store and shortest distance matrix are views of the mapped pages, which the
+    operating system shares between all processes that load the same cache.
+
+    :param cache_file: path of the cache file
+    :type cache_file: str
+    :param key: the content hash of the files the graph should be built from
+    :type key: bytes
+    :param graph: an empty graph to load the cached locations and distances into
+    :type graph: Graph
+    :return: the cache was valid and has been loaded
+    :rtype: bool
+    """
+    try:
+        with open(cache_file, 'rb') as cache:
+            mapped = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):   # missing or empty file
+        return False
+
+    try:
+        if len(mapped) < _HEADER.size:
+            raise ValueError("cache file too short")
+        magic, version, byte_order, size, table_len, stored_key = _HEADER.unpack_from(mapped)
+        route_start = _HEADER.size + table_len
+        shortest_start = route_start + 8 * (size * (size + 1) // 2)
+        if (magic != CACHE_MAGIC or version != CACHE_VERSION or byte_order != _LITTLE_ENDIAN
+                or stored_key != key or len(mapped) != shortest_start + 8 * size * size):
+            raise ValueError("cache file does not match")
+        table = json.loads(mapped[_HEADER.size:route_start].rstrip(b"\0").decode("utf-8"))
+    except ValueError:      # invalid or stale cache, including a corrupt location table
+        mapped.close()
+        return False
+
+    doubles = memoryview(mapped)
+    graph.compact = True
+    graph.distance = DistanceMatrix.from_buffer(doubles[route_start:shortest_start].cast('d'), size)
+    graph.shortest = MatrixRows(doubles[shortest_start:].cast('d'), size)
+    for name, address, zipcode in table:
+        graph.add_location(Location(name, address, zipcode))
+    return True
@@ -1,5 +1,17 @@
 # Jennifer Pillow pillje@hotmail.com
 
+import heapq
+from array import array
+from DistanceMatrix import DistanceMatrix, DistanceRows, MatrixRows
+from NeighborIndex import NeighborIndex
+from Profiler import profiled
+
+try:
+    import numpy
+except ImportError:     # NumPy is optional, the all-pairs engine falls back to pure Python
+    numpy = None
+
+
 class Location:
     """
     A class used to represent delivery locations as graph vertices.
@@ -16,6 +28,8 @@ class Location:
         the distance to the start location (for use with shortest path algorithm)
     pred_loc : Location
         a pointer to previous location (for graph travelling algorithm)
+    loc_id : int
+        the integer ID of the location in its graph, used to index distance matrices (-1 until added)
 
     Methods
     --------
@@ -39,6 +53,7 @@ class Location:
         self.zipcode = zipcode
         self.distance = float("inf")    # distance to start location
         self.pred_loc = None
+        self.loc_id = -1
 
     def __repr__(self):
         """
@@ -50,6 +65,19 @@ class Location:
         return "{}".format(self.address)
 
 
+def normalize_address(address):
+    """
+    Returns the street address in the form used as the key of the graph's address index:
+    lowercase, with surrounding whitespace removed and inner whitespace collapsed to single spaces.
+
+    :param address: the street address to normalize
+    :type address: str
+    :return: the normalized street address
+    :rtype: str
+    """
+    return " ".join(address.split()).casefold()
+
+
 # Weighted graph of distances between delivery locations
 class Graph:
     """
@@ -58,9 +86,15 @@ class Graph:
     Attributes
     ----------
     adj_list : dict
-        a dictionary to hold the adjacency lists for each location
-    distance : dict
-        a dictionary that holds the distances for each pair of locations in the adjacency list
+        a dictionary to hold the adjacency lists for each location (empty lists for a compact graph)
+    distance : dict or DistanceMatrix
+        holds the distances for each pair of locations in the adjacency list
+    compact : bool
+        the distances are kept in a DistanceMatrix and every pair of locations is adjacent
+    shortest : MatrixRows or list
+        the all-pairs shortest path matrix indexed by location ID, None until computed
+    address_index : dict
+        a dictionary of locations keyed by normalized street address
 
     Methods
     ---------
@@ -72,23 +106,51 @@ class Graph:
         Displays a formatted list of all routes in the graph and their distances.
     search_location(address)
         Searches the list of locations by address
+    neighbors(location)
+        Returns the locations with a direct route from the location
+    get_distance(location1, location2)
+        Returns the shortest known distance between two locations
+    get_locations()
+        Returns the locations in order of location ID
+    edge_matrix()
+        Returns the direct route distances as a dense matrix indexed by location ID
+    neighbor_index()
+        Returns the sorted nearest-location lists of the distances
     """
 
-    def __init__(self):
+    def __init__(self, compact=False):
         """
         Constructor for the Graph class.
+
+        A compact graph keeps its distances in a DistanceMatrix instead of a dictionary keyed by
+        pairs of locations, and does not keep adjacency lists.  For a complete graph it uses over
+        twenty times less memory (see benchmarks/distance_memory.py).
+
+        :param compact: optional, store the distances in a DistanceMatrix (default False)
+        :type compact: bool
         """
         self.adj_list = {}
-        self.distance = {}
+        self.compact = compact
+        self.distance = DistanceMatrix() if compact else {}
+        self.shortest = None
+        self.address_index = {}
+        self._neighbor_index = None
+        self._neighbor_source = None    # the matrix or distances the neighbor index was built from
 
     def add_location(self, new_location):
         """
-        Adds a new location to the adjacency list
+        Adds a new location to the adjacency list and the address index, and assigns it the next
+        location ID.
 
         :param new_location: the location to add to the adjacency list
         :type new_location: Location
         """
+        new_location.loc_id = len(self.adj_list)
+        self._neighbor_index = None
         self.adj_list[new_location] = []
+        if self.compact and len(self.distance) <= new_location.loc_id:
+            self.distance.add_location()
+        self.address_index[normalize_address(new_location.address)] = new_location
 
     def add_distance(self, location1, location2, distance):
         """
@@ -101,6 +163,11 @@ class Graph:
         :param distance: the distance between the two locations
         :type distance: float
         """
+        self._neighbor_index = None
+        if self.compact:
+            self.distance[(location1, location2)] = distance   # one entry serves both directions
+            return
+
         # Add distance from location1 to location2
         self.distance[(location1, location2)] = distance
         self.adj_list[location1].append(location2)
@@ -113,30 +180,121 @@ class Graph:
         """
         Displays a formatted list of all routes in the graph and their distances.
         """
+        if self.compact:
+            for location1 in self.adj_list:
+                for location2 in self.neighbors(location1):
+                    print(location1, '->', location2, ' distance: ', self.distance[(location1, location2)])
+            return
         for route in self.distance:
             dist = self.distance[(route[0], route[1])]
             print(route[0], '->', route[1], ' distance: ', dist)
 
     def search_location(self, address):
         """
-        Searches the list of locations by address, returns a None-type object if not found
+        Searches the address index for a location, returns a None-type object if not found.
+        Addresses are matched ignoring case and extra whitespace.
 
         :param address: the address of the location to search for
         :type address: str
         :return: the location that corresponds to the address or a None-type object if not found
         :rtype: Location
         """
-        for location in self.adj_list:
-            if location.address == address:
-                return location
-        return None
+        return self.address_index.get(normalize_address(address))
+
+    def neighbors(self, location):
+        """
+        Returns the locations with a direct route from the location.  On a compact graph every
+        location may be adjacent, so this measures all of them in O(V); use neighbor_index() to
+        find the nearest locations instead.
+
+        :param location: the location at the start of the routes
+        :type location: Location
+        :return: the adjacent locations
+        :rtype: list
+        """
+        if self.compact:
+            return [adj_loc for adj_loc in self.adj_list
+                    if adj_loc is not location and self.distance[(location, adj_loc)] != float("inf")]
+        return self.adj_list[location]
+
+    def get_distance(self, location1, location2):
+        """
+        Returns the shortest known distance between two locations.  Uses the all-pairs shortest
+        path matrix once it has been computed, otherwise the direct route distance.
+
+        :param location1: the location at one end of the route
+        :type location1: Location
+        :param location2: the location at the other end of the route
+        :type location2: Location
+        :return: the distance between the two locations
+        :rtype: float
+        """
+        if self.shortest is not None:
+            return self.shortest[location1.loc_id][location2.loc_id]
+        if location1 is location2:
+            return 0.0
+        return self.distance[(location1, location2)]
+
+    def get_locations(self):
+        """
+        Returns the locations in order of location ID.
+
+        :return: the locations in the graph
+        :rtype: list
+        """
+        return list(self.adj_list)
+
+    def edge_matrix(self):
+        """
+        Returns the direct route distances as a dense matrix indexed by location ID.  Locations
+        without a direct route are infinitely far apart; each location is 0.0 from itself.
+
+        :return: a list of rows of route distances
+        :rtype: list
+        """
+        if self.compact:
+            return self.distance.to_rows()
+        size = len(self.adj_list)
+        matrix = [[float("inf")] * size for _ in range(size)]
+        for i in range(size):
+            matrix[i][i] = 0.0
+        for (location1, location2), dist in self.distance.items():
+            matrix[location1.loc_id][location2.loc_id] = dist
+        return matrix
+
+    def neighbor_index(self):
+        """
+        Returns the index of each location's nearest locations by the distances get_distance
+        uses: the shortest path matrix once it has been computed, otherwise the direct route
+        distances, read a row at a time from the DistanceMatrix of a compact graph.  The index is
+        built the first time it is needed, and again after the shortest path matrix is replaced
+        or a location or route is added.
+
+        :return: the neighbor index
+        :rtype: NeighborIndex
+        """
+        source = self.shortest if self.shortest is not None else self.distance
+        if self._neighbor_index is None or self._neighbor_source is not source:
+            if self.shortest is not None:
+                matrix = self.shortest
+            elif self.compact:
+                matrix = DistanceRows(self.distance)
+            else:
+                matrix = self.edge_matrix()
+            self._neighbor_index = NeighborIndex(self, matrix=matrix)
+            self._neighbor_source = source
+        return self._neighbor_index
 
 
+@profiled("dijkstra_shortest_path")
 def dijkstra_shortest_path(graph, start_loc):
     """
     Applies Dijkstra's shortest path algorithm to the graph, updates distance values
     if shorter path from the start location to a location  is found.
 
+    Keeps its working state on the locations and does not reset it, so it is only correct once per
+    graph; shortest_path runs the same search without changing the graph.
+
     :param graph: graph of the distances between locations
     :type graph: Graph
     :param start_loc: the location in the graph to start travelling the graph
@@ -159,7 +317,7 @@ def dijkstra_shortest_path(graph, start_loc):
         curr_loc = unvisited_queue.pop(sm_index)  # travel to shortest dist location
 
         # check path lengths at new location
-        for adj_loc in graph.adj_list[curr_loc]:
+        for adj_loc in graph.neighbors(curr_loc):
             dist = graph.distance[(curr_loc, adj_loc)]
             alt_path_dist = curr_loc.distance + dist
 
@@ -169,3 +327,214 @@ def dijkstra_shortest_path(graph, start_loc):
                 graph.distance[(adj_loc, start_loc)] = alt_path_dist  # update reverse values in distance graph
                 adj_loc.distance = alt_path_dist    # update distance to adjacent location
                 adj_loc.pred_loc = curr_loc         # update predecessor for adjacent location
+
+
+class ShortestPathResult:
+    """
+    A class used to hold the result of a single-source shortest path query.
+
+    Distances and predecessors are kept in arrays indexed by location ID, so the query does not
+    change the graph or its locations.
+
+    Attributes
+    ----------
+    start_loc : Location
+        the location the query started from
+    locations : list
+        the locations of the graph in order of location ID
+    dist : array
+        the shortest distance from the start location to each location, by location ID
+    pred : array
+        the location ID of the previous location on each shortest path, -1 if there is none
+    settled : bytearray
+        1 for each location whose shortest distance is final, 0 otherwise
+
+    Methods
+    --------
+    reached(location)
+        Returns whether the shortest distance to the location is known.
+    distance_to(location)
+        Returns the shortest distance from the start location to the location.
+    path_to(location)
+        Returns the list of locations on the shortest path from the start location to the location.
+    """
+
+    def __init__(self, start_loc, locations, dist, pred, settled):
+        """
+        Constructor for the ShortestPathResult class.
+
+        :param start_loc: the location the query started from
+        :type start_loc: Location
+        :param locations: the locations of the graph in order of location ID
+        :type locations: list
+        :param dist: the shortest distances by location ID
+        :type dist: array
+        :param pred: the predecessor location IDs by location ID
+        :type pred: array
+        :param settled: the settled flags by location ID
+        :type settled: bytearray
+        """
+        self.start_loc = start_loc
+        self.locations = locations
+        self.dist = dist
+        self.pred = pred
+        self.settled = settled
+
+    def reached(self, location):
+        """
+        Returns whether the shortest distance to the location is known.  Locations that cannot be
+        reached, or were not reached before an early exit, are not known.
+
+        :param location: the location to check
+        :type location: Location
+        :return: the shortest distance to the location is known
+        :rtype: bool
+        """
+        return self.settled[location.loc_id] == 1
+
+    def distance_to(self, location):
+        """
+        Returns the shortest distance from the start location to the location, infinity if the
+        location was not reached.
+
+        :param location: the location at the end of the path
+        :type location: Location
+        :return: the shortest distance to the location
+        :rtype: float
+        """
+        if not self.reached(location):
+            return float("inf")
+        return self.dist[location.loc_id]
+
+    def path_to(self, location):
+        """
+        Returns the list of locations on the shortest path from the start location to the location,
+        or an empty list if the location was not reached.
+
+        :param location: the location at the end of the path
+        :type location: Location
+        :return: the locations on the path, starting with the start location
+        :rtype: list
+        """
+        if not self.reached(location):
+            return []
+        path = []
+        loc_id = location.loc_id
+        while loc_id != -1:
+            path.append(self.locations[loc_id])
+            loc_id = self.pred[loc_id]
+        path.reverse()
+        return path
+
+
+@profiled("shortest_path")
+def shortest_path(graph, start_loc, targets=None):
+    """
+    Applies Dijkstra's shortest path algorithm from the start location using a binary heap, in
+    O(E log V) time.  Working state is kept in arrays owned by the returned result, so the graph and
+    its locations are never changed and queries can be repeated or run concurrently.
+
+    When targets are given the search stops as soon as the shortest distance to every target is
+    known, leaving more distant locations unreached.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location in the graph to start travelling the graph
+    :type start_loc: Location
+    :param targets: optional locations to stop the search at once all are reached
+    :type targets: iterable
+    :return: the shortest distances and paths from the start location
+    :rtype: ShortestPathResult
+    """
+    locations = graph.get_locations()
+    size = len(locations)
+    dist = array('d', [float("inf")]) * size
+    pred = array('i', [-1]) * size
+    settled = bytearray(size)
+    remaining = None
+    if targets is not None:
+        remaining = {target.loc_id for target in targets}
+
+    dist[start_loc.loc_id] = 0.0
+    heap = [(0.0, start_loc.loc_id)]
+    while heap:
+        curr_dist, curr_id = heapq.heappop(heap)
+        if settled[curr_id]:
+            continue    # stale heap entry, location already visited at a shorter distance
+        settled[curr_id] = 1
+        if remaining is not None:
+            remaining.discard(curr_id)
+            if not remaining:
+                break
+
+        curr_loc = locations[curr_id]
+        for adj_loc in graph.neighbors(curr_loc):
+            adj_id = adj_loc.loc_id
+            alt_path_dist = curr_dist + graph.distance[(curr_loc, adj_loc)]
+            if alt_path_dist < dist[adj_id]:
+                dist[adj_id] = alt_path_dist
+                pred[adj_id] = curr_id
+                heapq.heappush(heap, (alt_path_dist, adj_id))
+
+    return ShortestPathResult(start_loc, locations, dist, pred, settled)
+
+
+@profiled("all_pairs_shortest_path")
+def all_pairs_shortest_path(graph):
+    """
+    Computes the shortest distance between every pair of locations as a dense matrix indexed by
+    location ID.  Does not change the graph or its locations.
+
+    Uses the Floyd-Warshall algorithm on a NumPy array, in O(n^3) time and a single pass over
+    the via-locations.  Paths are summed in a different order than Dijkstra's algorithm, so a
+    distance can differ from dijkstra_shortest_path in its last bits.  Falls back to a dense
+    pure Python Dijkstra from each location when NumPy is not installed.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :return: the rows of the matrix, shortest[i][j] is the shortest distance from location i to
+        location j: a MatrixRows view of a NumPy array, or a list of lists without NumPy
+    :rtype: MatrixRows or list
+    """
+    edges = graph.edge_matrix()
+    if numpy is not None:
+        return _floyd_warshall_numpy(edges)
+    return _dense_dijkstra(edges)
+
+
+def _dense_dijkstra(edges):
+    """
+    Pure Python fallback used by all_pairs_shortest_path.  Runs Dijkstra's algorithm from each
+    location over the dense matrix, relaxing a whole row of distances at a time.
+    """
+    size = len(edges)
+    shortest = []
+    for start in range(size):
+        dist = edges[start][:]
+        unvisited = set(range(size))
+        unvisited.discard(start)
+        while unvisited:
+            curr = min(unvisited, key=dist.__getitem__)
+            unvisited.discard(curr)
+            dist_curr = dist[curr]
+            if dist_curr == float("inf"):
+                break
+            dist = list(map(min, dist, [dist_curr + d for d in edges[curr]]))
+        shortest.append(dist)
+    return shortest
+
+
+def _floyd_warshall_numpy(edges):
+    """
+    NumPy Floyd-Warshall used by all_pairs_shortest_path.  Each step relaxes the paths through
+    one via-location for all pairs of locations with a single vectorized operation, so one pass
+    over the via-locations gives every shortest distance.  Returns a view of the array as rows,
+    the same shape as the matrix of a loaded distance cache.
+    """
+    shortest = numpy.array(edges, dtype=numpy.float64)
+    size = len(shortest)
+    through = numpy.empty_like(shortest)    # the distances of the paths through via, reused
+    for via in range(size):
+        numpy.add(shortest[:, via, None], shortest[via], out=through)
+        numpy.minimum(shortest, through, out=shortest)
+    return MatrixRows(memoryview(shortest.reshape(-1)), size)
@@ -0,0 +1,303 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import csv
+from array import array
+
+
+class DistanceMatrix:
+    """
+    A class for storing the distances between locations as a compact, symmetric matrix.
+
+    Only the lower triangle (including the diagonal) is kept, packed row by row in a single
+    array of doubles, the same layout as the Distance Data file.  Row i starts at index
+    i * (i + 1) / 2, so a lookup is a constant time index calculation.  Pairs without a
+    distance are infinitely far apart and every location is 0.0 from itself.
+
+    Can be used in place of the distance dictionary of a Graph: distances are read and written
+    by (Location, Location) keys, using the location IDs as matrix indexes.
+
+    Attributes
+    ----------
+    size : int
+        the number of locations in the matrix
+    data : array
+        the packed lower triangle of distances
+
+    Methods
+    --------
+    add_location()
+        Adds a row and column for a new location.
+    dist(i, j)
+        Returns the distance between the locations with IDs i and j.
+    set_dist(i, j, distance)
+        Sets the distance between the locations with IDs i and j.
+    read_csv(dist_data_file)
+        Fills the matrix from a lower-triangular distance CSV file.
+    row(i)
+        Returns the distances from the location with ID i to every location.
+    to_rows()
+        Returns the matrix as a dense list of rows.
+    """
+
+    def __init__(self, size=0):
+        """
+        Constructor for the DistanceMatrix class.
+
+        :param size: optional number of locations to make room for (default 0)
+        :type size: int
+        """
+        self.size = 0
+        self.data = array('d')
+        for _ in range(size):
+            self.add_location()
+
+    @classmethod
+    def from_buffer(cls, buffer, size):
+        """
+        Creates a matrix that reads its packed lower triangle from an existing buffer of doubles,
+        such as a memory-mapped file, without copying it.  Locations cannot be added to it.
+
+        :param buffer: the packed lower triangle, size * (size + 1) / 2 doubles
+        :type buffer: memoryview
+        :param size: the number of locations in the matrix
+        :type size: int
+        :return: a matrix backed by the buffer
+        :rtype: DistanceMatrix
+        """
+        matrix = cls()
+        matrix.size = size
+        matrix.data = buffer
+        return matrix
+
+    def __len__(self):
+        """
+        Returns the number of locations in the matrix.
+
+        :return: the number of locations in the matrix
+        :rtype: int
+        """
+        return self.size
+
+    def __getitem__(self, key):
+        """
+        Returns the distance between a pair of locations.
+
+        :param key: the pair of locations
+        :type key: tuple
+        :return: the distance between the locations
+        :rtype: float
+        """
+        return self.dist(key[0].loc_id, key[1].loc_id)
+
+    def __setitem__(self, key, distance):
+        """
+        Sets the distance between a pair of locations, in both directions.
+
+        :param key: the pair of locations
+        :type key: tuple
+        :param distance: the distance between the locations
+        :type distance: float
+        """
+        self.set_dist(key[0].loc_id, key[1].loc_id, distance)
+
+    def add_location(self):
+        """
+        Adds a row and column for a new location, with no distances to the other locations.
+
+        :return: the index of the new location
+        :rtype: int
+        """
+        new_index = self.size
+        self.data.extend(array('d', [float("inf")]) * new_index)
+        self.data.append(0.0)
+        self.size += 1
+        return new_index
+
+    def dist(self, i, j):
+        """
+        Returns the distance between the locations with IDs i and j.
+
+        :param i: the ID of the location at one end of the route
+        :type i: int
+        :param j: the ID of the location at the other end of the route
+        :type j: int
+        :return: the distance between the locations
+        :rtype: float
+        """
+        if i < j:
+            i, j = j, i
+        return self.data[(i * (i + 1) >> 1) + j]
+
+    def set_dist(self, i, j, distance):
+        """
+        Sets the distance between the locations with IDs i and j.
+
+        :param i: the ID of the location at one end of the route
+        :type i: int
+        :param j: the ID of the location at the other end of the route
+        :type j: int
+        :param distance: the distance between the locations
+        :type distance: float
+        """
+        if i < j:
+            i, j = j, i
+        self.data[(i * (i + 1) >> 1) + j] = distance
+
+    def read_csv(self, dist_data_file):
+        """
+        Fills the matrix from a lower-triangular distance CSV file, where row i holds the
+        distances from location i to locations 0 to i - 1.  Each row is copied straight into the
+        packed array; cells above the diagonal are ignored.
+
+        :param dist_data_file: path of the CSV file of distance data
+        :type dist_data_file: str
+        :return: the number of rows read
+        :rtype: int
+        :raises ValueError: if a row has fewer distances than its row number
+        """
+        row_index = 0
+        with open(dist_data_file, 'r') as csv_dist_data:
+            for row in csv.reader(csv_dist_data):
+                if len(row) < row_index:
+                    raise ValueError("row {}: expected {} distances, found {}".format(
+                        row_index + 1, row_index, len(row)))
+                if row_index >= self.size:
+                    self.add_location()
+                start = row_index * (row_index + 1) >> 1
+                self.data[start:start + row_index] = array('d', map(float, row[:row_index]))
+                row_index += 1
+        return row_index
+
+    def row(self, i):
+        """
+        Returns the distances from the location with ID i to every location, in O(n): the packed
+        row i up to the diagonal, then column i of the rows below it.
+
+        :param i: the location ID
+        :type i: int
+        :return: the distances, by location ID
+        :rtype: list
+        """
+        if not 0 <= i < self.size:
+            raise IndexError("matrix row out of range")
+        data = self.data
+        distances = data[i * (i + 1) >> 1:(i + 1) * (i + 2) >> 1].tolist()
+        distances.extend(data[(j * (j + 1) >> 1) + i] for j in range(i + 1, self.size))
+        return distances
+
+    def to_rows(self):
+        """
+        Returns the matrix as a dense list of rows.
+
+        :return: a list of rows, rows[i][j] is the distance between locations i and j
+        :rtype: list
+        """
+        rows = [self.data[i * (i + 1) >> 1:(i + 1) * (i + 2) >> 1].tolist() for i in range(self.size)]
+        for i in range(self.size):
+            for j in range(i + 1, self.size):
+                rows[i].append(rows[j][i])
+        return rows
+
+
+class MatrixRows:
+    """
+    A class that presents a flat, row-major buffer of doubles as a square matrix of rows, so
+    matrix[i][j] works on a memory-mapped or shared buffer without copying it into lists.
+
+    Attributes
+    ----------
+    buffer : memoryview
+        the matrix values, row by row
+    size : int
+        the number of rows and columns
+
+    Methods
+    --------
+    tolist()
+        Returns the matrix as a list of lists of floats.
+    """
+
+    def __init__(self, buffer, size):
+        """
+        Constructor for the MatrixRows class.
+
+        :param buffer: the matrix values, size * size doubles row by row
+        :type buffer: memoryview
+        :param size: the number of rows and columns
+        :type size: int
+        """
+        self.buffer = buffer
+        self.size = size
+
+    def __len__(self):
+        """
+        Returns the number of rows.
+
+        :return: the number of rows
+        :rtype: int
+        """
+        return self.size
+
+    def __getitem__(self, i):
+        """
+        Returns row i of the matrix as a view of the buffer.
+
+        :param i: the row index
+        :type i: int
+        :return: the row
+        :rtype: memoryview
+        """
+        if not 0 <= i < self.size:
+            raise IndexError("matrix row out of range")
+        return self.buffer[i * self.size:(i + 1) * self.size]
+
+    def tolist(self):
+        """
+        Returns the matrix as a list of lists of floats.
+
+        :return: the rows of the matrix
+        :rtype: list
+        """
+        return [self[i].tolist() for i in range(self.size)]
+
+
+class DistanceRows:
+    """
+    A class that presents a DistanceMatrix as a square matrix of rows, so matrix[i][j] works
+    without expanding the packed triangle into a dense list of lists.  Each row is built when it
+    is read, in O(n).
+
+    Attributes
+    ----------
+    matrix : DistanceMatrix
+        the packed distances
+    """
+
+    def __init__(self, matrix):
+        """
+        Constructor for the DistanceRows class.
+
+        :param matrix: the packed distances
+        :type matrix: DistanceMatrix
+        """
+        self.matrix = matrix
+
+    def __len__(self):
+        """
+        Returns the number of rows.
+
+        :return: the number of rows
+        :rtype: int
+        """
+        return len(self.matrix)
+
+    def __getitem__(self, i):
+        """
+        Returns row i of the matrix.
+
+        :param i: the row index
+        :type i: int
+        :return: the row
+        :rtype: list
+        """
+        return self.matrix.row(i)
@@ -0,0 +1,137 @@
+# Jennifer Pillow pillje@hotmail.com
+# The shortest route through a small truckload of stops, found exactly with the Held-Karp
+# dynamic program over subsets of the stops, skipping partial routes that miss a deadline.
+
+from array import array
+
+try:
+    import numpy
+except ImportError:     # NumPy is optional, the subsets are then walked in pure Python
+    numpy = None
+
+# the most stops solved exactly, about a tenth of a second; the table has 2**n * n entries, so
+# each stop more takes over twice as long, and pure Python fills it about ten times slower
+EXACT_MAX_STOPS = 16 if numpy is not None else 12
+INFINITY = float("inf")
+
+
+def shortest_tour(matrix, limits=None):
+    """
+    Returns the shortest route that starts at location 0, visits every other location once and
+    returns to location 0, such that the distance driven to reach each location is within its
+    limit.  A deadline becomes a limit of (deadline - departure time) * speed.
+
+    The table holds, for each subset of the stops and each stop in it, the shortest distance of
+    a route from the start through the subset ending at that stop.  A route that reaches its
+    last stop past the stop's limit is left out, so the routes it would lead to are never built;
+    as the distance to every stop only grows along a route, the shortest route left is the
+    shortest one that meets all the limits.  Ties go to the lower location numbers.
+
+    :param matrix: the distances between the locations, location 0 the start; at most
+        EXACT_MAX_STOPS + 1 rows
+    :type matrix: list
+    :param limits: optional, for each location 1 to n in order, the most miles that may be driven
+        before reaching it (default: no limits)
+    :type limits: list
+    :return: the stops 1 to n in visiting order and the route length, or None if no route meets
+        the limits
+    :rtype: tuple
+    :raises ValueError: if there are more than EXACT_MAX_STOPS stops
+    """
+    size = len(matrix) - 1
+    if size > EXACT_MAX_STOPS:
+        raise ValueError("{} stops is more than the {} solved exactly".format(size, EXACT_MAX_STOPS))
+    if limits is None:
+        limits = [INFINITY] * size
+    if size == 0:
+        return [], 0.0
+    solve = _solve_numpy if numpy is not None else _solve_python
+    return solve(matrix, limits, size)
+
+
+def _solve_python(matrix, limits, size):
+    """
+    Fills the table one subset at a time, extending each route in it by every stop not yet
+    visited.  cost[subset * size + last] is the shortest distance, and parent the stop before last.
+    """
+    full = (1 << size) - 1
+    rows = [row[1:] for row in matrix[1:]]
+    cost = [INFINITY] * ((full + 1) * size)
+    parent = array('b', [-1]) * len(cost)
+    for stop in range(size):
+        if matrix[0][stop + 1] <= limits[stop]:
+            cost[(1 << stop) * size + stop] = matrix[0][stop + 1]
+    for subset in range(1, full):
+        base = subset * size
+        unvisited = [stop for stop in range(size) if not subset >> stop & 1]
+        for last in range(size):
+            reached = cost[base + last]
+            if reached == INFINITY:
+                continue
+            row = rows[last]
+            for stop in unvisited:
+                total = reached + row[stop]
+                index = (subset | 1 << stop) * size + stop
+                if total < cost[index] and total <= limits[stop]:
+                    cost[index] = total
+                    parent[index] = last
+    totals = [cost[full * size + last] + matrix[last + 1][0] for last in range(size)]
+    return _unwind(parent, size, totals)
+
+
+def _solve_numpy(matrix, limits, size):
+    """
+    Fills the table a layer of subsets of the same size at a time: the rows of the layer are
+    read once, and for each stop the routes of the subsets without it are extended to it in one
+    array operation.  Subsets whose routes all missed a limit are dropped from the layer.
+    """
+    distances = numpy.asarray(matrix, dtype=numpy.float64)
+    between = distances[1:, 1:]
+    bounds = numpy.asarray(limits, dtype=numpy.float64)
+    full = (1 << size) - 1
+    cost = numpy.full((full + 1, size), numpy.inf)
+    parent = numpy.full((full + 1, size), -1, dtype=numpy.int8)
+    for stop in range(size):
+        if distances[0, stop + 1] <= bounds[stop]:
+            cost[1 << stop, stop] = distances[0, stop + 1]
+
+    subsets = numpy.arange(full + 1)
+    bit_count = numpy.zeros(full + 1, dtype=numpy.int8)
+    for stop in range(size):
+        bit_count += (subsets >> stop) & 1
+    for count in range(1, size):
+        layer = subsets[bit_count == count]
+        block = cost[layer]
+        alive = numpy.isfinite(block).any(axis=1)
+        layer, block = layer[alive], block[alive]
+        for stop in range(size):
+            without = (layer >> stop) & 1 == 0
+            totals = block[without] + between[:, stop]
+            best = totals.argmin(axis=1)
+            reached = totals[numpy.arange(len(best)), best]
+            reached[reached > bounds[stop]] = numpy.inf
+            targets = layer[without] | (1 << stop)
+            cost[targets, stop] = reached
+            parent[targets, stop] = best
+    totals = (cost[full] + distances[1:, 0]).tolist()
+    return _unwind(parent.ravel(), size, totals)
+
+
+def _unwind(parent, size, totals):
+    """
+    Returns the stops of the shortest whole route from the table of parents, numbered from 1,
+    and its length; or None when no route reached every stop.
+    """
+    last = min(range(size), key=totals.__getitem__)
+    length = totals[last]
+    if length == INFINITY:
+        return None
+    order = []
+    subset = (1 << size) - 1
+    while last >= 0:
+        order.append(last + 1)
+        previous = int(parent[subset * size + last])
+        subset ^= 1 << last
+        last = previous
+    order.reverse()
+    return order, length
@@ -1,16 +1,52 @@
 # Jennifer Pillow pillje@hotmail.com
 
-from Package import Package
+from Package import Package, PackageColumns, parse_status, parse_deadline, STATUS_NAMES
+from DistanceGraph import normalize_address
+
+INDEX_NAMES = ('address', 'deadline', 'status')
+
+
+def index_key(index_name, package):
+    """
+    Returns the key a package is filed under in a secondary index.
+
+    :param index_name: the name of the index: 'address', 'deadline' or 'status'
+    :type index_name: str
+    :param package: the package to file
+    :type package: Package
+    :return: the index key: normalized address, deadline in seconds after midnight or status code
+    :rtype: str or int
+    """
+    if index_name == 'address':
+        return normalize_address(package.address)
+    if index_name == 'deadline':
+        return package.deadline_time
+    return package.status_code
 
 
 class HashTable:
     """
     A class that creates a chaining hash table using a list of lists.
 
+    The table doubles its number of buckets whenever the number of packages would exceed
+    load_factor packages per bucket, so buckets stay short and lookups take constant time on
+    average.  Optional secondary indexes map a delivery address, deadline or status code to the
+    packages that have it.  Packages notify the table when their status, address or deadline
+    changes, and the table moves them in its indexes and rewrites their row in its columns.
+
     Attributes
     -----------
     table : list
         a list holding the buckets for the chaining hash table
+    count : int
+        the number of packages in the hash table
+    load_factor : float
+        the largest average number of packages per bucket before the table grows
+    indexes : dict
+        the secondary indexes by name, each a dictionary of index key -> {package ID: package}
+    columns : PackageColumns
+        the package fields as columns, built by the first to_columns() call and kept up to date
+        from then on (None until then)
 
     Methods
     ----------
@@ -20,6 +56,21 @@ class HashTable:
         Inserts a package into the hash table.
     remove(package_id)
         Removes a package from the hash table.
+    bulk_insert(packages)
+        Inserts many packages into the hash table, growing it at most once.
+    bulk_search(keys)
+        Searches for many packages by package ID.
+    find(address, deadline, status)
+        Returns the packages that match all the given secondary index values.
+    status_changed(package, old_code)
+        Moves a package to its new entry in the status index and updates its columns row.
+    index_changed(package, index_name, old_value)
+        Moves a package to its new entry in the address or deadline index and updates its
+        columns row.
+    status_histogram()
+        Returns the number of packages with each status.
+    to_columns()
+        Returns the package fields as columns of typed arrays, kept up to date.
     print()
         Displays all packages in the hash table to the console, grouped by hash table bucket.
     print_all_packages()
@@ -30,10 +81,44 @@ class HashTable:
         Removes all packages from the hash table.
     """
 
-    def __init__(self, num_buckets=10):
+    def __init__(self, num_buckets=10, load_factor=0.75, indexes=INDEX_NAMES):
+        """
+        Constructor for the HashTable class.
+
+        :param num_buckets: optional initial number of buckets (default 10)
+        :type num_buckets: int
+        :param load_factor: optional largest average number of packages per bucket (default 0.75)
+        :type load_factor: float
+        :param indexes: optional names of the secondary indexes to keep (default all)
+        :type indexes: tuple
+        """
         self.table = []
         for i in range(num_buckets):
             self.table.append([])
+        self.count = 0
+        self.load_factor = load_factor
+        self.indexes = {}
+        for index_name in indexes:
+            if index_name not in INDEX_NAMES:
+                raise ValueError("unknown index: " + str(index_name))
+            self.indexes[index_name] = {}
+        self.columns = None
+
+    def __len__(self):
+        """
+        Returns the number of packages in the hash table.
+
+        :return: the number of packages
+        :rtype: int
+        """
+        return self.count
+
+    def __iter__(self):
+        """
+        Iterates over all packages in the hash table, bucket by bucket.
+        """
+        for row in self.table:
+            yield from row
 
     def search(self, key):
         """
@@ -60,13 +145,11 @@ class HashTable:
         :return: a bool indicating the success of the insertion
         :rtype: bool
         """
-        key = package.package_id
-        if self.search(key) is None:
-            bucket = key % len(self.table)
-            bucket_list = self.table[bucket]
-            bucket_list.append(package)
-            return True
-        return False
+        if not self._insert(package):
+            return False
+        if self.count > self.load_factor * len(self.table):
+            self._resize(2 * len(self.table))
+        return True
 
     def remove(self, package_id):
         """
@@ -74,13 +157,167 @@ class HashTable:
 
         :param package_id: the package ID of the package to remove
         :type package_id: int
+        :return: a bool indicating a package was removed
+        :rtype: bool
         """
         key = package_id
         bucket = key % len(self.table)
         bucket_list = self.table[bucket]
 
-        if key in bucket_list:
-            bucket_list.remove(key)
+        for i, item in enumerate(bucket_list):
+            if item.package_id == key:
+                bucket_list[i] = bucket_list[-1]    # order within a bucket does not matter
+                bucket_list.pop()
+                self.count -= 1
+                self._unindex(item)
+                if self.columns is not None:
+                    self.columns.remove(key)
+                item.table = None
+                return True
+        return False
+
+    def bulk_insert(self, packages):
+        """
+        Inserts many packages into the hash table.  The table is grown once, up front, to fit
+        all of the packages instead of being rehashed repeatedly as they are added.
+
+        :param packages: the packages to insert into the hash table
+        :type packages: list
+        :return: the number of packages inserted
+        :rtype: int
+        """
+        packages = list(packages)
+        needed = self.count + len(packages)
+        num_buckets = len(self.table)
+        while needed > self.load_factor * num_buckets:
+            num_buckets *= 2
+        if num_buckets != len(self.table):
+            self._resize(num_buckets)
+
+        inserted = 0
+        for package in packages:
+            if self._insert(package):
+                inserted += 1
+        return inserted
+
+    def bulk_search(self, keys):
+        """
+        Searches for many packages by package ID.
+
+        :param keys: the package ID values
+        :type keys: list
+        :return: the package for each ID, or None where no package matches
+        :rtype: list
+        """
+        return [self.search(key) for key in keys]
+
+    def find(self, address=None, deadline=None, status=None):
+        """
+        Returns the packages that match all of the given values.  Each value may also be a list,
+        tuple or set of values, any of which matches; for example status=("AT HUB", "EN ROUTE")
+        finds all undelivered packages.  Values are compared the way they are indexed: addresses
+        ignoring case and spacing, deadlines as times ("10:30 AM" or seconds after midnight), and
+        statuses by code (a status code, or a string such as "EN ROUTE" or "DELIVERED").
+
+        Uses the secondary indexes, starting from the smallest matching set, so only packages
+        matching at least one value are checked.  Falls back to checking every package when a
+        needed index is not kept.
+
+        :param address: optional delivery address
+        :type address: str
+        :param deadline: optional delivery deadline, e.g. "10:30 AM"
+        :type deadline: str
+        :param status: optional status code or status string
+        :type status: int
+        :return: the matching packages
+        :rtype: list
+        """
+        criteria = {}
+        for index_name, value in (('address', address), ('deadline', deadline), ('status', status)):
+            if value is not None:
+                values = value if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+                criteria[index_name] = {self._normalize(index_name, val) for val in values}
+        if not criteria:
+            return list(self)
+
+        candidates = None
+        for index_name, keys in criteria.items():
+            if index_name not in self.indexes:
+                continue
+            matches = {}
+            for key in keys:
+                matches.update(self.indexes[index_name].get(key, {}))
+            if candidates is None or len(matches) < len(candidates):
+                candidates = matches
+        candidates = self if candidates is None else candidates.values()
+
+        return [package for package in candidates
+                if all(index_key(index_name, package) in keys for index_name, keys in criteria.items())]
+
+    def status_changed(self, package, old_code):
+        """
+        Moves a package to its new entry in the status index when its status code changed, and
+        rewrites its columns row.  Called by the package when its status is set.
+
+        :param package: the package whose status changed
+        :type package: Package
+        :param old_code: the status code of the package before the change
+        :type old_code: int
+        """
+        if self.columns is not None:
+            self.columns.update(package)
+        status_index = self.indexes.get('status')
+        if status_index is None or old_code == package.status_code:
+            return
+        self._remove_from_index(status_index, old_code, package)
+        status_index.setdefault(package.status_code, {})[package.package_id] = package
+
+    def index_changed(self, package, index_name, old_value):
+        """
+        Moves a package to its new entry in a secondary index and rewrites its columns row.
+        Called by the package when its address or deadline changes.
+
+        :param package: the package that changed
+        :type package: Package
+        :param index_name: the name of the index: 'address' or 'deadline'
+        :type index_name: str
+        :param old_value: the address or deadline of the package before the change
+        :type old_value: str or int
+        """
+        if self.columns is not None:
+            self.columns.update(package)
+        index = self.indexes.get(index_name)
+        if index is None:
+            return
+        self._remove_from_index(index, self._normalize(index_name, old_value), package)
+        index.setdefault(index_key(index_name, package), {})[package.package_id] = package
+
+    def status_histogram(self):
+        """
+        Returns the number of packages with each status, read from the status index when it is
+        kept and otherwise counted from a columnar scan.
+
+        :return: a dictionary of status name -> number of packages
+        :rtype: dict
+        """
+        status_index = self.indexes.get('status')
+        if status_index is None:
+            return self.to_columns().status_histogram()
+        return {name: len(status_index.get(code, ())) for code, name in enumerate(STATUS_NAMES)}
+
+    def to_columns(self):
+        """
+        Returns the fields of all packages as columns of typed arrays.  The columns are built
+        from the packages on the first call and kept by the table: inserts add rows, removals
+        drop them, and status and deadline changes rewrite them, so later calls return the same
+        up-to-date columns in constant time.  They must not be changed by the caller.
+
+        :return: the package columns
+        :rtype: PackageColumns
+        """
+        if self.columns is None:
+            self.columns = PackageColumns(self)
+        return self.columns
 
     def print(self):
         """
@@ -104,7 +341,7 @@ class HashTable:
         """
         for row in self.table:
             for package in row:
-                package.status = "AT HUB"
+                package.reset()
 
     def print_package(self, key):
         """
@@ -120,4 +357,70 @@ class HashTable:
         Removes all packages from the hash table.
         """
         for row in self.table:
+            for package in row:
+                package.table = None
             row.clear()
+        self.count = 0
+        for index in self.indexes.values():
+            index.clear()
+        self.columns = None
+
+    def _insert(self, package):
+        """
+        Adds a package to its bucket, the secondary indexes and the columns without growing the
+        table.
+        """
+        key = package.package_id
+        bucket_list = self.table[key % len(self.table)]
+        for item in bucket_list:
+            if item.package_id == key:
+                return False
+        bucket_list.append(package)
+        self.count += 1
+        for index_name, index in self.indexes.items():
+            index.setdefault(index_key(index_name, package), {})[key] = package
+        if self.columns is not None:
+            self.columns.append(package)
+        package.table = self
+        return True
+
+    def _resize(self, num_buckets):
+        """
+        Rehashes all packages into a new list of num_buckets buckets.
+        """
+        new_table = []
+        for i in range(num_buckets):
+            new_table.append([])
+        for row in self.table:
+            for package in row:
+                new_table[package.package_id % num_buckets].append(package)
+        self.table = new_table
+
+    def _unindex(self, package):
+        """
+        Removes a package from all secondary indexes.
+        """
+        for index_name, index in self.indexes.items():
+            self._remove_from_index(index, index_key(index_name, package), package)
+
+    @staticmethod
+    def _remove_from_index(index, key, package):
+        """
+        Removes a package from one entry of a secondary index, dropping the entry when it empties.
+        """
+        entry = index.get(key)
+        if entry is not None:
+            entry.pop(package.package_id, None)
+            if not entry:
+                del index[key]
+
+    @staticmethod
+    def _normalize(index_name, value):
+        """
+        Converts a value given to find() to the form used as an index key.
+        """
+        if index_name == 'address':
+            return normalize_address(value)
+        if index_name == 'deadline':
+            return parse_deadline(value)
+        return parse_status(value)
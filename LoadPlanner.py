@@ -0,0 +1,348 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import heapq
+from Package import EOD_TIME, ANY_TRUCK, SECONDS_PER_MINUTE, format_time
+from Profiler import profiled
+from Routing import plan_route, route_length, travel_seconds
+
+INFINITY = float("inf")
+
+
+class LoadUnit:
+    """
+    A class used to represent packages that must travel on the same trip: packages that must be
+    delivered together and packages for the same address.
+
+    Attributes
+    ----------
+    packages : list
+        the packages in the unit
+    locations : list
+        the delivery locations of the packages, in the order the packages were added
+    deadline : int
+        the earliest package deadline in seconds after midnight
+    available : int
+        the time the last package reaches the hub, in minutes after midnight
+    truck_mask : int
+        bitmask of the IDs of the trucks all the packages may go on, ANY_TRUCK for any truck
+    """
+
+    def __init__(self):
+        """
+        Constructor for the LoadUnit class.
+        """
+        self.packages = []
+        self.locations = []
+        self.deadline = EOD_TIME
+        self.available = 0
+        self.truck_mask = ANY_TRUCK
+
+    def add(self, package):
+        """
+        Adds a package and its compiled constraints to the unit.
+
+        :param package: the package to add
+        :type package: Package
+        """
+        self.packages.append(package)
+        if package.location not in self.locations:
+            self.locations.append(package.location)
+        self.deadline = min(self.deadline, package.deadline_time)
+        self.available = max(self.available, package.available_minutes)
+        self.truck_mask &= package.truck_mask
+
+
+@profiled("build_units")
+def build_units(packages, capacity):
+    """
+    Groups packages into load units.  Packages with the same group_id must be delivered together
+    and are joined into one unit, which also takes the other packages for their addresses while
+    they fit on a truck.  Other packages for the same address share a unit, split where a unit
+    would not fit on a truck.
+
+    :param packages: the packages to group, with their delivery groups linked
+        (see Package.link_delivery_groups)
+    :type packages: list
+    :param capacity: the number of packages a truck holds
+    :type capacity: int
+    :return: the load units
+    :rtype: list
+    """
+    units = []
+    groups = {}
+    by_location = {}
+    for package in packages:
+        if package.group_id:
+            unit = groups.get(package.group_id)
+            if unit is None:
+                unit = groups[package.group_id] = LoadUnit()
+                units.append(unit)
+        else:
+            key = (package.location, package.truck_mask, package.available_minutes)
+            unit = by_location.get(key)
+            if unit is None or len(unit.packages) >= capacity:
+                unit = by_location[key] = LoadUnit()
+                units.append(unit)
+        unit.add(package)
+
+    for unit in groups.values():
+        if len(unit.packages) > capacity:
+            raise ValueError("packages that must be delivered together do not fit on one truck: " +
+                             ", ".join(str(package.package_id) for package in unit.packages))
+
+    # a group also takes the other packages for its addresses, while they fit
+    at_location = {}
+    for (location, truck_mask, available), unit in by_location.items():
+        at_location.setdefault(location, []).append(unit)
+    merged = set()
+    for group in groups.values():
+        for location in list(group.locations):
+            for unit in at_location.get(location, ()):
+                if (id(unit) not in merged and unit.available <= group.available
+                        and len(group.packages) + len(unit.packages) <= capacity
+                        and unit.truck_mask & group.truck_mask):
+                    for package in unit.packages:
+                        group.add(package)
+                    merged.add(id(unit))
+    return [unit for unit in units if id(unit) not in merged]
+
+
+@profiled("plan_loads")
+def plan_loads(graph, packages, trucks, ready_times, num_drivers, speed, hub=None, day_end=None, late=None):
+    """
+    Partitions the packages into truck trips.
+
+    Trips are planned in the order they leave the hub, following the same rules as a
+    DeliverySimulation: a trip leaves once its truck is at the hub, a driver is free and the truck
+    is ready.  Each trip is filled by _fill_trip from the load units that have reached the hub and
+    may go on its truck, growing a cluster of nearby stops from the most urgent unit.  A driver
+    waits for packages with deadlines that reach the hub later when another driver can take the
+    more urgent packages, and a last trip of end of day packages waits for the packages still to
+    come.  Trip durations are estimated from the greedy route, to find when drivers and trucks
+    are free.
+
+    Each trip is checked against its deadlines on the same greedy route: the IDs of packages it
+    would deliver late are added to the late list.  No trip leaves after the end of the day;
+    packages that would have to wait for one are an error rather than a trip days later.
+
+    :param graph: graph of the distances between locations, with shortest distances computed
+    :type graph: Graph
+    :param packages: the packages to plan, with their delivery locations resolved
+    :type packages: list
+    :param trucks: the trucks available
+    :type trucks: list
+    :param ready_times: the time each truck is first ready to leave, in seconds after midnight,
+        in the same order
+    :type ready_times: list
+    :param num_drivers: the number of drivers
+    :type num_drivers: int
+    :param speed: the truck speed in miles per minute
+    :type speed: float
+    :param hub: optional hub location (default: the first location in the graph)
+    :type hub: Location
+    :param day_end: optional time no trip may leave after, in seconds after midnight (default: the
+        end of day deadline, midnight)
+    :type day_end: int
+    :param late: optional list that receives the IDs of the packages the planned trips deliver
+        after their deadline
+    :type late: list
+    :return: a list of (truck, packages, ready time in seconds after midnight) trips in the
+        order they leave
+    :rtype: list
+    :raises ValueError: if packages that must travel together do not fit on a truck, no truck
+        may carry some packages, or packages cannot leave the hub by the end of the day
+    """
+    if hub is None:
+        hub = graph.get_locations()[0]
+    if day_end is None:
+        day_end = EOD_TIME
+    if late is None:
+        late = []
+    index = graph.neighbor_index()
+    capacity = min(truck.capacity for truck in trucks)
+    pending = build_units(packages, capacity)
+    from_hub = {id(unit): _distance(graph, (hub,), unit) for unit in pending}
+    fleet_mask = 0
+    for truck in trucks:
+        fleet_mask |= 1 << truck.truck_id
+    for unit in pending:
+        if not unit.truck_mask & fleet_mask:
+            raise ValueError("no truck can carry packages: " +
+                             ", ".join(str(package.package_id) for package in unit.packages))
+
+    drivers = [min(ready_times)] * num_drivers
+    truck_ready = {truck.truck_id: ready for truck, ready in zip(trucks, ready_times)}
+    trips = []
+
+    while pending:
+        driver_free = heapq.heappop(drivers)
+        # the truck that can leave first with a load, preferring the order trucks were given
+        any_earliest, truck_earliest = _earliest_available(pending)
+        best = None
+        for truck in trucks:
+            earliest = truck_earliest.get(truck.truck_id)
+            if any_earliest is not None and (earliest is None or any_earliest < earliest):
+                earliest = any_earliest
+            if earliest is None:
+                continue
+            leave = max(driver_free, truck_ready[truck.truck_id], earliest * SECONDS_PER_MINUTE)
+            if best is None or leave < best[0]:
+                best = (leave, truck)
+        leave, truck = best
+        if leave > day_end:
+            raise ValueError("{} packages cannot leave the hub by {}".format(
+                sum(len(unit.packages) for unit in pending), format_time(day_end)))
+        minutes = leave / SECONDS_PER_MINUTE
+
+        # hold this driver for packages with deadlines that reach the hub later, when the other
+        # drivers free now can carry the more urgent packages that are already here
+        late = [unit for unit in pending if unit.available > minutes and unit.deadline < EOD_TIME]
+        if late:
+            others = sum(1 for free in drivers if free <= leave)
+            late_deadline = min(unit.deadline for unit in late)
+            urgent = sum(len(unit.packages) for unit in pending
+                         if unit.available <= minutes and unit.deadline < late_deadline)
+            if others and urgent <= others * capacity:
+                available = min(unit.available for unit in late)
+                heapq.heappush(drivers, available * SECONDS_PER_MINUTE)
+                continue
+
+        bit = 1 << truck.truck_id
+        candidates = [unit for unit in pending if unit.available <= minutes and unit.truck_mask & bit]
+        load = _fill_trip(graph, candidates, truck, index, from_hub)
+        chosen = set(map(id, load))
+        pending = [unit for unit in pending if id(unit) not in chosen]
+
+        # a last trip of end of day packages waits for the packages still to reach the hub,
+        # rather than leaving a trip for them alone
+        if pending and all(unit.deadline >= EOD_TIME for unit in load):
+            used = sum(len(unit.packages) for unit in load)
+            if (all(unit.available > minutes and unit.truck_mask & bit for unit in pending)
+                    and used + sum(len(unit.packages) for unit in pending) <= truck.capacity):
+                leave = max(unit.available for unit in pending) * SECONDS_PER_MINUTE
+                load.extend(pending)
+                pending = []
+
+        trip_packages = [package for unit in load for package in unit.packages]
+        trips.append((truck, trip_packages, leave))
+        route = plan_route(graph, hub, trip_packages)
+        _late_packages(graph, hub, route, trip_packages, leave, speed, late)
+        duration = travel_seconds(route_length(graph, hub, route), speed)
+        truck_ready[truck.truck_id] = leave + duration
+        heapq.heappush(drivers, leave + duration)
+    return trips
+
+
+def _earliest_available(units):
+    """
+    Returns the earliest time any truck can carry a unit, and a dictionary of truck ID -> the
+    earliest time for units restricted to some trucks, in minutes after midnight.  The first is
+    None when every unit is restricted.  One pass over the units, whatever the number of trucks.
+    """
+    any_earliest = None
+    truck_earliest = {}
+    for unit in units:
+        if unit.truck_mask == ANY_TRUCK:
+            if any_earliest is None or unit.available < any_earliest:
+                any_earliest = unit.available
+            continue
+        mask = unit.truck_mask
+        while mask:
+            low_bit = mask & -mask
+            truck_id = low_bit.bit_length() - 1
+            if truck_id not in truck_earliest or unit.available < truck_earliest[truck_id]:
+                truck_earliest[truck_id] = unit.available
+            mask ^= low_bit
+    return any_earliest, truck_earliest
+
+
+def _fill_trip(graph, candidates, truck, index, from_hub):
+    """
+    Chooses the load units for one trip.  The trip is seeded with the unit with the earliest
+    deadline and grows a cluster: it takes the units with deadlines, then the units that may only
+    go on this truck, then the rest, each time the unit nearest to a stop already on the trip,
+    while they fit.
+
+    The candidates wait in a heap by class and distance.  When a unit joins the trip, only the
+    candidates at the locations in the neighbor lists of its stops move nearer, so choosing a
+    unit does not measure every candidate again.  Candidates out of reach of every list are
+    measured to the trip's stops only once their class comes up.  With neighbor lists that hold
+    every location, the choices are the same as measuring every candidate each time.
+    """
+    seed = min(candidates, key=lambda unit: (unit.deadline, -from_hub[id(unit)]))
+    load = [seed]
+    used = len(seed.packages)
+    rest = [unit for unit in candidates if unit is not seed]
+    nearest = [INFINITY] * len(rest)
+    classes = [(unit.deadline >= EOD_TIME, unit.truck_mask == ANY_TRUCK) for unit in rest]
+    taken = [False] * len(rest)
+    members = {}        # class -> positions in rest of its units
+    at_location = {}    # location ID -> positions in rest of the units with a stop there
+    for i, unit in enumerate(rest):
+        members.setdefault(classes[i], []).append(i)
+        for location in unit.locations:
+            at_location.setdefault(location.loc_id, []).append(i)
+    heap = [(classes[i], INFINITY, i) for i in range(len(rest))]
+    heapq.heapify(heap)
+    stops = list(seed.locations)
+    measured = set()    # the classes whose units out of reach have been measured
+    _move_nearer(index, seed, at_location, nearest, classes, taken, heap)
+    while used < truck.capacity and heap:
+        unit_class, dist, i = heapq.heappop(heap)
+        if taken[i] or dist != nearest[i]:
+            continue    # chosen already, or an entry left behind when the unit moved nearer
+        if dist == INFINITY and unit_class not in measured:
+            measured.add(unit_class)
+            for j in members[unit_class]:
+                if not taken[j] and nearest[j] == INFINITY:
+                    nearest[j] = _distance(graph, stops, rest[j])
+                    heapq.heappush(heap, (unit_class, nearest[j], j))
+            continue
+        taken[i] = True
+        unit = rest[i]
+        if used + len(unit.packages) > truck.capacity:
+            continue    # the load only grows, so the unit will not fit later either
+        load.append(unit)
+        used += len(unit.packages)
+        stops.extend(unit.locations)
+        _move_nearer(index, unit, at_location, nearest, classes, taken, heap)
+    return load
+
+
+def _move_nearer(index, unit, at_location, nearest, classes, taken, heap):
+    """
+    Brings the candidates at the locations in the neighbor lists of the stops of a unit that
+    joined the trip nearer, when the unit's stops are nearer than the trip's other stops.
+    """
+    for location in unit.locations:
+        loc_id = location.loc_id
+        for neighbor_id, dist in zip(index.neighbors[loc_id], index.distances[loc_id]):
+            for j in at_location.get(neighbor_id, ()):
+                if not taken[j] and dist < nearest[j]:
+                    nearest[j] = dist
+                    heapq.heappush(heap, (classes[j], dist, j))
+
+
+def _late_packages(graph, hub, route, packages, leave, speed, late):
+    """
+    Adds the IDs of the packages of a trip that its route delivers after their deadline to the
+    late list, with the arrival times estimated the same way as the trip duration.
+    """
+    arrival = {}    # location -> arrival time in seconds after midnight
+    miles = 0.0
+    curr_loc = hub
+    for next_loc in route:
+        miles += graph.get_distance(curr_loc, next_loc)
+        arrival[next_loc] = leave + travel_seconds(miles, speed)
+        curr_loc = next_loc
+    for package in packages:
+        if arrival[package.location] > package.deadline_time:
+            late.append(package.package_id)
+
+
+def _distance(graph, from_locs, unit):
+    """
+    Returns the shortest distance from one of a list of locations to the delivery locations of a
+    unit.
+    """
+    return min(graph.get_distance(from_loc, location) for from_loc in from_locs for location in unit.locations)
@@ -2,29 +2,114 @@
 # This program simulates a package delivery service. There are 40 packages
 # to deliver, each with optional delivery requirements.
 
+import argparse
 import csv
-import datetime
-from DistanceGraph import Location, Graph, dijkstra_shortest_path
-from Package import Package
+from DistanceGraph import Location, Graph, all_pairs_shortest_path
+from DistanceCache import cache_key, cache_path, load_cache, save_cache
 from Truck import Truck
 from HashTable import HashTable
+from Simulation import DeliverySimulation
+from Routing import plan_route, plan_improved_route, plan_exact_route
+from Timeline import DeliveryTimeline
+from LoadPlanner import plan_loads
+from Package import SECONDS_PER_DAY, parse_clock, format_time
+from PackageIngest import ingest_packages
+from RoadNetwork import load_road_graph
+from Profiler import profiled
 
 # Global variables
-start_time = datetime.datetime.strptime('0800', "%H%M")  # Start time for delivery day is 8:00am
+start_time = parse_clock('0800')  # Start time for delivery day is 8:00am, in seconds after midnight
 hash_table = HashTable()
-dist_graph = Graph()
+dist_graph = Graph(compact=True)
 truck_1 = Truck(1)
 truck_2 = Truck(2)
 truck_3 = Truck(3)
+timeline = DeliveryTimeline()
 TRUCK_SPEED = 0.3       # 18 mph is 0.3 miles/min
+NUM_DRIVERS = 2
+END_TIME = parse_clock('1700')          # default end of the simulated day
+LATE_TRUCK_TIME = parse_clock('0950')   # truck 3 is ready at 9:50am
+IMPROVE_ROUTES = False  # shorten the greedy routes with 2-opt and Or-opt moves
+EXACT_ROUTES = False    # solve the routes of small loads exactly (Held-Karp)
+DIST_NAME_FILE = "Distance Names.csv"
+DIST_DATA_FILE = "Distance Data.csv"
+DIST_CACHE_DIR = "."     # directory of the distance cache files, one per set of input files
+PACKAGE_FILE = "Package File.csv"
+
+
+def main(argv=None):
+    """
+    The main method for the program.  With --edges, the distances between the locations are the
+    shortest distances over a road network edge list instead of the Distance Data file.  With
+    --exact, the routes of small loads are solved exactly.
+    """
+    global EXACT_ROUTES
+    parser = argparse.ArgumentParser(description="Package delivery monitor.")
+    parser.add_argument("--edges", default=None,
+                        help="road network CSV of from, to, miles rows to compute the distances over")
+    parser.add_argument("--exact", action="store_true", help="solve the routes of small loads exactly")
+    args = parser.parse_args(argv)
+    if args.exact:
+        EXACT_ROUTES = True
+    if args.edges is None:
+        build_graph(dist_graph)
+    else:
+        load_road_graph(dist_graph, DIST_NAME_FILE, args.edges)
+    setup_hash_table()
+    user_interface()
+
+
+@profiled("build_graph")
+def build_graph(graph, dist_name_file=DIST_NAME_FILE, dist_data_file=DIST_DATA_FILE, cache_dir=DIST_CACHE_DIR):
+    """
+    Builds the graph of locations and shortest distances.  Loads it from the binary cache file
+    when the cache was built from the same CSV files, otherwise reads the CSV files, computes the
+    shortest distances and saves them to the cache for the next start.  The cache file is named
+    after the content hash of the CSV files (see cache_path), so different inputs do not share
+    one cache file.
+
+    :param graph: the empty graph to build
+    :type graph: Graph
+    :param dist_name_file: optional path of the CSV file of location names and addresses
+    :type dist_name_file: str
+    :param dist_data_file: optional path of the CSV file of lower-triangular distance data
+    :type dist_data_file: str
+    :param cache_dir: optional directory of the cache files, None to skip the cache
+    :type cache_dir: str
+    """
+    key = None
+    if cache_dir is not None:
+        key = cache_key(dist_name_file, dist_data_file)
+        cache_file = cache_path(key, cache_dir)
+        if load_cache(cache_file, key, graph):
+            return
+
+    load_graph(graph, dist_name_file, dist_data_file)
+    # compute the shortest distances between all locations
+    graph.shortest = all_pairs_shortest_path(graph)
+    if cache_dir is not None:
+        try:
+            save_cache(cache_file, key, graph)
+        except OSError:
+            pass    # a read-only directory only costs the next start the recomputation
 
 
-def main():
+@profiled("load_graph")
+def load_graph(graph, dist_name_file=DIST_NAME_FILE, dist_data_file=DIST_DATA_FILE):
     """
-    The main method for the program.
+    Populates the graph with the delivery locations and the distances between them from external
+    CSV files.
+
+    :param graph: the graph to add the locations and distances to
+    :type graph: Graph
+    :param dist_name_file: optional path of the CSV file of location names and addresses
+    :type dist_name_file: str
+    :param dist_data_file: optional path of the CSV file of lower-triangular distance data
+    :type dist_data_file: str
+    :return: the locations in the order they were added to the graph
+    :rtype: list
     """
     # import delivery locations and create vertices for graph
-    dist_name_file = "Distance Names.csv"
     locations = []
     with open(dist_name_file, 'r') as csv_dist_name:
         csv_dist_reader = csv.reader(csv_dist_name)
@@ -33,32 +118,37 @@ def main():
             address = row[1]
             zipcode = row[2]
             new_location = Location(name, address, zipcode)
-            dist_graph.add_location(new_location)
+            graph.add_location(new_location)
             locations.append(new_location)
 
     # import distance data and create graph
-    dist_data_file = "Distance Data.csv"
+    if graph.compact:
+        graph.distance.read_csv(dist_data_file)     # rows go straight into the packed matrix
+        return locations
     with open(dist_data_file, 'r') as csv_dist_data:
         csv_data_reader = csv.reader(csv_dist_data)
         row_index = 0
         for row in csv_data_reader:
             for col_index in range(row_index):
-                dist_graph.add_distance(locations[row_index], locations[col_index], float(row[col_index]))
+                graph.add_distance(locations[row_index], locations[col_index], float(row[col_index]))
             row_index += 1
 
-    # update distance graph with shortest distances using dijkstra's shortest path
-    for loc in dist_graph.adj_list:
-        dijkstra_shortest_path(dist_graph, loc)
-    setup_hash_table()
-    user_interface()
+    return locations
 
 
 def user_interface():
     """
     Displays a user interface to the console.
+
+    The delivery day is simulated once, with a recorded timeline; status queries for a specified
+    time are answered from the timeline.
     """
     print("\nPackage Delivery Monitor")
 
+    # Run full day code once and record the timeline
+    reset()
+    end_t = sim_day(recorder=timeline)
+
     # loop until exit is chosen
     is_exit = False
     while not is_exit:
@@ -69,10 +159,6 @@ def user_interface():
         print("4. Exit the Program")
         option = input("Chose an option (1-4): ")
         if option == "1":
-            # setup_hash_table()
-            reset()
-            # Run full day code
-            end_t = sim_day()
             # Display status for all packages and total distance for trucks
             hash_table.print_all_packages()
             total_dist = truck_1.distance + truck_2.distance + truck_3.distance
@@ -80,23 +166,18 @@ def user_interface():
             print("Truck 2: ", round(truck_2.distance, 1), " miles")
             print("Truck 3: ", round(truck_3.distance, 1), " miles")
             print("Total miles: ", round(total_dist, 1))
-            print("Day Ended: ", end_t.time())
+            print("Day Ended: ", format_time(end_t))
         elif option == "2":
-            # setup_hash_table()
-            reset()
             stop_time = validate_time_input("all package statuses")
-            # Run code till stop time
-            sim_day(stop_time)
-            # Display status for all packages and distance travelled for trucks
-            print("Displaying all package data at: ", stop_time.time())
-            hash_table.print_all_packages()
-            total_dist = truck_1.distance + truck_2.distance + truck_3.distance
-            print("Truck 1: ", round(truck_1.distance, 1), " miles")
-            print("Truck 2: ", round(truck_2.distance, 1), " miles")
-            print("Truck 3: ", round(truck_3.distance, 1), " miles")
-            print("Total miles: ", round(total_dist, 1))
+            # Display status for all packages and distance travelled for trucks at stop time
+            print("Displaying all package data at: ", format_time(stop_time))
+            for package in hash_table:
+                print(package.describe(timeline.status_at(package.package_id, stop_time)))
+            for truck in (truck_1, truck_2, truck_3):
+                print("Truck " + str(truck.truck_id) + ": ",
+                      round(timeline.truck_mileage_at(truck.truck_id, stop_time), 1), " miles")
+            print("Total miles: ", round(timeline.total_mileage_at(stop_time), 1))
         elif option == "3":
-            reset()
             stop_time = validate_time_input("package status")
             err_mess = "Please choose a valid package number!"
             pack = None
@@ -108,10 +189,9 @@ def user_interface():
                     pass
                 if pack is None:
                     print(err_mess)
-            # run code till stop time
-            sim_day(stop_time)
-            # display status for chosen package
-            print("Package#: ", str(pack.package_id), " Status at ", stop_time.time(), ": ", pack.status)
+            # display status for chosen package at stop time
+            status = timeline.status_at(pack.package_id, stop_time)
+            print("Package#: ", str(pack.package_id), " Status at ", format_time(stop_time), ": ", status)
         elif option == "4":
             is_exit = True
         else:
@@ -123,51 +203,40 @@ def setup_hash_table():
     Creates the hash table and populates it with package data from an external CSV file.
     """
     hash_table.clear_table()
+    load_packages(hash_table, dist_graph)
 
-    # import package data from csv file to hash table
-    package_file = "Package File.csv"
-    with open(package_file, 'r') as csvPackage:
-        csv_reader_package = csv.reader(csvPackage)
 
-        for hash_row in csv_reader_package:
-            package_id = int(hash_row[0])
-            addr = hash_row[1]
-            city = hash_row[2]
-            state = hash_row[3]
-            zcode = hash_row[4]
-            deadline = hash_row[5]
-            weight = hash_row[6]
-            notes = hash_row[7]
-            package = Package(package_id, addr, city, state, zcode, deadline, weight, notes)
-            hash_table.insert(package)
+def load_packages(table, graph, package_file=PACKAGE_FILE):
+    """
+    Reads packages from a CSV file into a hash table and resolves their delivery locations in
+    the graph.  The file is streamed in chunks, invalid rows are rejected, the package notes are
+    compiled into constraints and the groups of packages that must be delivered together are
+    linked (see PackageIngest.ingest_packages).
+
+    :param table: the hash table to insert the packages into
+    :type table: HashTable
+    :param graph: the graph of delivery locations
+    :type graph: Graph
+    :param package_file: optional path of the package CSV file
+    :type package_file: str
+    :return: the ingestion report, with the rejected rows
+    :rtype: IngestReport
+    """
+    return ingest_packages(package_file, table, graph)
 
 
 def reset():
     """
-    Calls reset method for all the trucks and packages.
+    Calls reset method for all the trucks and packages, and clears the recorded timeline.
     """
+    timeline.clear()
     truck_1.reset_truck()
     truck_2.reset_truck()
     truck_3.reset_truck()
     hash_table.reset_packages()
 
 
-def can_drive(dist, time=540.0):
-    """
-    Determines if the truck has enough time to drive the specified distance.
-
-    :param dist: the distance to travel
-    :type dist: float
-    :param time: optional time in minutes, default is 540.0 (8am-5pm: 9 hrs = 540 minutes)
-    :type time: float
-    :return: the truck has enough time to drive the distance
-    :rtype: bool
-    """
-    return TRUCK_SPEED * time >= dist
-
-
-def run_route(truck, begin_time=start_time,
-              end_time=datetime.datetime.strptime('1700', "%H%M")):
+def run_route(truck, begin_time=start_time, end_time=END_TIME):
     """
     Simulates a truck route delivering the loaded packages.  Returns the earlier of: time the route
     completes or the specified end_time.
@@ -179,168 +248,113 @@ def run_route(truck, begin_time=start_time,
     :param truck: the truck to drive the route
     :type truck: Truck
     :param begin_time: optional time to begin route
-    :type begin_time: datetime.datetime
+    :type begin_time: int
     :param end_time: optional time to end the route (default: EOD)
-    :type end_time: datetime.datetime
+    :type end_time: int
     :return: earlier of: the time the route completes, or the optional specified end_time
-    :rtype: datetime.datetime
+    :rtype: int
     """
-    if len(truck.packages) < 1:
+    if truck.get_num_packages() < 1:
         return begin_time
-    start_loc = list(dist_graph.adj_list.keys())[0]   # address of WGU Hub
-    curr_loc = start_loc
-    curr_time = begin_time
-    next_dist = float("inf")
-    time_rem = (end_time - begin_time).seconds/60
-
-    # sort package locations into lists based on delivery deadline
-    nine_am_queue = []      # packages with a 9:00 am deadline
-    ten_am_queue = []       # packages with a 10:30 am deadline
-    eod_queue = []          # packages with EOD deadline
-    for mail in truck.packages:
-        del_addr = dist_graph.search_location(mail.address)
-        if '9:00' in mail.deadline:
-            if del_addr not in nine_am_queue:
-                if del_addr in ten_am_queue:
-                    ten_am_queue.remove(del_addr)
-                if del_addr in eod_queue:
-                    eod_queue.remove(del_addr)
-                nine_am_queue.append(del_addr)
-        elif '10:30' in mail.deadline:
-            if (del_addr not in ten_am_queue) and (del_addr not in nine_am_queue):
-                if del_addr in eod_queue:
-                    eod_queue.remove(del_addr)
-                ten_am_queue.append(del_addr)
-        else:
-            if (del_addr not in ten_am_queue) and (del_addr not in nine_am_queue):
-                if del_addr not in eod_queue:
-                    eod_queue.append(del_addr)
-
-    unvisited_queue = eod_queue     # set default queue
-
-    # if there are packages with a 10:30 am deadline time switch lists to put them first on route
-    if len(ten_am_queue) > 0:
-        unvisited_queue = ten_am_queue
-
-    # if there are packages with a 9:00 am deadline time switch lists to put them first on route
-    if len(nine_am_queue) > 0:
-        unvisited_queue = nine_am_queue
+    simulation = DeliverySimulation(dist_graph, 1, TRUCK_SPEED)
+    simulation.add_trip(truck, [], begin_time)
+    return simulation.run(end_time)
 
-    # find location in unvisited queue with shortest distance
-    while len(unvisited_queue) > 0:
-        sm_index = 0
-        if len(unvisited_queue) == 1:
-            next_dist = dist_graph.distance[(curr_loc, unvisited_queue[0])]
-        else:
-            for i in range(1, len(unvisited_queue)):
-                # compare (distance from curr_loc to loc(i)) with (distance from curr_loc to loc(sm_index))
-                sm_dist = dist_graph.distance[(curr_loc, unvisited_queue[sm_index])]
-                if dist_graph.distance[(curr_loc, unvisited_queue[i])] < sm_dist:
-                    sm_index = i    # update sm_index with index of smallest distance
-                    next_dist = dist_graph.distance[(curr_loc, unvisited_queue[i])]
-                else:
-                    next_dist = sm_dist
-        if can_drive(next_dist, time_rem):
-            truck.drive(next_dist)
-            curr_loc = unvisited_queue[sm_index]  # travel to shortest dist location
-
-            time_rem -= next_dist / TRUCK_SPEED
-            travel_t = next_dist/TRUCK_SPEED
-            curr_time = curr_time + datetime.timedelta(seconds=travel_t * 60)
-            dlvr_time = curr_time.time()
-
-            for mail in reversed(truck.packages):  # reversed so indexes changed by removal have already been iterated
-                if dist_graph.search_location(mail.address) == curr_loc:
-                    truck.deliver_package(mail, dlvr_time.strftime("%X"))
-        else:
-            truck.drive(TRUCK_SPEED * time_rem)
-            curr_time = curr_time + datetime.timedelta(seconds=time_rem * 60)
-            return curr_time
-
-        unvisited_queue.pop(sm_index)
-        # if there are no packages with a 9:00 deadline deliver the 10:30 deadline packages
-        if len(unvisited_queue) < 1:
-            unvisited_queue = ten_am_queue
-        # if there are no packages with a 10:30 deadline deliver the EOD packages
-        if len(unvisited_queue) < 1:
-            unvisited_queue = eod_queue
-
-    # return to hub
-    hub_dist = dist_graph.distance[(curr_loc, start_loc)]
-    if can_drive(hub_dist, time_rem):
-        truck.drive(hub_dist)
-        drive_time = hub_dist / TRUCK_SPEED
-        curr_time = curr_time + datetime.timedelta(seconds=drive_time * 60)
-    else:
-        truck.drive(TRUCK_SPEED * time_rem)
-        curr_time = curr_time + datetime.timedelta(seconds=time_rem * 60)
-        return curr_time
-    return curr_time
 
-
-def sim_day(end_time=datetime.datetime.strptime('1700', "%H%M")):
+def sim_day(end_time=END_TIME, recorder=None, improve=None, exact=None):
     """
-    Loads packages on all trucks and sends them on their routes.  Returns the earlier of the time
-    all routes are completed with the delivery of all 40 packages, or the user specified end_time.
+    Plans the truck loads, loads the packages on the trucks and sends them on their routes.
+    Returns the earlier of the time all routes are completed with the delivery of all packages,
+    or the user specified end_time.
+
+    Trucks 1 and 2 are ready at the start of the day and truck 3 at 9:50am; each trip leaves when
+    its truck is ready and one of the drivers is at the hub.  The loads are planned by plan_loads
+    from the package deadlines and notes.
 
     :param end_time: optional time to end simulation before EOD
-    :type end_time: datetime.datetime
+    :type end_time: int
+    :param recorder: optional recorder of the day's events, such as a DeliveryTimeline
+    :type recorder: DeliveryTimeline
+    :param improve: optional, shorten the greedy routes with local search (default IMPROVE_ROUTES)
+    :type improve: bool
+    :param exact: optional, solve the routes of small loads exactly (default EXACT_ROUTES)
+    :type exact: bool
     :return: earlier time of: user-specified time or time all routes have been completed
-    :rtype: datetime.datetime
+    :rtype: int
     """
-    p1 = [13, 14, 15, 16, 19, 20, 21, 34, 39]
-    p2 = [1, 3, 5, 7, 8, 11, 12, 18, 22, 23, 24, 29, 30, 36, 37, 38]
-    p3 = [2, 4, 6, 9, 10, 17, 25, 26, 27, 28, 31, 32, 33, 35, 40]
-
-    # send truck_1
-    for j in p1:
-        truck_1.load_package(hash_table.search(j))
-    trip1 = run_route(truck_1, start_time, end_time)
-
-    # send truck_2
-    for k in p2:
-        truck_2.load_package(hash_table.search(k))
-    trip2 = run_route(truck_2, start_time, end_time)
-
-    # determine the earliest time at which a truck returns to hub
-    if trip1 < trip2:
-        next_time = trip1
+    if improve is None:
+        improve = IMPROVE_ROUTES
+    if exact is None:
+        exact = EXACT_ROUTES
+    return simulate_day(dist_graph, list(hash_table), [truck_1, truck_2, truck_3],
+                        [start_time, start_time, LATE_TRUCK_TIME], NUM_DRIVERS, TRUCK_SPEED, end_time, recorder,
+                        improve, exact)
+
+
+@profiled("simulate_day")
+def simulate_day(graph, packages, trucks, ready_times, num_drivers, speed, end_time, recorder=None, improve=False,
+                 exact=False, day_end=None):
+    """
+    Plans the truck loads for a set of packages and simulates the delivery day.  Uses only its
+    arguments, so any number of days can be simulated side by side.
+
+    :param graph: graph of the distances between locations, with shortest distances computed
+    :type graph: Graph
+    :param packages: the packages to deliver, at the hub
+    :type packages: list
+    :param trucks: the trucks, empty and at the hub
+    :type trucks: list
+    :param ready_times: the time each truck is first ready to leave, in the same order
+    :type ready_times: list
+    :param num_drivers: the number of drivers
+    :type num_drivers: int
+    :param speed: the truck speed in miles per minute
+    :type speed: float
+    :param end_time: the time to end the simulation
+    :type end_time: int
+    :param recorder: optional recorder of the day's events, such as a DeliveryTimeline
+    :type recorder: DeliveryTimeline
+    :param improve: optional, shorten the greedy routes with local search (default False)
+    :type improve: bool
+    :param exact: optional, solve the routes of small loads exactly, and the others as with
+        improve (default False)
+    :type exact: bool
+    :param day_end: optional time no trip may leave after (default midnight, see plan_loads)
+    :type day_end: int
+    :return: earlier time of: end_time or time all routes have been completed
+    :rtype: int
+    :raises ValueError: if the packages cannot all be planned on trips (see plan_loads)
+    """
+    if exact:
+        route_planner = plan_exact_route
     else:
-        next_time = trip2
-
-    # truck 3 leaves at 9:50am or whenever a driver is available, whichever is later
-    t3_leave = datetime.datetime.strptime('0950', "%H%M")
-    if end_time < t3_leave:
-        return end_time
-    if next_time < t3_leave:
-        next_time = t3_leave
-
-    for m in p3:
-        truck_3.load_package(hash_table.search(m))
-    trip3 = run_route(truck_3, next_time, end_time)
-
-    done_time = trip1
-    if trip2 > done_time:
-        done_time = trip2
-    if trip3 > done_time:
-        done_time = trip3
-    return done_time
+        route_planner = plan_improved_route if improve else plan_route
+    simulation = DeliverySimulation(graph, num_drivers, speed, route_planner=route_planner, recorder=recorder,
+                                    start_time=min(ready_times, default=None))
+    for truck, trip_packages, ready_time in plan_loads(graph, packages, trucks, ready_times, num_drivers, speed,
+                                                       day_end=day_end):
+        simulation.add_trip(truck, trip_packages, ready_time)
+    return simulation.run(end_time)
 
 
 def validate_time_input(prnt):
     """
-    Validates user input of a string in HHMM format and converts it to a datetime.
+    Validates user input of a string in HHMM format and converts it to seconds after midnight.
+    Only times on the day itself, before 24:00, are accepted.
 
     :param prnt: string to change text displayed to the user
     :type prnt: str
-    :return: the time entered by the user converted to datetime
-    :rtype: datetime.datetime
+    :return: the time entered by the user in seconds after midnight
+    :rtype: int
     """
     inp_time = None
     while inp_time is None:
         try:
             prt_str = "Input a time to see " + prnt + ", 24-hr clock format(HHMM) (ex: 0935 or 1632): "
-            inp_time = datetime.datetime.strptime(input(prt_str), "%H%M")
+            entered = parse_clock(input(prt_str))
+            if entered >= SECONDS_PER_DAY:      # the same range as BatchQuery.parse_query_time
+                raise ValueError("invalid time")
+            inp_time = entered
             if inp_time <= start_time:
                 inp_time = None
                 print("Enter a time after 0800")
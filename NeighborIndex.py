@@ -0,0 +1,149 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import heapq
+from array import array
+
+try:
+    import numpy
+except ImportError:     # NumPy is optional, the lists are then selected in pure Python
+    numpy = None
+
+NEIGHBOR_COUNT = 32     # nearest locations kept for each location
+
+
+class NeighborIndex:
+    """
+    A class that keeps, for each location, its nearest locations sorted by distance, so
+    a greedy route can find the nearest stop still to visit by walking a short list instead of
+    measuring the distance to every stop.
+
+    The lists are cut to the k nearest locations, including the location itself at distance 0,
+    and ties are sorted by location ID.  A nearest stop query walks the list of the current
+    location and checks each neighbor in a table of the stops still to visit; when the list does
+    not settle the answer it falls back to measuring every stop left.  The table is kept by the
+    index and cleared after each route, so an index must not be used by two threads at once.
+
+    Attributes
+    ----------
+    k : int
+        the length of the neighbor lists
+    neighbors : list
+        location ID -> array of the IDs of the k nearest locations, nearest first
+    distances : list
+        location ID -> array of the distances to the same locations
+    matrix : list
+        the distance matrix the lists were built from, matrix[i][j] the distance from location i
+        to location j
+
+    Methods
+    --------
+    greedy_order(start_loc, stops)
+        Returns the stops in the order of a nearest-stop-first route.
+    """
+
+    def __init__(self, graph, k=NEIGHBOR_COUNT, matrix=None):
+        """
+        Constructor for the NeighborIndex class.  Builds the lists from a distance matrix of a
+        graph, in O(n log k) per location (a partial sort per row with NumPy).
+
+        :param graph: graph of the distances between locations
+        :type graph: Graph
+        :param k: optional length of the neighbor lists (default NEIGHBOR_COUNT)
+        :type k: int
+        :param matrix: optional rows of distances by location ID (default the graph's shortest
+            distances)
+        :type matrix: list
+        """
+        self.matrix = graph.shortest if matrix is None else matrix
+        self._locations = graph.get_locations()
+        size = len(self._locations)
+        self.k = min(k, size)
+        self.neighbors = []
+        self.distances = []
+        for i in range(size):
+            row = self.matrix[i]
+            if numpy is not None and self.k < size:
+                values = numpy.asarray(row, dtype=numpy.float64)
+                nearest = numpy.argpartition(values, self.k - 1)[:self.k]
+                nearest = nearest[numpy.lexsort((nearest, values[nearest]))].tolist()
+            else:
+                nearest = heapq.nsmallest(self.k, range(size), key=row.__getitem__)
+            self.neighbors.append(array('l', nearest))
+            self.distances.append(array('d', [row[j] for j in nearest]))
+        self._rank = [0] * size     # location ID -> position among the stops still to visit, from 1
+
+    def greedy_order(self, start_loc, stops):
+        """
+        Returns the stops in the order of a route that starts at a location and always goes to
+        the nearest stop still to visit, ties going to the stop listed first: the same order as
+        measuring the distance to every stop left at each step.
+
+        :param start_loc: the location the route starts from
+        :type start_loc: Location
+        :param stops: the locations to visit, without repeats
+        :type stops: list
+        :return: the stops in visiting order
+        :rtype: list
+        """
+        rank = self._rank
+        locations = self._locations
+        pending = {}        # location -> None, the stops still to visit in the order listed
+        for i, location in enumerate(stops, 1):
+            rank[location.loc_id] = i
+            pending[location] = None
+        complete = self.k == len(locations)
+        order = []
+        curr_id = start_loc.loc_id
+        try:
+            while pending:
+                best_id = self._nearest(curr_id, complete)
+                if best_id < 0:
+                    best_id = self._scan(curr_id, pending)
+                location = locations[best_id]
+                rank[best_id] = 0
+                del pending[location]
+                order.append(location)
+                curr_id = best_id
+        finally:
+            for location in pending:
+                rank[location.loc_id] = 0
+        return order
+
+    def _nearest(self, curr_id, complete):
+        """
+        Returns the ID of the nearest stop to visit from the neighbor list of a location, or -1
+        when the list does not settle it: no stop is in the list, or the stops as near as the
+        nearest one might go on past the end of the list.
+        """
+        rank = self._rank
+        neighbors = self.neighbors[curr_id]
+        distances = self.distances[curr_id]
+        count = len(neighbors)
+        for j in range(count):
+            best_rank = rank[neighbors[j]]
+            if best_rank:
+                best_id = neighbors[j]
+                nearest = distances[j]
+                j += 1
+                while j < count and distances[j] == nearest:
+                    other = rank[neighbors[j]]
+                    if other and other < best_rank:
+                        best_id, best_rank = neighbors[j], other
+                    j += 1
+                if j == count and not complete:
+                    return -1
+                return best_id
+        return -1
+
+    def _scan(self, curr_id, pending):
+        """
+        Returns the ID of the nearest stop to visit by measuring the distance to every stop left.
+        """
+        row = self.matrix[curr_id]
+        best_id = -1
+        best_dist = 0.0
+        for location in pending:
+            dist = row[location.loc_id]
+            if best_id < 0 or dist < best_dist:
+                best_id, best_dist = location.loc_id, dist
+        return best_id
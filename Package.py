@@ -1,9 +1,213 @@
 # Jennifer Pillow pillje@hotmail.com
 
+import re
+from array import array
+
+# Package status codes
+STATUS_AT_HUB = 0
+STATUS_EN_ROUTE = 1
+STATUS_DELIVERED = 2
+STATUS_NAMES = ("AT HUB", "EN ROUTE", "DELIVERED")
+
+ANY_TRUCK = -1          # truck mask of packages that may go on any truck
+
+# Simulation clock: times are whole seconds after midnight of the first day
+SECONDS_PER_MINUTE = 60
+SECONDS_PER_HOUR = 60 * SECONDS_PER_MINUTE
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+EOD_TIME = SECONDS_PER_DAY      # deadline of packages due by the end of the day
+
+_TRUCK_NOTE = re.compile(r"only be on truck (\d+)", re.IGNORECASE)
+_TOGETHER_NOTE = re.compile(r"delivered with ([\d,\s]+)", re.IGNORECASE)
+_AVAILABLE_NOTE = re.compile(r"(?:until|after) (\d{1,2}):(\d{2})\s*(am|pm)?", re.IGNORECASE)
+_CLOCK = re.compile(r"^(\d{1,3}):?([0-5]\d)(?::([0-5]\d))?$")
+
+
+def parse_status(status):
+    """
+    Returns the status code for a status string such as "AT HUB", "EN ROUTE ON TRUCK 2",
+    "Delivered at 09:15:00", or one of the STATUS_NAMES.  Status codes are returned unchanged.
+
+    :param status: the status string or code
+    :type status: str
+    :return: the status code
+    :rtype: int
+    """
+    if isinstance(status, int):
+        return status
+    status = status.strip().upper()
+    if status.startswith("EN ROUTE"):
+        return STATUS_EN_ROUTE
+    if status.startswith("DELIVERED"):
+        return STATUS_DELIVERED
+    if status == "AT HUB":
+        return STATUS_AT_HUB
+    raise ValueError("unknown package status: " + status)
+
+
+def parse_deadline(deadline):
+    """
+    Returns a delivery deadline such as "10:30 AM" or "EOD" as seconds after midnight, on the
+    same clock as delivery times.  Deadlines already given in seconds are returned unchanged.
+
+    :param deadline: the deadline string or seconds
+    :type deadline: str
+    :return: the deadline in seconds after midnight, EOD_TIME for an end of day deadline
+    :rtype: int
+    """
+    if isinstance(deadline, int):
+        return deadline
+    deadline = deadline.strip().upper()
+    if deadline in ("EOD", ""):
+        return EOD_TIME
+    clock, _, meridiem = deadline.partition(" ")
+    hours, _, minutes = clock.partition(":")
+    hours = int(hours)
+    minutes = int(minutes) if minutes else 0
+    if not (0 <= hours < 24 and 0 <= minutes < 60) or meridiem not in ("", "AM", "PM"):
+        raise ValueError("invalid deadline: " + deadline)
+    if meridiem == "PM" and hours < 12:
+        hours += 12
+    elif meridiem == "AM" and hours == 12:
+        hours = 0
+    return hours * SECONDS_PER_HOUR + minutes * SECONDS_PER_MINUTE
+
+
+def parse_notes(notes):
+    """
+    Compiles the constraints in package notes such as "Can only be on truck 2", "Delayed on
+    flight---will not arrive to depot until 9:05 am", "Deliver after 10:20" or "Must be delivered
+    with 13, 15".
+
+    :param notes: the package notes
+    :type notes: str
+    :return: a tuple of (truck mask, available minutes, together): the bitmask of the truck IDs
+        the package may go on (ANY_TRUCK for any truck), the time the package can leave the hub in
+        minutes after midnight, and the IDs of the packages it must be delivered with
+    :rtype: tuple
+    :raises ValueError: if a time in the notes is not a time of the day
+    """
+    truck_mask = ANY_TRUCK
+    for match in _TRUCK_NOTE.finditer(notes):
+        bit = 1 << int(match.group(1))
+        truck_mask = bit if truck_mask == ANY_TRUCK else truck_mask | bit
+    available = 0
+    match = _AVAILABLE_NOTE.search(notes)
+    if match:
+        hours, minutes = divmod(parse_clock(match.group(1) + match.group(2)) // SECONDS_PER_MINUTE, 60)
+        meridiem = (match.group(3) or "").lower()
+        if meridiem and not 1 <= hours <= 12:
+            raise ValueError("invalid time in notes: " + repr(match.group(0)))
+        if meridiem == "pm" and hours < 12:
+            hours += 12
+        elif meridiem == "am" and hours == 12:
+            hours = 0
+        if hours >= 24:
+            raise ValueError("invalid time in notes: " + repr(match.group(0)))
+        available = hours * 60 + minutes
+    together = ()
+    match = _TOGETHER_NOTE.search(notes)
+    if match:
+        together = tuple(int(package_id) for package_id in re.findall(r"\d+", match.group(1)))
+    return truck_mask, available, together
+
+
+def link_delivery_groups(packages):
+    """
+    Numbers the groups of packages that must be delivered together, following the together IDs
+    of every package, and sets each package's group_id.  Packages in no group get group_id 0.
+
+    :param packages: all the packages of the day
+    :type packages: iterable
+    :return: the number of groups
+    :rtype: int
+    """
+    packages = list(packages)
+    parent = {}
+
+    def find(package_id):
+        parent.setdefault(package_id, package_id)
+        while parent[package_id] != package_id:
+            parent[package_id] = parent[parent[package_id]]
+            package_id = parent[package_id]
+        return package_id
+
+    known = {package.package_id for package in packages}
+    for package in packages:
+        for other_id in package.together:
+            if other_id in known:
+                parent[find(other_id)] = find(package.package_id)
+
+    group_ids = {}
+    for package in packages:
+        package.group_id = 0
+        if package.package_id in parent:
+            package.group_id = group_ids.setdefault(find(package.package_id), len(group_ids) + 1)
+    return len(group_ids)
+
+
+def parse_clock(text):
+    """
+    Returns a time written as HHMM, HH:MM or HH:MM:SS as seconds after midnight.  Hours past 23
+    are times on the following days, e.g. "3200" is 8:00am of the second day.
+
+    :param text: the time
+    :type text: str
+    :return: the time in seconds after midnight of the first day
+    :rtype: int
+    :raises ValueError: if the time is not in one of the formats
+    """
+    match = _CLOCK.match(text.strip())
+    if match is None:
+        raise ValueError("invalid time: " + repr(text))
+    hours, minutes, seconds = match.groups()
+    return int(hours) * SECONDS_PER_HOUR + int(minutes) * SECONDS_PER_MINUTE + int(seconds or 0)
+
+
+def format_time(seconds):
+    """
+    Formats a time given in seconds after midnight as HH:MM:SS.  Times on the following days
+    keep counting the hours, e.g. 32:00:00 for 8:00am of the second day.
+
+    :param seconds: the time in seconds after midnight
+    :type seconds: int
+    :return: the formatted time
+    :rtype: str
+    """
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{:02d}:{:02d}:{:02d}".format(hours, minutes, secs)
+
+
+def format_status(status_code, truck_id, delivery_time):
+    """
+    Returns the display status for a status code, e.g. "EN ROUTE ON TRUCK 2" or
+    "Delivered at 09:15:00".
+
+    :param status_code: the status code
+    :type status_code: int
+    :param truck_id: the ID of the truck carrying the package
+    :type truck_id: int
+    :param delivery_time: the delivery time in seconds after midnight
+    :type delivery_time: int
+    :return: the display status
+    :rtype: str
+    """
+    if status_code == STATUS_EN_ROUTE:
+        return "EN ROUTE ON TRUCK " + str(truck_id)
+    if status_code == STATUS_DELIVERED:
+        return "Delivered at " + format_time(delivery_time)
+    return "AT HUB"
+
+
 class Package:
     """
     A class used to represent a package to be delivered.
 
+    Uses __slots__ so each package is a small fixed-size record, and keeps its status as an
+    integer code with the truck ID and delivery time.  The status string is only built when it
+    is displayed.
+
     Attributes
     ----------
     package_id : int
@@ -17,20 +221,63 @@ class Package:
     zipcode : str
         the zipcode for delivery of the package
     deadline : str
-        the time the package must be delivered by
+        the time the package must be delivered by, as given
+    deadline_time : int
+        the deadline in seconds after midnight, on the clock of delivery_time (EOD_TIME for end
+        of day)
     weight : int
         the weight of the package
     notes : str
         special notes providing constraints for the package
+    truck_mask : int
+        bitmask of the IDs of the trucks the package may go on, ANY_TRUCK for any truck
+    available_minutes : int
+        the time the package can leave the hub in minutes after midnight, 0 if it is at the hub
+    together : tuple
+        the IDs of the packages the notes say it must be delivered with
+    group_id : int
+        the number of the group of packages it must be delivered with, 0 for none (see
+        link_delivery_groups)
+    status_code : int
+        STATUS_AT_HUB, STATUS_EN_ROUTE or STATUS_DELIVERED
+    truck_id : int
+        the ID of the truck the package was loaded on, 0 if it has not been loaded
+    delivery_time : int
+        the delivery time in seconds after midnight, -1 if it has not been delivered
     status : str
-        the status of the package (default 'AT HUB')
+        the status of the package for display, e.g. "EN ROUTE ON TRUCK 2" (read only)
+    location : Location
+        the delivery location resolved from the address when the package is loaded (default None)
+    table : HashTable
+        the hash table to notify when the status, address or deadline changes, so it can update
+        its secondary indexes and columns
 
     Methods
     ---------
+    set_status(status_code, truck_id, delivery_time)
+        Changes the status of the package.
+    set_address(address, location)
+        Changes the delivery address of the package.
+    set_deadline(deadline)
+        Changes the delivery deadline of the package.
+    load(truck_id)
+        Marks the package as en route on a truck.
+    deliver(delivery_time)
+        Marks the package as delivered.
+    reset()
+        Marks the package as back at the hub.
+    can_go_on(truck_id)
+        Returns whether the package may go on a truck.
+    describe(status)
+        Returns a formatted string representation of the package with the given status.
     __repr()
         Returns a formatted string representation of the package.
     """
 
+    __slots__ = ('package_id', 'address', 'city', 'state', 'zipcode', 'deadline', 'deadline_time',
+                 'weight', 'notes', 'truck_mask', 'available_minutes', 'together', 'group_id',
+                 'status_code', 'truck_id', 'delivery_time', 'location', 'table')
+
     def __init__(self, package_id, address, city, state, zipcode, deadline, weight, notes, status='AT HUB'):
         """
         Constructor for the Package class.
@@ -57,12 +304,111 @@ class Package:
         self.package_id = package_id
         self.address = address
         self.deadline = deadline
+        self.deadline_time = parse_deadline(deadline)
         self.city = city
         self.zipcode = zipcode
-        self.weight = weight
-        self.status = status
+        self.weight = int(weight)
+        self.table = None
+        self.status_code = parse_status(status)
+        self.truck_id = 0
+        self.delivery_time = -1
         self.notes = notes
+        self.truck_mask, self.available_minutes, self.together = parse_notes(notes)
+        self.group_id = 0
         self.state = state
+        self.location = None
+
+    @property
+    def status(self):
+        """
+        The status of the package for display.
+
+        :return: the status of the package
+        :rtype: str
+        """
+        return format_status(self.status_code, self.truck_id, self.delivery_time)
+
+    def set_status(self, status_code, truck_id=0, delivery_time=-1):
+        """
+        Changes the status of the package and notifies the hash table holding it.
+
+        :param status_code: the new status code
+        :type status_code: int
+        :param truck_id: optional ID of the truck carrying the package
+        :type truck_id: int
+        :param delivery_time: optional delivery time in seconds after midnight
+        :type delivery_time: int
+        """
+        old_code = self.status_code
+        self.status_code = status_code
+        self.truck_id = truck_id
+        self.delivery_time = delivery_time
+        if self.table is not None:
+            self.table.status_changed(self, old_code)
+
+    def set_address(self, address, location=None):
+        """
+        Changes the delivery address of the package and notifies the hash table holding it.
+
+        :param address: the new street address
+        :type address: str
+        :param location: optional delivery location of the address
+        :type location: Location
+        """
+        old_address = self.address
+        self.address = address
+        self.location = location
+        if self.table is not None:
+            self.table.index_changed(self, 'address', old_address)
+
+    def set_deadline(self, deadline):
+        """
+        Changes the delivery deadline of the package and notifies the hash table holding it.
+
+        :param deadline: the new deadline, e.g. "10:30 AM" or "EOD"
+        :type deadline: str
+        :raises ValueError: if the deadline cannot be parsed
+        """
+        old_time = self.deadline_time
+        self.deadline_time = parse_deadline(deadline)
+        self.deadline = deadline
+        if self.table is not None:
+            self.table.index_changed(self, 'deadline', old_time)
+
+    def load(self, truck_id):
+        """
+        Marks the package as en route on a truck.
+
+        :param truck_id: the ID of the truck the package is loaded on
+        :type truck_id: int
+        """
+        self.set_status(STATUS_EN_ROUTE, truck_id)
+
+    def deliver(self, delivery_time):
+        """
+        Marks the package as delivered.
+
+        :param delivery_time: the delivery time in seconds after midnight
+        :type delivery_time: int
+        """
+        self.set_status(STATUS_DELIVERED, self.truck_id, delivery_time)
+
+    def reset(self):
+        """
+        Marks the package as back at the hub.
+        """
+        self.set_status(STATUS_AT_HUB)
+
+    def can_go_on(self, truck_id):
+        """
+        Returns whether the package may go on a truck.
+
+        :param truck_id: the truck ID
+        :type truck_id: int
+        :return: True if the notes allow the truck
+        :rtype: bool
+        """
+        return self.truck_mask >> truck_id & 1 == 1
 
     def __repr__(self):
         """
@@ -71,10 +417,155 @@ class Package:
         Returned string includes the package_id, full address, the package weight, and the status.
         Overrides the default __repr__(self) method.
 
+        :return: a formatted string representation of the package
+        :rtype: str
+        """
+        return self.describe(self.status)
+
+    def describe(self, status):
+        """
+        Returns a formatted string representation of the package with the given status, such as
+        the status looked up for an earlier time of day.
+
+        :param status: the status to show
+        :type status: str
         :return: a formatted string representation of the package
         :rtype: str
         """
         ret_string = "(ID: {}".format(self.package_id)
         ret_string += " Address: " + self.address + " " + self.city + ", " + self.state
-        ret_string += " " + self.zipcode + " Weight: " + self.weight + " Status: " + self.status + ")"
+        ret_string += " " + self.zipcode + " Weight: " + str(self.weight) + " Status: " + status + ")"
         return ret_string
+
+
+class PackageColumns:
+    """
+    A class that holds the fields of many packages as columns of typed arrays, one array element
+    per package, for fast scans over a whole day of packages.
+
+    The Package records stay the store of package state, and the columns mirror them: a row is
+    rewritten with update() and dropped with remove(), which moves the last row into its place.
+    The columns returned by HashTable.to_columns() are kept up to date this way by the table,
+    from the same notifications that update its secondary indexes.
+
+    Attributes
+    ----------
+    package_id : array
+        the package IDs
+    status_code : array
+        the status codes
+    truck_id : array
+        the truck IDs, 0 for packages that have not been loaded
+    delivery_time : array
+        the delivery times in seconds after midnight, -1 for packages not delivered
+    deadline_time : array
+        the deadlines in seconds after midnight
+    weight : array
+        the package weights
+    rows : dict
+        package ID -> row number
+
+    Methods
+    --------
+    append(package)
+        Adds a row for a package.
+    update(package)
+        Rewrites the row of a package from its current fields.
+    remove(package_id)
+        Removes the row of a package.
+    status_histogram()
+        Returns the number of packages with each status.
+    late_count()
+        Returns the number of packages delivered after their deadline.
+    """
+
+    def __init__(self, packages=()):
+        """
+        Constructor for the PackageColumns class.
+
+        :param packages: optional packages to add
+        :type packages: iterable
+        """
+        self.package_id = array('l')
+        self.status_code = array('b')
+        self.truck_id = array('h')
+        self.delivery_time = array('l')
+        self.deadline_time = array('l')
+        self.weight = array('l')
+        self.rows = {}
+        for package in packages:
+            self.append(package)
+
+    def __len__(self):
+        """
+        Returns the number of packages.
+
+        :return: the number of packages
+        :rtype: int
+        """
+        return len(self.package_id)
+
+    def append(self, package):
+        """
+        Adds a row for a package.
+
+        :param package: the package to add
+        :type package: Package
+        """
+        self.rows[package.package_id] = len(self.package_id)
+        self.package_id.append(package.package_id)
+        self.status_code.append(package.status_code)
+        self.truck_id.append(package.truck_id)
+        self.delivery_time.append(package.delivery_time)
+        self.deadline_time.append(package.deadline_time)
+        self.weight.append(package.weight)
+
+    def update(self, package):
+        """
+        Rewrites the row of a package from its current status, deadline and weight.
+
+        :param package: the package that changed
+        :type package: Package
+        """
+        row = self.rows[package.package_id]
+        self.status_code[row] = package.status_code
+        self.truck_id[row] = package.truck_id
+        self.delivery_time[row] = package.delivery_time
+        self.deadline_time[row] = package.deadline_time
+        self.weight[row] = package.weight
+
+    def remove(self, package_id):
+        """
+        Removes the row of a package by moving the last row into its place.
+
+        :param package_id: the package ID
+        :type package_id: int
+        """
+        row = self.rows.pop(package_id)
+        last = len(self.package_id) - 1
+        for column in (self.package_id, self.status_code, self.truck_id, self.delivery_time,
+                       self.deadline_time, self.weight):
+            column[row] = column[last]
+            column.pop()
+        if row != last:
+            self.rows[self.package_id[row]] = row
+
+    def status_histogram(self):
+        """
+        Returns the number of packages with each status.  Each count is a single scan of the
+        status column's bytes.
+
+        :return: a dictionary of status name -> number of packages
+        :rtype: dict
+        """
+        codes = self.status_code.tobytes()
+        return {name: codes.count(code) for code, name in enumerate(STATUS_NAMES)}
+
+    def late_count(self):
+        """
+        Returns the number of packages delivered after their deadline.
+
+        :return: the number of late packages
+        :rtype: int
+        """
+        return sum(1 for delivered, deadline in zip(self.delivery_time, self.deadline_time) if delivered > deadline)
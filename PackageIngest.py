@@ -0,0 +1,254 @@
+# Jennifer Pillow pillje@hotmail.com
+# Streams package CSV files into a package hash table in chunks, validating and normalizing each
+# row and reporting the rows that are rejected.
+#
+# Usage: python PackageIngest.py package_file [--chunk-size N] [--rejects rejects.csv]
+
+import argparse
+import csv
+import gc
+import re
+import time
+from HashTable import HashTable
+from Package import Package, EOD_TIME, SECONDS_PER_MINUTE, parse_deadline, link_delivery_groups
+from Profiler import profiled
+
+CHUNK_SIZE = 10000      # rows parsed and inserted at a time
+MAX_KEPT_REJECTS = 100  # rejected rows kept in memory for the report; the rest are only counted
+REJECT_FIELDS = ("line", "reason")    # header of the reject file, each followed by the fields of the row
+
+_ZIPCODE = re.compile(r"^(\d{5})(?:-?(\d{4}))?$")
+
+
+class RowError(ValueError):
+    """
+    Raised for a package row that cannot be ingested, with the reason.
+    """
+
+
+class IngestReport:
+    """
+    A class that reports the result of ingesting a package file.
+
+    Attributes
+    ----------
+    rows_read : int
+        the number of data rows read, not counting a header row
+    accepted : int
+        the number of packages inserted
+    rejected : int
+        the number of rows rejected
+    rejects : list
+        the first MAX_KEPT_REJECTS rejected rows as (line number, reason, row) tuples
+    seconds : float
+        the time taken
+    rows_per_second : float
+        the number of rows read per second (read only)
+    """
+
+    def __init__(self):
+        """
+        Constructor for the IngestReport class.
+        """
+        self.rows_read = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.rejects = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        """
+        The number of rows read per second.
+
+        :return: the ingestion rate
+        :rtype: float
+        """
+        return self.rows_read / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        """
+        Returns a one-line summary of the report.
+
+        :return: the summary
+        :rtype: str
+        """
+        return "{} rows read, {} accepted, {} rejected in {:.3f}s ({:,.0f} rows/s)".format(
+            self.rows_read, self.accepted, self.rejected, self.seconds, self.rows_per_second)
+
+
+def read_chunks(package_file, chunk_size=CHUNK_SIZE):
+    """
+    Reads a package CSV file as a stream of chunks, so only one chunk of rows is in memory at a
+    time.  A first row whose ID is not a number is taken as a header and skipped.
+
+    :param package_file: path of the package CSV file
+    :type package_file: str
+    :param chunk_size: optional number of rows per chunk
+    :type chunk_size: int
+    :return: a generator of lists of (line number, row) pairs
+    :rtype: generator
+    """
+    with open(package_file, 'r', newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        chunk = []
+        for row in reader:
+            if reader.line_num == 1 and row and not row[0].strip().isdigit():
+                continue
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def normalize_row(row):
+    """
+    Validates a package row and returns a Package with normalized fields: surrounding and repeated
+    whitespace removed, state in upper case, zipcode as 12345 or 12345-6789, deadline as
+    "10:30 AM" or "EOD" and weight as a whole number of pounds, at least one.  The times in
+    the notes must be valid times of the day.
+
+    :param row: the fields ID, address, city, state, zipcode, deadline, weight and optional notes
+    :type row: list
+    :return: the package
+    :rtype: Package
+    :raises RowError: if a field is missing or invalid
+    """
+    if len(row) < 7:
+        raise RowError("expected at least 7 fields, got {}".format(len(row)))
+    fields = [" ".join(field.split()) for field in row[:8]]
+    package_id, address, city, state, zipcode, deadline, weight = fields[:7]
+    notes = fields[7] if len(fields) > 7 else ""
+
+    if not package_id.isdigit() or int(package_id) == 0:
+        raise RowError("invalid package ID: " + repr(package_id))
+    if not address:
+        raise RowError("missing address")
+    match = _ZIPCODE.match(zipcode)
+    if match is None:
+        raise RowError("invalid zipcode: " + repr(zipcode))
+    zipcode = match.group(1) + ("-" + match.group(2) if match.group(2) else "")
+    try:
+        deadline_time = parse_deadline(deadline)
+    except ValueError:
+        raise RowError("invalid deadline: " + repr(deadline)) from None
+    try:
+        weight = float(weight)
+    except ValueError:
+        raise RowError("invalid weight: " + repr(weight)) from None
+    if not 0 < weight < float("inf"):
+        raise RowError("invalid weight: " + repr(fields[6]))
+    if round(weight) < 1:
+        raise RowError("weight under one pound: " + repr(fields[6]))
+
+    try:
+        return Package(int(package_id), address, city, state.upper(), zipcode, _format_deadline(deadline_time),
+                       round(weight), notes)
+    except ValueError:
+        raise RowError("invalid notes: " + repr(notes)) from None
+
+
+@profiled("ingest_packages")
+def ingest_packages(package_file, table, graph=None, chunk_size=CHUNK_SIZE, reject_file=None):
+    """
+    Streams a package CSV file into a hash table.  Each chunk of rows is validated and normalized,
+    the delivery locations are resolved in the graph, and the valid packages are bulk-inserted.
+    Rejected rows, including package IDs already in the table and addresses not in the graph,
+    are counted, the first MAX_KEPT_REJECTS are kept in the report and all are written to the
+    reject file if one is given.  When the whole file is read the groups of packages that must
+    be delivered together are linked.
+
+    Besides the table, the memory used is one chunk of rows, so it does not grow with the size of
+    the file.
+
+    :param package_file: path of the package CSV file
+    :type package_file: str
+    :param table: the hash table to insert the packages into
+    :type table: HashTable
+    :param graph: optional graph to resolve the delivery locations in
+    :type graph: Graph
+    :param chunk_size: optional number of rows per chunk
+    :type chunk_size: int
+    :param reject_file: optional path of a CSV file to write the rejected rows to
+    :type reject_file: str
+    :return: the ingestion report
+    :rtype: IngestReport
+    """
+    report = IngestReport()
+    begin = time.perf_counter()
+    reject_out = open(reject_file, 'w', newline='') if reject_file is not None else None
+    try:
+        reject_writer = None
+        if reject_out is not None:
+            reject_writer = csv.writer(reject_out)
+            reject_writer.writerow(REJECT_FIELDS)
+        for chunk in read_chunks(package_file, chunk_size):
+            report.rows_read += len(chunk)
+            accepted = []
+            chunk_ids = set()
+            for line, row in chunk:
+                try:
+                    package = normalize_row(row)
+                    if package.package_id in chunk_ids or table.search(package.package_id) is not None:
+                        raise RowError("duplicate package ID: {}".format(package.package_id))
+                    if graph is not None:
+                        package.location = graph.search_location(package.address)
+                        if package.location is None:
+                            raise RowError("unknown delivery address: " + repr(package.address))
+                except RowError as error:
+                    report.rejected += 1
+                    if len(report.rejects) < MAX_KEPT_REJECTS:
+                        report.rejects.append((line, str(error), row))
+                    if reject_writer is not None:
+                        reject_writer.writerow([line, str(error)] + row)
+                    continue
+                chunk_ids.add(package.package_id)
+                accepted.append(package)
+            report.accepted += table.bulk_insert(accepted)
+    finally:
+        if reject_out is not None:
+            reject_out.close()
+    link_delivery_groups(table)
+    report.seconds = time.perf_counter() - begin
+    return report
+
+
+def _format_deadline(deadline_time):
+    """
+    Formats a deadline in seconds after midnight as "10:30 AM", or "EOD" for the end of the day.
+    """
+    if deadline_time >= EOD_TIME:
+        return "EOD"
+    hours, minutes = divmod(deadline_time // SECONDS_PER_MINUTE, 60)
+    return "{}:{:02d} {}".format((hours - 1) % 12 + 1, minutes, "AM" if hours < 12 else "PM")
+
+
+def main(argv=None):
+    """
+    Ingests a package file into an empty hash table and prints the report.
+    """
+    parser = argparse.ArgumentParser(description="Validate and load a package CSV file.")
+    parser.add_argument("package_file", help="package CSV file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--rejects", default=None, help="CSV file for the rejected rows")
+    args = parser.parse_args(argv)
+
+    # the new packages are all kept, so collecting while they are created is wasted work; the
+    # collector is only paused here, where the process does nothing else
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        report = ingest_packages(args.package_file, HashTable(), chunk_size=args.chunk_size,
+                                 reject_file=args.rejects)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    print(report)
+    for line, reason, row in report.rejects[:10]:
+        print("  line {}: {}".format(line, reason))
+
+
+if __name__ == "__main__":
+    main()
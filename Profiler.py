@@ -0,0 +1,272 @@
+# Jennifer Pillow pillje@hotmail.com
+# Opt-in profiling of the delivery program: wall time and calls of each phase, and counters of
+# the hot-path operations.  Exports JSON and collapsed stacks for flame graph tools.
+#
+# Usage: python Profiler.py [--output profile] [--improve]
+
+import argparse
+import functools
+import json
+import time
+
+COUNTERS = (
+    # (module, class, method, counter name)
+    ("DistanceGraph", "Graph", "get_distance", "distance_lookups"),
+    ("DistanceGraph", "Graph", "search_location", "address_searches"),
+    ("HashTable", "HashTable", "search", "package_searches"),
+    ("Truck", "Truck", "load_package", "package_loads"),
+    ("Truck", "Truck", "deliver_package", "package_deliveries"),
+    ("Truck", "Truck", "deliver_stop", "stop_deliveries"),
+)
+
+_active = None      # the enabled Profiler, None when profiling is off
+_originals = {}     # (class, method name) -> the method replaced by a counting wrapper
+
+
+class Profiler:
+    """
+    A class that records the wall time and number of calls of each phase of the program, keyed by
+    the stack of phases it ran in, and named event counters.
+
+    Attributes
+    ----------
+    phases : dict
+        tuple of phase names from the outermost -> [calls, seconds]
+    counters : dict
+        counter name -> count
+
+    Methods
+    --------
+    phase(name)
+        Returns a context manager that times a phase.
+    count(name, amount)
+        Adds to a counter.
+    to_dict()
+        Returns the phases and counters as a dictionary for JSON.
+    write_json(path)
+        Writes the phases and counters to a JSON file.
+    write_collapsed(path)
+        Writes the phases as collapsed stacks for flame graph tools.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the Profiler class.
+        """
+        self.phases = {}
+        self.counters = {}
+        self._stack = []
+
+    def phase(self, name):
+        """
+        Returns a context manager that times a phase, nested in the phases already running.
+
+        :param name: the phase name
+        :type name: str
+        :return: the context manager
+        :rtype: _Phase
+        """
+        return _Phase(self, name)
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter.
+
+        :param name: the counter name
+        :type name: str
+        :param amount: optional amount to add (default 1)
+        :type amount: int
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        """
+        Returns the phases and counters as a dictionary for JSON.  Each phase has its stack path,
+        calls, total seconds and self seconds (not spent in nested phases).
+
+        :return: a dictionary with "phases" and "counters"
+        :rtype: dict
+        """
+        self_seconds = self._self_seconds()
+        phases = [{"path": list(path), "calls": calls, "seconds": round(seconds, 6),
+                   "self_seconds": round(self_seconds[path], 6)}
+                  for path, (calls, seconds) in sorted(self.phases.items())]
+        return {"phases": phases, "counters": dict(sorted(self.counters.items()))}
+
+    def write_json(self, path):
+        """
+        Writes the phases and counters to a JSON file.
+
+        :param path: the file path
+        :type path: str
+        """
+        with open(path, 'w') as output:
+            json.dump(self.to_dict(), output, indent=2)
+
+    def write_collapsed(self, path):
+        """
+        Writes the phases as collapsed stacks, one "outer;inner microseconds" line per stack of
+        its self time, the input format of flamegraph.pl, speedscope and similar tools.
+
+        :param path: the file path
+        :type path: str
+        """
+        with open(path, 'w') as output:
+            for stack, seconds in sorted(self._self_seconds().items()):
+                microseconds = round(seconds * 1e6)
+                if microseconds > 0:
+                    output.write("{} {}\n".format(";".join(stack), microseconds))
+
+    def _self_seconds(self):
+        """
+        Returns the time of each phase stack less the time of the phases nested in it.
+        """
+        self_seconds = {path: seconds for path, (calls, seconds) in self.phases.items()}
+        for path, (calls, seconds) in self.phases.items():
+            if len(path) > 1 and path[:-1] in self_seconds:
+                self_seconds[path[:-1]] -= seconds
+        return {path: max(0.0, seconds) for path, seconds in self_seconds.items()}
+
+
+class _Phase:
+    """
+    Context manager that adds the wall time of a phase to its profiler.
+    """
+
+    __slots__ = ('profiler', 'name', 'begin')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.begin = 0.0
+
+    def __enter__(self):
+        self.profiler._stack.append(self.name)
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.begin
+        stack = self.profiler._stack
+        record = self.profiler.phases.setdefault(tuple(stack), [0, 0.0])
+        record[0] += 1
+        record[1] += seconds
+        stack.pop()
+        return False
+
+
+def profiled(name):
+    """
+    Decorator that times every call of a function as a phase while profiling is enabled.  When it
+    is disabled the only cost is one check per call.
+
+    :param name: the phase name
+    :type name: str
+    :return: the decorator
+    :rtype: function
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(profiler=None):
+    """
+    Starts profiling: phases are timed and the COUNTERS methods are replaced by counting wrappers
+    until disable() is called.  Without profiling the methods are the originals, so the counters
+    cost nothing.
+
+    :param profiler: optional profiler to record into (default: a new one)
+    :type profiler: Profiler
+    :return: the profiler
+    :rtype: Profiler
+    """
+    global _active
+    if _active is not None:
+        disable()
+    _active = profiler if profiler is not None else Profiler()
+    for module_name, class_name, method_name, counter in COUNTERS:
+        cls = getattr(__import__(module_name), class_name)
+        method = cls.__dict__[method_name]
+        _originals[(cls, method_name)] = method
+        setattr(cls, method_name, _counting(method, _active.counters, counter))
+    return _active
+
+
+def disable():
+    """
+    Stops profiling and restores the original methods.
+
+    :return: the profiler that was recording, None if profiling was off
+    :rtype: Profiler
+    """
+    global _active
+    for (cls, method_name), method in _originals.items():
+        setattr(cls, method_name, method)
+    _originals.clear()
+    profiler, _active = _active, None
+    return profiler
+
+
+def active():
+    """
+    Returns the profiler that is recording, None if profiling is off.
+
+    :return: the profiler
+    :rtype: Profiler
+    """
+    return _active
+
+
+def _counting(method, counters, counter):
+    """
+    Returns a wrapper of a method that adds one to a counter on every call.
+    """
+    counters.setdefault(counter, 0)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        counters[counter] += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def main(argv=None):
+    """
+    Profiles the shipped delivery day, from building the graph to the end of the day, and writes
+    <output>.json and <output>.folded.
+    """
+    parser = argparse.ArgumentParser(description="Profile the delivery day.")
+    parser.add_argument("--output", default="profile", help="output path without extension")
+    parser.add_argument("--improve", action="store_true", help="shorten routes with local search")
+    args = parser.parse_args(argv)
+
+    # run as a script this module is __main__, so enable profiling in the module the program imports
+    import Main
+    import Profiler
+    profiler = Profiler.enable()
+    try:
+        with profiler.phase("main"):
+            Main.build_graph(Main.dist_graph)
+            Main.setup_hash_table()
+            Main.reset()
+            Main.sim_day(recorder=Main.timeline, improve=args.improve)
+    finally:
+        Profiler.disable()
+    profiler.write_json(args.output + ".json")
+    profiler.write_collapsed(args.output + ".folded")
+    for entry in profiler.to_dict()["phases"]:
+        print("{:<60} {:6d} calls {:10.4f}s".format(";".join(entry["path"]), entry["calls"], entry["seconds"]))
+    for name, value in sorted(profiler.counters.items()):
+        print("{:<60} {:6d}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# Jennifer Pillow pillje@hotmail.com
+# Re-plans the rest of the delivery day when packages change mid-day: only the routes of the
+# trucks carrying changed packages are planned again, from where those trucks are.
+
+import time
+from LoadPlanner import build_units
+from Package import SECONDS_PER_MINUTE
+from Profiler import profiled
+from Routing import plan_route, travel_seconds
+
+
+class TruckState:
+    """
+    A class used to represent where a truck is in the middle of the day.  The packages still on
+    board are the packages of the truck.
+
+    Attributes
+    ----------
+    truck : Truck
+        the truck, with the packages still on board
+    location : Location
+        the location the truck is at, or the end of the leg it is driving
+    time : int
+        the time the truck is at the location, in seconds after midnight
+    miles : float
+        the miles the truck has driven when it is at the location
+    route : list
+        the locations the truck still visits after the location, in order
+    """
+
+    def __init__(self, truck, location, at_time, miles, route=None):
+        """
+        Constructor for the TruckState class.  See the class attributes for the parameters.
+        """
+        self.truck = truck
+        self.location = location
+        self.time = at_time
+        self.miles = miles
+        self.route = route if route is not None else []
+
+
+class ChangeSet:
+    """
+    A class used to represent the changes to packages to re-plan for.
+
+    Attributes
+    ----------
+    addresses : dict
+        package ID -> corrected street address
+    deadlines : dict
+        package ID -> new deadline, e.g. "10:30 AM" or "EOD"
+    arrived : list
+        the IDs of delayed packages that have reached the hub
+    """
+
+    def __init__(self, addresses=None, deadlines=None, arrived=None):
+        """
+        Constructor for the ChangeSet class.  See the class attributes for the parameters.
+        """
+        self.addresses = addresses if addresses is not None else {}
+        self.deadlines = deadlines if deadlines is not None else {}
+        self.arrived = arrived if arrived is not None else []
+
+
+class ReplanResult:
+    """
+    A class that holds the outcome of a re-plan.
+
+    Attributes
+    ----------
+    routes : dict
+        truck ID -> new route of each truck that was re-planned
+    finish : dict
+        truck ID -> (time back at the hub, total miles) of each truck that was re-planned
+    late : list
+        the IDs of packages on the re-planned routes that will be delivered after their deadline
+    pending : list
+        the arrived packages left at the hub because no truck there could take them
+    seconds : float
+        the time taken to re-plan
+    """
+
+    def __init__(self):
+        """
+        Constructor for the ReplanResult class.
+        """
+        self.routes = {}
+        self.finish = {}
+        self.late = []
+        self.pending = []
+        self.seconds = 0.0
+
+
+def snapshot(simulation, now):
+    """
+    Returns the state of every truck of a simulation that has been run to a time.  A truck
+    driving a leg is given at the end of the leg, with the miles it will have driven there.
+
+    :param simulation: the simulation, run to the time
+    :type simulation: DeliverySimulation
+    :param now: the end time the simulation was run to
+    :type now: int
+    :return: a dictionary of truck ID -> TruckState
+    :rtype: dict
+    """
+    states = {}
+    for truck_id, (truck, location, at_time, route) in simulation.truck_positions().items():
+        at_time = max(at_time, now)
+        # the miles of a leg in progress were counted up to the time the simulation stopped
+        remaining = simulation.speed * (at_time - now) / SECONDS_PER_MINUTE
+        states[truck_id] = TruckState(truck, location, at_time, truck.distance + remaining, route)
+    return states
+
+
+@profiled("replan")
+def replan(graph, states, changes, speed, at_hub=(), hub=None, route_planner=plan_route):
+    """
+    Applies a change set to the packages and plans again the routes of the affected trucks only,
+    each from the location in its state.  The states of the affected trucks are updated with
+    their new routes; the other trucks keep their routes and the packages already delivered are
+    not touched.
+
+    A package whose address or deadline changed affects the truck carrying it; the change goes
+    through the package, so the hash table holding it files it under its new address and
+    deadline.  Arrived delayed packages are loaded, in units that keep their delivery groups
+    together, on the trucks at the hub with room for them and allowed to carry them, earliest
+    ready first; the rest are left pending for a later trip.
+
+    :param graph: graph of the distances between locations, with shortest distances computed
+    :type graph: Graph
+    :param states: truck ID -> TruckState of every truck, as returned by snapshot
+    :type states: dict
+    :param changes: the changes to the packages
+    :type changes: ChangeSet
+    :param speed: the truck speed in miles per minute
+    :type speed: float
+    :param at_hub: optional packages still at the hub, including the arrived packages
+    :type at_hub: iterable
+    :param hub: optional hub location (default: the first location in the graph)
+    :type hub: Location
+    :param route_planner: optional function(graph, start_loc, packages, depart_time, speed)
+        returning the delivery locations in visiting order (default plan_route); it is given the
+        truck's manifest, which it must only read
+    :type route_planner: function
+    :return: the new routes, their finish times and miles, late and pending packages
+    :rtype: ReplanResult
+    :raises ValueError: if a changed package is not on a truck or at the hub, or a corrected
+        address is not in the graph
+    """
+    begin = time.perf_counter()
+    if hub is None:
+        hub = graph.get_locations()[0]
+    carrier = {}    # package ID -> state of the truck carrying it
+    packages = {}   # package ID -> package, for the packages on trucks and at the hub
+    for state in states.values():
+        for package in state.truck.manifest:
+            carrier[package.package_id] = state
+            packages[package.package_id] = package
+    for package in at_hub:
+        packages[package.package_id] = package
+
+    affected = {}   # truck ID -> state of a truck to re-plan
+    for package_id, address in changes.addresses.items():
+        package = _find(packages, package_id)
+        location = graph.search_location(address)
+        if location is None:
+            raise ValueError("unknown delivery address: " + repr(address))
+        package.set_address(address, location)
+        state = carrier.get(package_id)
+        if state is not None:
+            state.truck.manifest.refile(package)
+        _touch(affected, state)
+    for package_id, deadline in changes.deadlines.items():
+        package = _find(packages, package_id)
+        package.set_deadline(deadline)
+        _touch(affected, carrier.get(package_id))
+
+    result = ReplanResult()
+    if changes.arrived:
+        arrived = [_find(packages, package_id) for package_id in changes.arrived]
+        at_depot = sorted((state for state in states.values() if state.location is hub and not state.route),
+                          key=lambda state: state.time)
+        if not at_depot:
+            result.pending.extend(arrived)
+        else:
+            capacity = max(state.truck.capacity for state in at_depot)
+            for unit in sorted(build_units(arrived, capacity), key=lambda unit: unit.deadline):
+                for state in at_depot:
+                    truck = state.truck
+                    if (unit.truck_mask >> truck.truck_id & 1
+                            and truck.get_num_packages() + len(unit.packages) <= truck.capacity):
+                        for package in unit.packages:
+                            package.available_minutes = 0
+                            if not truck.load_package(package):
+                                result.pending.append(package)
+                        _touch(affected, state)
+                        break
+                else:
+                    result.pending.extend(unit.packages)
+
+    for truck_id, state in affected.items():
+        truck = state.truck
+        state.route = route_planner(graph, state.location, truck.manifest, state.time, speed)
+        result.routes[truck_id] = state.route
+        result.finish[truck_id] = _follow(graph, state, hub, speed, result.late)
+    result.seconds = time.perf_counter() - begin
+    return result
+
+
+def _find(packages, package_id):
+    """
+    Returns the package with an ID from the packages on trucks and at the hub.
+    """
+    package = packages.get(package_id)
+    if package is None:
+        raise ValueError("package {} is not on a truck or at the hub".format(package_id))
+    return package
+
+
+def _touch(affected, state):
+    """
+    Marks the truck of a state, if any, to be re-planned.
+    """
+    if state is not None:
+        affected[state.truck.truck_id] = state
+
+
+def _follow(graph, state, hub, speed, late):
+    """
+    Drives a truck along its route back to the hub, adds the IDs of packages delivered after
+    their deadline to the late list, and returns the time back at the hub and the total miles.
+    """
+    at_time = state.time
+    miles = state.miles
+    stops = {}      # location -> packages delivered there
+    for package in state.truck.manifest:
+        stops.setdefault(package.location, []).append(package)
+    curr_loc = state.location
+    for next_loc in state.route + [hub]:
+        leg = graph.get_distance(curr_loc, next_loc)
+        miles += leg
+        at_time += travel_seconds(leg, speed)
+        for package in stops.pop(next_loc, ()):
+            if at_time > package.deadline_time:
+                late.append(package.package_id)
+        curr_loc = next_loc
+    return at_time, miles
@@ -0,0 +1,279 @@
+# Jennifer Pillow pillje@hotmail.com
+# A sparse road network read from an edge list, kept in compressed sparse row (CSR) arrays, and
+# shortest distances between the delivery locations computed on demand over it.
+
+import csv
+import heapq
+from array import array
+from DistanceGraph import Location
+from Profiler import profiled
+
+INFINITY = float("inf")
+
+
+class RoadNetwork:
+    """
+    A class for a sparse, undirected road network of intersections joined by road segments.
+
+    The segments are kept in compressed sparse row arrays: the segments leaving node u are
+    targets[offsets[u]:offsets[u + 1]] with the lengths in the same places of weights.  Memory is
+    linear in the number of nodes and segments, so large networks load without building a
+    complete graph.
+
+    Attributes
+    ----------
+    node_index : dict
+        node name from the edge list -> node number
+    offsets : array
+        node number -> index of its first segment in targets and weights; one more entry at the
+        end for the total
+    targets : array
+        the node numbers at the far end of the segments
+    weights : array
+        the segment lengths in miles
+
+    Methods
+    --------
+    read_edges(edge_file)
+        Reads an edge list CSV file into a new network.
+    node(name)
+        Returns the node number of a node name.
+    distances_from(source, targets)
+        Returns the shortest distances from a node to other nodes.
+    """
+
+    def __init__(self, node_index, offsets, targets, weights):
+        """
+        Constructor for the RoadNetwork class.  See the class attributes for the parameters.
+        """
+        self.node_index = node_index
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    def __len__(self):
+        """
+        Returns the number of nodes.
+
+        :return: the number of nodes
+        :rtype: int
+        """
+        return len(self.offsets) - 1
+
+    @classmethod
+    def read_edges(cls, edge_file):
+        """
+        Reads a CSV edge list of from, to and miles rows into a new network.  Nodes are named by
+        any text and numbered in order of first appearance.  A first row whose miles are not a
+        number is taken as a header and skipped.
+
+        :param edge_file: path of the edge list CSV file
+        :type edge_file: str
+        :return: the network
+        :rtype: RoadNetwork
+        :raises ValueError: if a row does not have from, to and miles, or the miles are negative
+        """
+        node_index = {}
+        ends = array('l')       # the two node numbers of each segment, one after the other
+        miles = array('d')
+        with open(edge_file, 'r', newline='') as csv_file:
+            reader = csv.reader(csv_file)
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) < 3:
+                    raise ValueError("line {}: expected from, to and miles".format(reader.line_num))
+                try:
+                    length = float(row[2])
+                except ValueError:
+                    if reader.line_num == 1:
+                        continue
+                    raise ValueError("line {}: invalid miles: {!r}".format(reader.line_num, row[2])) from None
+                if not length >= 0:
+                    raise ValueError("line {}: invalid miles: {!r}".format(reader.line_num, row[2]))
+                for name in (row[0].strip(), row[1].strip()):
+                    number = node_index.get(name)
+                    if number is None:
+                        number = node_index[name] = len(node_index)
+                    ends.append(number)
+                miles.append(length)
+        return cls(node_index, *_to_csr(len(node_index), ends, miles))
+
+    def node(self, name):
+        """
+        Returns the node number of a node name.
+
+        :param name: the node name from the edge list
+        :type name: str
+        :return: the node number
+        :rtype: int
+        :raises KeyError: if the network has no such node
+        """
+        return self.node_index[name]
+
+    def distances_from(self, source, targets=None):
+        """
+        Returns the shortest distances from a node with Dijkstra's algorithm over the CSR arrays.
+        With targets, the search stops as soon as the distances to all of them are known, so
+        only the part of the network nearer than the farthest target is explored.
+
+        :param source: the node number to start from
+        :type source: int
+        :param targets: optional set of node numbers to find the distances to (default: all)
+        :type targets: set
+        :return: a dictionary of node number -> shortest distance for the nodes reached
+            (including every reachable target)
+        :rtype: dict
+        """
+        offsets, edge_targets, weights = self.offsets, self.targets, self.weights
+        best = {source: 0.0}
+        settled = {}
+        remaining = len(targets) if targets is not None else -1
+        heap = [(0.0, source)]
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled[node] = dist
+            if targets is not None and node in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            for edge in range(offsets[node], offsets[node + 1]):
+                adj_node = edge_targets[edge]
+                alt_dist = dist + weights[edge]
+                if alt_dist < best.get(adj_node, INFINITY):
+                    best[adj_node] = alt_dist
+                    heapq.heappush(heap, (alt_dist, adj_node))
+        return settled
+
+
+class StopDistances:
+    """
+    A class that acts as the shortest path matrix of a Graph of delivery locations over a road
+    network.  Row i is computed with one search from location i, stopped when all the locations
+    are reached, the first time it is read, and kept; rows are never computed for locations a
+    route does not start from.
+
+    Attributes
+    ----------
+    network : RoadNetwork
+        the road network
+    nodes : list
+        location ID -> node number of the location in the network
+    rows_computed : int
+        the number of rows computed so far
+
+    Methods
+    --------
+    tolist()
+        Returns the whole matrix as a list of lists of floats.
+    """
+
+    def __init__(self, network, nodes):
+        """
+        Constructor for the StopDistances class.
+
+        :param network: the road network
+        :type network: RoadNetwork
+        :param nodes: location ID -> node number of the location in the network
+        :type nodes: list
+        """
+        self.network = network
+        self.nodes = nodes
+        self.rows_computed = 0
+        self._targets = set(nodes)
+        self._rows = [None] * len(nodes)
+
+    def __len__(self):
+        """
+        Returns the number of rows.
+
+        :return: the number of locations
+        :rtype: int
+        """
+        return len(self.nodes)
+
+    def __getitem__(self, i):
+        """
+        Returns row i of the matrix, the shortest distances from location i to every location,
+        computing it if it has not been read before.  Unreachable locations are infinitely far.
+
+        :param i: the location ID
+        :type i: int
+        :return: the row
+        :rtype: array
+        """
+        row = self._rows[i]
+        if row is None:
+            settled = self.network.distances_from(self.nodes[i], self._targets)
+            row = self._rows[i] = array('d', [settled.get(node, INFINITY) for node in self.nodes])
+            self.rows_computed += 1
+        return row
+
+    def tolist(self):
+        """
+        Returns the whole matrix as a list of lists of floats, computing every row.
+
+        :return: the rows of the matrix
+        :rtype: list
+        """
+        return [self[i].tolist() for i in range(len(self.nodes))]
+
+
+@profiled("load_road_graph")
+def load_road_graph(graph, dist_name_file, edge_file):
+    """
+    Populates the graph with the delivery locations and makes its shortest distances come from a
+    road network, computed on demand (see StopDistances).  Each row of the names file is the
+    name, address and zipcode of a location and optionally the name of its node in the edge list;
+    without one, the node is named by the row number from 0.
+
+    :param graph: the empty graph to add the locations to
+    :type graph: Graph
+    :param dist_name_file: path of the CSV file of location names, addresses and optional nodes
+    :type dist_name_file: str
+    :param edge_file: path of the edge list CSV file of from, to and miles rows
+    :type edge_file: str
+    :return: the road network
+    :rtype: RoadNetwork
+    :raises ValueError: if a location's node is not in the network
+    """
+    network = RoadNetwork.read_edges(edge_file)
+    nodes = []
+    with open(dist_name_file, 'r', newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            if not row:
+                continue
+            node_name = row[3].strip() if len(row) > 3 and row[3].strip() else str(len(nodes))
+            if node_name not in network.node_index:
+                raise ValueError("location {!r} is at node {!r}, which is not in the road network".format(
+                    row[1], node_name))
+            graph.add_location(Location(row[0], row[1], row[2]))
+            nodes.append(network.node(node_name))
+    graph.shortest = StopDistances(network, nodes)
+    return network
+
+
+def _to_csr(size, ends, miles):
+    """
+    Sorts the segments into CSR arrays with a counting sort by node, each segment once in each
+    direction.  Returns the offsets, targets and weights.
+    """
+    offsets = array('l', [0]) * (size + 1)
+    for node in ends:
+        offsets[node + 1] += 1
+    for node in range(size):
+        offsets[node + 1] += offsets[node]
+    fill = array('l', offsets)
+    targets = array('l', [0]) * len(ends)
+    weights = array('d', [0.0]) * len(ends)
+    for segment in range(len(miles)):
+        u, v, length = ends[2 * segment], ends[2 * segment + 1], miles[segment]
+        targets[fill[u]] = v
+        weights[fill[u]] = length
+        fill[u] += 1
+        targets[fill[v]] = u
+        weights[fill[v]] = length
+        fill[v] += 1
+    return offsets, targets, weights
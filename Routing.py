@@ -0,0 +1,321 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import heapq
+import time
+from ExactRoute import EXACT_MAX_STOPS, shortest_tour
+from Package import EOD_TIME, SECONDS_PER_MINUTE
+from Profiler import profiled
+
+ROUTE_TIME_BUDGET = 0.05    # seconds improve_route may spend on one route by default
+NEIGHBOR_WALK_MIN = 48      # deadline buckets with more stops are ordered with the neighbor index
+_EPSILON = 1e-9
+
+
+def travel_seconds(distance, speed):
+    """
+    Returns the time to drive a distance, in whole seconds for the simulation clock.
+
+    :param distance: the distance in miles
+    :type distance: float
+    :param speed: the speed in miles per minute
+    :type speed: float
+    :return: the driving time in seconds
+    :rtype: int
+    """
+    return round(distance / speed * SECONDS_PER_MINUTE)
+
+
+@profiled("plan_route")
+def plan_route(graph, start_loc, packages, depart_time=None, speed=None):
+    """
+    Returns the order in which a truck visits the delivery locations of its packages.
+
+    Each location is put in the bucket of its earliest package deadline, and the buckets are
+    visited in deadline order from a heap of the distinct deadlines, so any number of deadlines
+    is supported.  Within a bucket a greedy algorithm picks the nearest unvisited location next.
+    Buckets are insertion-ordered dictionaries, so moving a location to an earlier deadline is
+    O(1) and ties go to the location added first.  Buckets of more than NEIGHBOR_WALK_MIN stops
+    are ordered with the graph's neighbor index, which finds each nearest stop from a short
+    sorted list instead of measuring every stop left, for the same route in near-linear time.
+    Shortest paths are not required: without them the index, like the greedy scan, uses the
+    direct route distances.
+    The route does not include the return to the start location.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location the truck starts from
+    :type start_loc: Location
+    :param packages: the packages loaded on the truck
+    :type packages: iterable
+    :param depart_time: optional time the truck leaves the start location, in seconds after
+        midnight (not used)
+    :type depart_time: int
+    :param speed: optional truck speed in miles per minute (not used)
+    :type speed: float
+    :return: the delivery locations in visiting order
+    :rtype: list
+    """
+    # bucket package locations by their earliest delivery deadline
+    stop_deadline = {}      # location -> earliest deadline in seconds
+    buckets = {}            # deadline -> {location: None} in the order locations were added
+    for mail in packages:
+        del_addr = mail.location
+        deadline = mail.deadline_time
+        current = stop_deadline.get(del_addr)
+        if current is not None:
+            if current <= deadline:
+                continue
+            del buckets[current][del_addr]
+        stop_deadline[del_addr] = deadline
+        buckets.setdefault(deadline, {})[del_addr] = None
+    deadline_heap = list(buckets)
+    heapq.heapify(deadline_heap)
+
+    route = []
+    curr_loc = start_loc
+    dist = graph.get_distance
+    while deadline_heap:
+        bucket = buckets[heapq.heappop(deadline_heap)]
+        if len(bucket) > NEIGHBOR_WALK_MIN:
+            ordered = graph.neighbor_index().greedy_order(curr_loc, list(bucket))
+            route.extend(ordered)
+            curr_loc = ordered[-1]
+            continue
+        unvisited = list(bucket)
+        # travel to the location in the bucket with the shortest distance until the bucket is empty
+        while unvisited:
+            sm_index = 0
+            sm_dist = dist(curr_loc, unvisited[0])
+            for i in range(1, len(unvisited)):
+                next_dist = dist(curr_loc, unvisited[i])
+                if next_dist < sm_dist:
+                    sm_index = i    # update sm_index with index of smallest distance
+                    sm_dist = next_dist
+            curr_loc = unvisited.pop(sm_index)
+            route.append(curr_loc)
+    return route
+
+
+def route_length(graph, start_loc, route):
+    """
+    Returns the length of a route that starts at the start location, visits the locations in
+    order and returns to the start location.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location the route starts and ends at
+    :type start_loc: Location
+    :param route: the locations in visiting order
+    :type route: list
+    :return: the length of the route in miles
+    :rtype: float
+    """
+    length = 0.0
+    curr_loc = start_loc
+    for next_loc in route:
+        length += graph.get_distance(curr_loc, next_loc)
+        curr_loc = next_loc
+    return length + graph.get_distance(curr_loc, start_loc)
+
+
+def stop_deadlines(packages):
+    """
+    Returns the earliest package deadline at each delivery location.
+
+    :param packages: the packages loaded on the truck
+    :type packages: iterable
+    :return: a dictionary of location -> deadline in seconds after midnight
+    :rtype: dict
+    """
+    deadlines = {}
+    for mail in packages:
+        if mail.deadline_time < deadlines.get(mail.location, EOD_TIME + 1):
+            deadlines[mail.location] = mail.deadline_time
+    return deadlines
+
+
+@profiled("improve_route")
+def improve_route(graph, start_loc, route, deadlines=None, depart_time=0, speed=None,
+                  time_budget=ROUTE_TIME_BUDGET):
+    """
+    Shortens a route with 2-opt and Or-opt local search moves and returns the improved route.
+
+    A 2-opt move reverses a section of the route; an Or-opt move moves a run of one to three
+    stops, forwards or reversed, to another place in the route.  Each candidate move is costed in
+    constant time from the four to six distances it changes; only improving moves are walked
+    in full to confirm the new length and the deadlines.  Moves are applied as soon as they are
+    found, until no move improves the route or the time budget runs out.
+
+    When deadlines and a speed are given, no move may make a stop later than both its deadline
+    and its arrival time on the original route, so a route that met its deadlines still does.
+    Arrival times are kept in whole seconds, each leg rounded by travel_seconds as on the
+    simulation clock.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location the route starts and ends at
+    :type start_loc: Location
+    :param route: the locations in visiting order
+    :type route: list
+    :param deadlines: optional dictionary of location -> deadline in seconds after midnight
+    :type deadlines: dict
+    :param depart_time: optional departure time in seconds after midnight
+    :type depart_time: int
+    :param speed: optional truck speed in miles per minute, needed to check deadlines
+    :type speed: float
+    :param time_budget: optional number of seconds to spend improving the route
+    :type time_budget: float
+    :return: the improved route
+    :rtype: list
+    """
+    if len(route) < 3:
+        return list(route)
+    stop_time = time.perf_counter() + time_budget
+    dist = graph.get_distance
+    nodes = [start_loc] + list(route) + [start_loc]
+
+    limits = None
+    if deadlines and speed:
+        # a stop may arrive by its deadline, or no later than it does on the original route
+        limits = {}
+        arrival = depart_time
+        for prev_loc, curr_loc in zip(nodes, nodes[1:-1]):
+            arrival += travel_seconds(dist(prev_loc, curr_loc), speed)
+            limits[curr_loc] = max(deadlines.get(curr_loc, EOD_TIME), arrival)
+
+    def accept(candidate, length):
+        """
+        Returns the length of the candidate route if it is shorter and meets the limits, else None.
+        """
+        new_length = 0.0
+        arrival = depart_time
+        for prev_loc, curr_loc in zip(candidate, candidate[1:]):
+            leg = dist(prev_loc, curr_loc)
+            new_length += leg
+            if limits is not None and curr_loc in limits:
+                arrival += travel_seconds(leg, speed)
+                if arrival > limits[curr_loc]:
+                    return None
+        return new_length if new_length < length - _EPSILON else None
+
+    length = route_length(graph, start_loc, route)
+    size = len(nodes) - 2       # number of stops, at nodes[1] to nodes[size]
+    improved = True
+    while improved and time.perf_counter() < stop_time:
+        improved = False
+
+        # 2-opt: reverse nodes[i..j]
+        for i in range(1, size):
+            prev_loc, first = nodes[i - 1], nodes[i]
+            removed_first = dist(prev_loc, first)
+            for j in range(i + 1, size + 1):
+                last, next_loc = nodes[j], nodes[j + 1]
+                delta = dist(prev_loc, last) + dist(first, next_loc) - removed_first - dist(last, next_loc)
+                if delta < -_EPSILON:
+                    candidate = nodes[:i] + nodes[j:i - 1:-1] + nodes[j + 1:]
+                    new_length = accept(candidate, length)
+                    if new_length is not None:
+                        nodes, length, improved = candidate, new_length, True
+                        prev_loc, first = nodes[i - 1], nodes[i]
+                        removed_first = dist(prev_loc, first)
+            if time.perf_counter() >= stop_time:
+                break
+
+        # Or-opt: move nodes[i..i+seg_len-1] between nodes[k] and nodes[k+1]
+        for seg_len in (1, 2, 3):
+            i = 1
+            while i + seg_len - 1 <= size:
+                first, last = nodes[i], nodes[i + seg_len - 1]
+                prev_loc, next_loc = nodes[i - 1], nodes[i + seg_len]
+                gain = dist(prev_loc, first) + dist(last, next_loc) - dist(prev_loc, next_loc)
+                moved = False
+                for k in range(size + 1):
+                    if i - 1 <= k <= i + seg_len - 1:
+                        continue
+                    left, right = nodes[k], nodes[k + 1]
+                    base = dist(left, right)
+                    forward = dist(left, first) + dist(last, right) - base - gain
+                    backward = dist(left, last) + dist(first, right) - base - gain
+                    if min(forward, backward) >= -_EPSILON:
+                        continue
+                    segment = nodes[i:i + seg_len]
+                    if backward < forward:
+                        segment.reverse()
+                    rest = nodes[:i] + nodes[i + seg_len:]
+                    insert_at = k + 1 if k < i else k + 1 - seg_len
+                    candidate = rest[:insert_at] + segment + rest[insert_at:]
+                    new_length = accept(candidate, length)
+                    if new_length is not None:
+                        nodes, length, improved, moved = candidate, new_length, True, True
+                        break
+                if not moved:
+                    i += 1
+                if time.perf_counter() >= stop_time:
+                    break
+
+    return nodes[1:-1]
+
+
+def plan_improved_route(graph, start_loc, packages, depart_time=None, speed=None):
+    """
+    Plans the greedy route of plan_route, then shortens it with improve_route while keeping the
+    package deadlines.  Can be passed to a DeliverySimulation as its route planner.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location the truck starts from
+    :type start_loc: Location
+    :param packages: the packages loaded on the truck
+    :type packages: iterable
+    :param depart_time: optional time the truck leaves the start location, in seconds after
+        midnight
+    :type depart_time: int
+    :param speed: optional truck speed in miles per minute
+    :type speed: float
+    :return: the delivery locations in visiting order
+    :rtype: list
+    """
+    route = plan_route(graph, start_loc, packages)
+    return improve_route(graph, start_loc, route, stop_deadlines(packages), depart_time or 0, speed)
+
+
+@profiled("plan_exact_route")
+def plan_exact_route(graph, start_loc, packages, depart_time=None, speed=None):
+    """
+    Returns the shortest route through the delivery locations of a small load that delivers
+    every package by its deadline, found exactly by shortest_tour.  Loads of more than
+    EXACT_MAX_STOPS locations, and loads no route can deliver on time, get the route of
+    plan_improved_route.  Can be passed to a DeliverySimulation as its route planner.
+
+    :param graph: graph of the distances between locations
+    :type graph: Graph
+    :param start_loc: the location the truck starts from
+    :type start_loc: Location
+    :param packages: the packages loaded on the truck
+    :type packages: iterable
+    :param depart_time: optional time the truck leaves the start location, in seconds after
+        midnight
+    :type depart_time: int
+    :param speed: optional truck speed in miles per minute, needed to keep the deadlines
+    :type speed: float
+    :return: the delivery locations in visiting order
+    :rtype: list
+    """
+    deadlines = stop_deadlines(packages)
+    stops = list(deadlines)
+    if len(stops) > EXACT_MAX_STOPS:
+        return plan_improved_route(graph, start_loc, packages, depart_time, speed)
+    nodes = [start_loc] + stops
+    dist = graph.get_distance
+    matrix = [[dist(from_loc, to_loc) for to_loc in nodes] for from_loc in nodes]
+    limits = None
+    if speed:
+        # the miles that can be driven before each deadline, less half a second for each leg, as
+        # the simulation clock rounds every leg to whole seconds (travel_seconds)
+        depart = depart_time or 0
+        rounding = len(stops) * 0.5
+        limits = [(deadlines[location] - depart - rounding) / SECONDS_PER_MINUTE * speed for location in stops]
+    tour = shortest_tour(matrix, limits)
+    if tour is None:
+        return plan_improved_route(graph, start_loc, packages, depart_time, speed)
+    return [stops[i - 1] for i in tour[0]]
@@ -0,0 +1,278 @@
+# Jennifer Pillow pillje@hotmail.com
+# Runs what-if scenarios of the delivery day (fleet size, drivers, truck speed, start times and
+# package mixes) in parallel, and collects the results into one table.
+#
+# Usage: python Scenarios.py [--trucks 2 3 4] [--drivers 1 2] [--speed 0.3 0.4] [--start 0800]
+#                            [--late-truck 0950] [--package-file "Package File.csv"] [--improve] [--exact]
+#                            [--workers N] [--output results.csv]
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import Main
+from DistanceGraph import Location, Graph
+from DistanceMatrix import DistanceMatrix, MatrixRows
+from HashTable import HashTable
+from Package import format_time, parse_clock
+from Truck import Truck
+
+RESULT_FIELDS = ("name", "trucks", "drivers", "speed", "start_time", "late_truck_time", "package_file",
+                 "packages", "miles", "end_time", "late", "undelivered", "seconds", "error")
+
+_worker_graph = None    # the graph of a worker process, on the shared distances
+_worker_shared = None   # the shared memory block the worker's graph reads
+
+
+class Scenario:
+    """
+    A class used to represent the settings of one simulated delivery day.  The defaults are the
+    shipped day of Main.py.
+
+    Attributes
+    ----------
+    name : str
+        a name for the scenario in the results table
+    num_trucks : int
+        the number of trucks, numbered from 1
+    num_drivers : int
+        the number of drivers
+    speed : float
+        the truck speed in miles per minute
+    start_time : str
+        the time the first trucks are ready, HHMM
+    late_truck_time : str
+        the time the trucks beyond the first num_drivers are ready, HHMM (truck 3 of the shipped day)
+    end_time : str
+        the time to end the simulation, HHMM
+    package_file : str
+        the path of the package CSV file
+    package_ids : list
+        the IDs of the packages to deliver, None for all the packages in the file
+    improve : bool
+        shorten the greedy routes with local search
+    exact : bool
+        solve the routes of small loads exactly
+    """
+
+    def __init__(self, name="", num_trucks=3, num_drivers=Main.NUM_DRIVERS, speed=Main.TRUCK_SPEED,
+                 start_time="0800", late_truck_time="0950", end_time="1700",
+                 package_file=Main.PACKAGE_FILE, package_ids=None, improve=False,
+                 exact=False):
+        """
+        Constructor for the Scenario class.  See the class attributes for the parameters.
+        """
+        self.name = name
+        self.num_trucks = num_trucks
+        self.num_drivers = num_drivers
+        self.speed = speed
+        self.start_time = start_time
+        self.late_truck_time = late_truck_time
+        self.end_time = end_time
+        self.package_file = package_file
+        self.package_ids = package_ids
+        self.improve = improve
+        self.exact = exact
+
+
+def run_scenario(graph, scenario):
+    """
+    Simulates the delivery day of a scenario on its own packages and trucks, and returns a row of
+    the results table.  A scenario that fails, such as one whose package file cannot be read or
+    whose packages are restricted to a truck the fleet does not have, gets its error message in
+    the row instead of stopping the sweep.
+
+    :param graph: graph of the distances between locations, with shortest distances computed
+    :type graph: Graph
+    :param scenario: the scenario to simulate
+    :type scenario: Scenario
+    :return: a dictionary of RESULT_FIELDS -> value
+    :rtype: dict
+    """
+    begin = time.perf_counter()
+    row = dict.fromkeys(RESULT_FIELDS, "")
+    row.update(name=scenario.name, trucks=scenario.num_trucks, drivers=scenario.num_drivers,
+               speed=scenario.speed, start_time=scenario.start_time, late_truck_time=scenario.late_truck_time,
+               package_file=scenario.package_file)
+
+    packages = []
+    try:
+        table = HashTable()
+        Main.load_packages(table, graph, scenario.package_file)
+        if scenario.package_ids is None:
+            packages = list(table)
+        else:
+            packages = [package for package in table.bulk_search(scenario.package_ids) if package is not None]
+        trucks = [Truck(truck_id) for truck_id in range(1, scenario.num_trucks + 1)]
+        start = parse_clock(scenario.start_time)
+        late_truck = max(start, parse_clock(scenario.late_truck_time))
+        ready_times = [start if i < scenario.num_drivers else late_truck for i in range(scenario.num_trucks)]
+        end = Main.simulate_day(graph, packages, trucks, ready_times, scenario.num_drivers, scenario.speed,
+                                parse_clock(scenario.end_time), improve=scenario.improve,
+                                exact=scenario.exact)
+    except Exception as error:      # one failed scenario must not stop the sweep
+        row.update(packages=len(packages), error=str(error) or type(error).__name__,
+                   seconds=round(time.perf_counter() - begin, 4))
+        return row
+
+    delivered = [package for package in packages if package.delivery_time >= 0]
+    row.update(packages=len(packages),
+               miles=round(sum(truck.distance for truck in trucks), 1),
+               end_time=format_time(end),
+               late=sum(1 for package in delivered if package.delivery_time > package.deadline_time),
+               undelivered=len(packages) - len(delivered),
+               seconds=round(time.perf_counter() - begin, 4))
+    return row
+
+
+def sweep(scenarios, workers=None, graph=None, dist_name_file=Main.DIST_NAME_FILE,
+          dist_data_file=Main.DIST_DATA_FILE):
+    """
+    Runs the scenarios on a pool of worker processes and returns their result rows in the order
+    of the scenarios.
+
+    The distance graph is built once.  Its route and shortest distance matrices are copied into
+    one block of shared memory that every worker maps, so workers start without rebuilding or
+    unpickling the distances.  With one worker the scenarios run in this process.
+
+    :param scenarios: the scenarios to run
+    :type scenarios: iterable
+    :param workers: optional number of worker processes (default: the number of CPUs)
+    :type workers: int
+    :param graph: optional graph with its shortest distances computed (default: built from the
+        distance files)
+    :type graph: Graph
+    :param dist_name_file: optional path of the CSV file of location names and addresses
+    :type dist_name_file: str
+    :param dist_data_file: optional path of the CSV file of lower-triangular distance data
+    :type dist_data_file: str
+    :return: a list of result rows, dictionaries of RESULT_FIELDS -> value
+    :rtype: list
+    """
+    scenarios = list(scenarios)
+    if graph is None:
+        graph = Graph(compact=True)
+        Main.build_graph(graph, dist_name_file, dist_data_file)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(scenarios) <= 1:
+        return [run_scenario(graph, scenario) for scenario in scenarios]
+
+    shared, spec = _share_graph(graph)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_graph, initargs=spec) as pool:
+            chunksize = max(1, len(scenarios) // (workers * 4))
+            return list(pool.map(_run_in_worker, scenarios, chunksize=chunksize))
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def write_table(rows, output):
+    """
+    Writes result rows as CSV with a header row.
+
+    :param rows: the result rows
+    :type rows: list
+    :param output: a text file opened for writing
+    :type output: file
+    """
+    writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def _share_graph(graph):
+    """
+    Copies the locations and distance matrices of a graph into a new block of shared memory.
+    Returns the block and the arguments for _attach_graph.
+    """
+    locations = graph.get_locations()
+    size = len(locations)
+    if graph.compact:
+        route_data = array('d', graph.distance.data)
+    else:
+        rows = graph.edge_matrix()
+        route_data = array('d', [rows[i][j] for i in range(size) for j in range(i + 1)])
+    route_bytes = route_data.itemsize * len(route_data)
+    shared = shared_memory.SharedMemory(create=True, size=max(1, route_bytes + 8 * size * size))
+    doubles = shared.buf.cast('d')
+    doubles[:len(route_data)] = route_data
+    offset = len(route_data)
+    for i in range(size):
+        doubles[offset:offset + size] = array('d', graph.shortest[i])
+        offset += size
+    doubles.release()
+    table = [(loc.name, loc.address, loc.zipcode) for loc in locations]
+    return shared, (shared.name, size, table)
+
+
+def _attach_graph(name, size, table):
+    """
+    Worker initializer: builds the worker's graph on the shared distance matrices.
+    """
+    global _worker_graph, _worker_shared
+    shared = shared_memory.SharedMemory(name=name)
+    doubles = shared.buf.cast('d')
+    route_len = size * (size + 1) // 2
+    graph = Graph(compact=True)
+    graph.distance = DistanceMatrix.from_buffer(doubles[:route_len], size)
+    graph.shortest = MatrixRows(doubles[route_len:route_len + size * size], size)
+    for loc_name, address, zipcode in table:
+        graph.add_location(Location(loc_name, address, zipcode))
+    _worker_graph = graph
+    _worker_shared = shared     # keep the block mapped as long as the worker runs
+
+
+def _run_in_worker(scenario):
+    """
+    Runs one scenario in a worker process on the shared graph.
+    """
+    return run_scenario(_worker_graph, scenario)
+
+
+def main(argv=None):
+    """
+    Runs a sweep over every combination of the settings given on the command line and writes the
+    results table as CSV.
+    """
+    parser = argparse.ArgumentParser(description="Run what-if scenarios of the delivery day.")
+    parser.add_argument("--trucks", type=int, nargs="+", default=[3], help="numbers of trucks")
+    parser.add_argument("--drivers", type=int, nargs="+", default=[Main.NUM_DRIVERS], help="numbers of drivers")
+    parser.add_argument("--speed", type=float, nargs="+", default=[Main.TRUCK_SPEED],
+                        help="truck speeds in miles per minute")
+    parser.add_argument("--start", nargs="+", default=["0800"], help="start times, HHMM")
+    parser.add_argument("--late-truck", nargs="+", default=["0950"],
+                        help="ready times of the trucks beyond the number of drivers, HHMM")
+    parser.add_argument("--package-file", nargs="+", default=[Main.PACKAGE_FILE], help="package CSV files")
+    parser.add_argument("--improve", action="store_true", help="shorten routes with local search")
+    parser.add_argument("--exact", action="store_true", help="solve the routes of small loads exactly")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPUs)")
+    parser.add_argument("--output", default=None, help="CSV file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    scenarios = []
+    for trucks, drivers, speed, start, late_truck, package_file in itertools.product(
+            args.trucks, args.drivers, args.speed, args.start, args.late_truck, args.package_file):
+        name = "t{}-d{}-s{}-{}-{}".format(trucks, drivers, speed, start, late_truck)
+        if len(args.package_file) > 1:
+            name += "-" + os.path.splitext(os.path.basename(package_file))[0]
+        scenarios.append(Scenario(name, trucks, drivers, speed, start, late_truck,
+                                  package_file=package_file, improve=args.improve,
+                                  exact=args.exact))
+
+    rows = sweep(scenarios, args.workers)
+    if args.output is None:
+        write_table(rows, sys.stdout)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            write_table(rows, output)
+
+
+if __name__ == "__main__":
+    main()
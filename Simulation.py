@@ -0,0 +1,335 @@
+# Jennifer Pillow pillje@hotmail.com
+
+import heapq
+from Package import SECONDS_PER_MINUTE
+from Profiler import profiled
+from Routing import plan_route, travel_seconds
+
+# Event kinds
+EVENT_DEPART = "depart"                         # truck is loaded and leaves the hub
+EVENT_ARRIVE = "arrive"                         # truck arrives at a delivery location
+EVENT_DELIVER = "deliver"                       # packages for the location are delivered
+EVENT_RETURN = "return"                         # truck arrives back at the hub
+EVENT_DRIVER_AVAILABLE = "driver-available"     # a driver is free to take another trip
+
+
+class Trip:
+    """
+    A class used to represent one trip of a truck: the packages to load at the hub and the
+    earliest time the truck may leave.
+
+    Attributes
+    ----------
+    truck : Truck
+        the truck that makes the trip
+    packages : list
+        the packages to load when the truck leaves
+    ready_time : int
+        the earliest time the truck may leave the hub, in seconds after midnight
+    end_time : int
+        the time the truck returned to the hub, None until the trip is complete
+    """
+
+    def __init__(self, truck, packages, ready_time):
+        """
+        Constructor for the Trip class.
+
+        :param truck: the truck that makes the trip
+        :type truck: Truck
+        :param packages: the packages to load when the truck leaves
+        :type packages: list
+        :param ready_time: the earliest time the truck may leave the hub, in seconds after midnight
+        :type ready_time: int
+        """
+        self.truck = truck
+        self.packages = packages
+        self.ready_time = ready_time
+        self.end_time = None
+
+
+class DeliverySimulation:
+    """
+    A class for a discrete-event simulation of a delivery day for any number of trucks and
+    drivers sharing one distance graph.
+
+    Pending events are kept in a heap ordered by time, so the whole day costs O(E log E) for E
+    events.  Each trip departs when its truck is at the hub, a driver is free and its ready time
+    has come; trips are given to free drivers in order of ready time.  Events at the same time are
+    handled in the order they were scheduled.  Times are whole seconds after midnight of the
+    first day, so a simulation may run over any number of days.
+
+    Attributes
+    ----------
+    graph : Graph
+        graph of the distances between locations
+    hub : Location
+        the location trucks are loaded at and return to
+    speed : float
+        the truck speed in miles per minute
+    trips : list
+        the trips in the order they were added
+    free_drivers : list
+        the IDs of the drivers waiting at the hub
+    now : int
+        the time of the event being handled, in seconds after midnight; before the first event,
+        the start time, or None if none was given
+    recorder : DeliveryTimeline
+        optional object notified of loads, deliveries and legs driven (see Timeline.py)
+
+    Methods
+    --------
+    add_trip(truck, packages, ready_time)
+        Adds a trip for a truck.
+    schedule(event_time, kind, truck, detail)
+        Adds an event to the event queue.
+    run(end_time)
+        Runs the simulation until all trips are complete or the end time is reached.
+    truck_positions()
+        Returns where each truck is headed and the rest of its route.
+    """
+
+    def __init__(self, graph, num_drivers, speed, hub=None, route_planner=plan_route, recorder=None,
+                 start_time=None):
+        """
+        Constructor for the DeliverySimulation class.
+
+        :param graph: graph of the distances between locations
+        :type graph: Graph
+        :param num_drivers: the number of drivers
+        :type num_drivers: int
+        :param speed: the truck speed in miles per minute
+        :type speed: float
+        :param hub: optional hub location (default: the first location in the graph)
+        :type hub: Location
+        :param route_planner: optional function(graph, start_loc, packages, depart_time, speed)
+            returning the delivery locations in visiting order (default plan_route); it is given the
+            truck's manifest, which it must only read
+        :type route_planner: function
+        :param recorder: optional recorder of loads, deliveries and legs, such as a DeliveryTimeline
+        :type recorder: DeliveryTimeline
+        :param start_time: optional time the day starts, in seconds after midnight (default: the
+            ready time of the first trip)
+        :type start_time: int
+        """
+        self.graph = graph
+        self.hub = hub if hub is not None else graph.get_locations()[0]
+        self.speed = speed
+        self.route_planner = route_planner
+        self.trips = []
+        self.free_drivers = list(range(1, num_drivers + 1))
+        self.now = start_time
+        self.recorder = recorder
+        self._started = False
+        self._events = []
+        self._seq = 0
+        self._waiting = []      # trips not yet given a driver, in dispatch order
+        self._busy = set()      # IDs of trucks away from the hub or about to leave
+        self._legs = {}         # truck ID -> [leg start time, leg distance, miles counted] of the leg being driven
+        self._trucks = {}       # truck ID -> truck
+
+    def add_trip(self, truck, packages, ready_time):
+        """
+        Adds a trip for a truck.  Trips of the same truck are made one after another.
+
+        :param truck: the truck that makes the trip
+        :type truck: Truck
+        :param packages: the packages to load at the hub
+        :type packages: list
+        :param ready_time: the earliest time the truck may leave the hub, in seconds after midnight
+        :type ready_time: int
+        :return: the new trip
+        :rtype: Trip
+        """
+        trip = Trip(truck, packages, ready_time)
+        self.trips.append(trip)
+        self._trucks[truck.truck_id] = truck
+        self._waiting.append(trip)
+        self._waiting.sort(key=lambda waiting: waiting.ready_time)     # stable: keeps add order for ties
+        return trip
+
+    def schedule(self, event_time, kind, truck, detail=None):
+        """
+        Adds an event to the event queue.
+
+        :param event_time: the time of the event, in seconds after midnight
+        :type event_time: int
+        :param kind: the kind of event, one of the EVENT_ constants
+        :type kind: str
+        :param truck: the truck the event is for, None for driver events
+        :type truck: Truck
+        :param detail: optional event data: the trip, location or driver ID
+        :type detail: object
+        """
+        heapq.heappush(self._events, (event_time, self._seq, kind, truck, detail))
+        self._seq += 1
+
+    @profiled("simulate")
+    def run(self, end_time):
+        """
+        Runs the simulation until all trips are complete or the end time is reached.  Trucks
+        still driving at the end time have driven part of their current leg; running again to a
+        later end time resumes the day where it stopped.
+
+        :param end_time: the time to stop the simulation, in seconds after midnight
+        :type end_time: int
+        :return: the earlier of: the time the last truck returns to the hub, or the end time; the
+            start time (or the end time, without one) when there are no trips
+        :rtype: int
+        """
+        if not self._started:
+            self._started = True
+            if self._waiting:
+                if self.now is None:
+                    self.now = self._waiting[0].ready_time
+                self._dispatch()
+
+        last_time = self.now if self.now is not None else end_time
+        while self._events and self._events[0][0] <= end_time:
+            event_time, _, kind, truck, detail = heapq.heappop(self._events)
+            self.now = event_time
+            last_time = event_time
+            handler = self._handlers[kind]
+            handler(self, truck, detail)
+
+        if self._events or self._waiting:
+            # stopped early: count the miles driven so far on legs in progress, keeping the legs so
+            # the rest of their miles are counted when the trucks arrive
+            for truck_id, leg in self._legs.items():
+                leg_start, leg_dist, counted = leg
+                driven = min(self.speed * (end_time - leg_start) / SECONDS_PER_MINUTE, leg_dist)
+                if driven > counted:
+                    self._trucks[truck_id].drive(driven - counted)
+                    leg[2] = driven
+            return end_time
+        return last_time
+
+    def truck_positions(self):
+        """
+        Returns where each truck is headed and the rest of its route, for re-planning the day
+        after the simulation has been run to a time.  A truck driving a leg is given at the end
+        of the leg, as the leg is already under way; a truck at the hub or waiting for a trip is
+        given at the hub.
+
+        :return: a dictionary of truck ID -> (truck, location, time the truck is there,
+            locations still to visit after it)
+        :rtype: dict
+        """
+        positions = {truck_id: (truck, self.hub, self.now, []) for truck_id, truck in self._trucks.items()}
+        for event_time, _, kind, truck, detail in self._events:
+            if kind == EVENT_ARRIVE or kind == EVENT_DELIVER:
+                state, location = detail
+                positions[truck.truck_id] = (truck, location, event_time, state.route[state.next_index:])
+            elif kind == EVENT_RETURN:
+                positions[truck.truck_id] = (truck, self.hub, event_time, [])
+        return positions
+
+    def _dispatch(self):
+        """
+        Gives free drivers the waiting trips whose trucks are at the hub.  A trip that is not
+        ready yet keeps its driver until it leaves at its ready time.
+        """
+        i = 0
+        while self.free_drivers and i < len(self._waiting):
+            trip = self._waiting[i]
+            if trip.truck.truck_id in self._busy:
+                i += 1
+                continue
+            self._waiting.pop(i)
+            self._busy.add(trip.truck.truck_id)
+            driver = self.free_drivers.pop(0)
+            self.schedule(max(self.now, trip.ready_time), EVENT_DEPART, trip.truck, (trip, driver))
+
+    def _leave(self, truck, from_loc, to_loc, kind, detail):
+        """
+        Starts a leg from one location to another and schedules the arrival.
+        """
+        dist = self.graph.get_distance(from_loc, to_loc)
+        self._legs[truck.truck_id] = [self.now, dist, 0.0]
+        if self.recorder is not None:
+            self.recorder.on_leg(truck, self.now, dist, self.speed)
+        self.schedule(self.now + travel_seconds(dist, self.speed), kind, truck, detail)
+
+    def _arrive(self, truck):
+        """
+        Completes the leg being driven and adds the miles of it not yet counted to the truck.
+        """
+        leg_start, leg_dist, counted = self._legs.pop(truck.truck_id)
+        truck.drive(leg_dist - counted)
+
+    def _on_depart(self, truck, detail):
+        """
+        Loads the trip's packages, plans the route and sends the truck to its first stop.
+        """
+        trip, driver = detail
+        for package in trip.packages:
+            if truck.load_package(package) and self.recorder is not None:
+                self.recorder.on_load(self.now, truck, package)
+        route = self.route_planner(self.graph, self.hub, truck.manifest, self.now, self.speed)
+        state = _RouteState(trip, driver, route)
+        self._next_stop(truck, self.hub, state)
+
+    def _next_stop(self, truck, curr_loc, state):
+        """
+        Sends the truck to its next delivery location, or back to the hub after the last one.
+        """
+        if state.next_index < len(state.route):
+            next_loc = state.route[state.next_index]
+            state.next_index += 1
+            self._leave(truck, curr_loc, next_loc, EVENT_ARRIVE, (state, next_loc))
+        else:
+            self._leave(truck, curr_loc, self.hub, EVENT_RETURN, state)
+
+    def _on_arrive(self, truck, detail):
+        """
+        Completes the leg to a delivery location and schedules the delivery there.
+        """
+        self._arrive(truck)
+        self.schedule(self.now, EVENT_DELIVER, truck, detail)
+
+    def _on_deliver(self, truck, detail):
+        """
+        Delivers the packages for the current location and sends the truck on.
+        """
+        state, curr_loc = detail
+        for mail in truck.deliver_stop(curr_loc, self.now):
+            if self.recorder is not None:
+                self.recorder.on_deliver(self.now, truck, mail)
+        self._next_stop(truck, curr_loc, state)
+
+    def _on_return(self, truck, state):
+        """
+        Completes the trip at the hub and frees the truck and its driver.
+        """
+        self._arrive(truck)
+        state.trip.end_time = self.now
+        self._busy.discard(truck.truck_id)
+        self.schedule(self.now, EVENT_DRIVER_AVAILABLE, None, state.driver)
+
+    def _on_driver_available(self, truck, driver):
+        """
+        Returns the driver to the pool and gives out waiting trips.
+        """
+        self.free_drivers.append(driver)
+        self._dispatch()
+
+    _handlers = {
+        EVENT_DEPART: _on_depart,
+        EVENT_ARRIVE: _on_arrive,
+        EVENT_DELIVER: _on_deliver,
+        EVENT_RETURN: _on_return,
+        EVENT_DRIVER_AVAILABLE: _on_driver_available,
+    }
+
+
+class _RouteState:
+    """
+    The progress of a truck along the route of its current trip.
+    """
+
+    __slots__ = ('trip', 'driver', 'route', 'next_index')
+
+    def __init__(self, trip, driver, route):
+        self.trip = trip
+        self.driver = driver
+        self.route = route
+        self.next_index = 0
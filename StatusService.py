@@ -0,0 +1,342 @@
+# Jennifer Pillow pillje@hotmail.com
+# A local HTTP/JSON service that answers package and truck status queries from a simulated
+# delivery day held in memory.  The day is simulated once at startup; POST /resimulate simulates
+# it again in the background while the current day keeps answering queries.
+#
+# Usage: python StatusService.py [--host 127.0.0.1] [--port 8080] [--names "Distance Names.csv"]
+#                                [--data "Distance Data.csv"] [--packages "Package File.csv"] [--improve]
+#
+# Endpoints (time is HHMM, HH:MM or HH:MM:SS; the default is the end of the day):
+#   GET  /packages/<id>?time=0930   status of one package
+#   GET  /packages?time=0930        status of every package
+#   GET  /trucks/<id>?time=0930     miles driven and packages on board of one truck
+#   GET  /trucks?time=0930          the same for every truck
+#   GET  /health                    the generation of the day, and whether a re-simulation runs
+#   POST /resimulate                simulate the day again; optional JSON body with any of
+#                                   "names", "data", "packages" (paths inside the directory the
+#                                   service was started in) and "improve" (true or false)
+
+import argparse
+import asyncio
+import json
+import os
+from urllib.parse import urlsplit, parse_qs
+import Main
+from BatchQuery import DeliveryDay, parse_query_time
+from Package import STATUS_EN_ROUTE, format_time
+
+MAX_BODY = 64 * 1024    # largest request body accepted, in bytes
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large"}
+SETTINGS = ("names", "data", "packages", "improve")
+FILE_SETTINGS = ("names", "data", "packages")
+
+
+class RequestError(Exception):
+    """
+    Raised for a request that cannot be answered, with the HTTP status and message.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class StatusService:
+    """
+    A class that answers status queries about the current simulated day and replaces the day
+    when a re-simulation finishes.  Queries only read the current day, which is never changed
+    once built, so they are answered without locks while a new day is being simulated.
+
+    Attributes
+    ----------
+    day : DeliveryDay
+        the current simulated day
+    generation : int
+        the number of days simulated, 1 for the day simulated at startup
+    settings : dict
+        the files and options of the current day: "names", "data", "packages" and "improve"
+    root : str
+        the directory the files of a re-simulation must be in, the working directory at startup
+
+    Methods
+    --------
+    handle(method, target, body)
+        Returns the HTTP status and JSON payload of a request.
+    resimulate(changes)
+        Starts simulating the day again in the background.
+    serve(host, port)
+        Serves HTTP requests until cancelled.
+    """
+
+    def __init__(self, dist_name_file=Main.DIST_NAME_FILE, dist_data_file=Main.DIST_DATA_FILE,
+                 package_file=Main.PACKAGE_FILE, improve=False):
+        """
+        Constructor for the StatusService class.  Simulates the day.
+
+        :param dist_name_file: optional path of the CSV file of location names and addresses
+        :type dist_name_file: str
+        :param dist_data_file: optional path of the CSV file of lower-triangular distance data
+        :type dist_data_file: str
+        :param package_file: optional path of the package CSV file
+        :type package_file: str
+        :param improve: optional, shorten the greedy routes with local search (default False)
+        :type improve: bool
+        """
+        self.settings = dict(names=dist_name_file, data=dist_data_file, packages=package_file, improve=improve)
+        self.root = os.getcwd()
+        self.day = _simulate(self.settings)
+        self.generation = 1
+        self._job = None    # the task of the running re-simulation
+
+    def handle(self, method, target, body=b""):
+        """
+        Returns the HTTP status and JSON payload of a request.
+
+        :param method: the HTTP method
+        :type method: str
+        :param target: the request target, a path with an optional query string
+        :type target: str
+        :param body: optional request body
+        :type body: bytes
+        :return: a tuple of (HTTP status, payload)
+        :rtype: tuple
+        """
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        try:
+            if parts == ["resimulate"]:
+                if method != "POST":
+                    raise RequestError(405, "use POST")
+                return 202, self.resimulate(_json_body(body))
+            if method != "GET":
+                raise RequestError(405, "use GET")
+            if parts == ["health"]:
+                return 200, self._health()
+            day = self.day      # one day for the whole answer, even if a re-simulation finishes
+            query_time = _query_time(day, query)
+            if parts == ["packages"]:
+                return 200, [day.answer(query_time, package.package_id)
+                             for package in sorted(day.table, key=lambda package: package.package_id)]
+            if len(parts) == 2 and parts[0] == "packages":
+                row = day.answer(query_time, _id(parts[1]))
+                if row["error"] is not None:
+                    raise RequestError(404, row["error"])
+                return 200, row
+            if parts == ["trucks"]:
+                return 200, [_truck_status(day, truck.truck_id, query_time) for truck in day.trucks]
+            if len(parts) == 2 and parts[0] == "trucks":
+                truck_id = _id(parts[1])
+                if truck_id not in [truck.truck_id for truck in day.trucks]:
+                    raise RequestError(404, "unknown truck ID")
+                return 200, _truck_status(day, truck_id, query_time)
+            raise RequestError(404, "unknown path: " + url.path)
+        except RequestError as error:
+            return error.status, {"error": str(error)}
+
+    def resimulate(self, changes):
+        """
+        Starts simulating the day again on a worker thread, with the current settings updated by
+        the changes.  The current day answers queries until the new one is finished.
+
+        :param changes: settings to change, any of "names", "data", "packages" and "improve"
+        :type changes: dict
+        :return: the payload of the response: the generation the new day will have
+        :rtype: dict
+        :raises RequestError: if a re-simulation is already running, or a setting is unknown or
+            invalid: a file that is not a path inside root, or an improve that is not a boolean
+        """
+        if self._job is not None:
+            raise RequestError(409, "a re-simulation is already running")
+        unknown = set(changes) - set(SETTINGS)
+        if unknown:
+            raise RequestError(400, "unknown settings: " + ", ".join(sorted(unknown)))
+        for name in FILE_SETTINGS:
+            if name in changes:
+                _check_path(name, changes[name], self.root)
+        if "improve" in changes and not isinstance(changes["improve"], bool):
+            raise RequestError(400, "improve must be true or false")
+        settings = dict(self.settings, **changes)
+        self._job = asyncio.get_running_loop().create_task(self._resimulate(settings))
+        return {"generation": self.generation + 1, "running": True}
+
+    async def serve(self, host="127.0.0.1", port=8080):
+        """
+        Serves HTTP requests until cancelled.
+
+        :param host: optional address to listen on
+        :type host: str
+        :param port: optional port to listen on, 0 for any free port
+        :type port: int
+        """
+        server = await asyncio.start_server(self._connection, host, port)
+        address = server.sockets[0].getsockname()
+        print("serving on http://{}:{}".format(address[0], address[1]), flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def _resimulate(self, settings):
+        """
+        Simulates a day on a worker thread and makes it the current day.  A run that fails, or
+        whose day has no packages, leaves the current day in place.
+        """
+        try:
+            day = await asyncio.get_running_loop().run_in_executor(None, _simulate, settings)
+            if not day.report.accepted:
+                raise ValueError("no packages accepted from " + repr(settings["packages"]))
+            if day.end_time is None:
+                raise ValueError("the day has no end time")
+            self.day, self.settings = day, settings
+            self.generation += 1
+        except Exception as error:      # a failed run must not leave the service without a day
+            print("re-simulation failed: {}".format(error or type(error).__name__), flush=True)
+        finally:
+            self._job = None
+
+    def _health(self):
+        """
+        Returns the payload of GET /health.
+        """
+        day = self.day
+        return {"generation": self.generation, "running": self._job is not None,
+                "packages": day.report.accepted, "end_time": format_time(day.end_time),
+                "settings": self.settings}
+
+    async def _connection(self, reader, writer):
+        """
+        Answers the requests of one connection, which stays open between requests unless the
+        client asks to close it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    writer.write(_response(400, {"error": "bad request"}, False))
+                    break
+                if length > MAX_BODY:
+                    writer.write(_response(413, {"error": "request body too large"}, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                status, payload = self.handle(method, target, body)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _simulate(settings):
+    """
+    Simulates a day with the files and options of a settings dictionary.
+    """
+    return DeliveryDay(settings["names"], settings["data"], settings["packages"], bool(settings["improve"]))
+
+
+def _query_time(day, query):
+    """
+    Returns the time of a query string, or the end of the day if it has none.
+    """
+    if "time" not in query:
+        return day.end_time
+    try:
+        return parse_query_time(query["time"][0])
+    except ValueError as error:
+        raise RequestError(400, str(error)) from None
+
+
+def _check_path(name, value, root):
+    """
+    Checks that a file setting of a request is a path to a file inside the root directory.
+    """
+    if not isinstance(value, str) or not value:
+        raise RequestError(400, name + " must be a file path")
+    path = os.path.realpath(os.path.join(root, value))
+    if os.path.commonpath([path, os.path.realpath(root)]) != os.path.realpath(root) or not os.path.isfile(path):
+        raise RequestError(400, "{} must be a file in the service directory: {!r}".format(name, value))
+
+
+def _id(text):
+    """
+    Converts the ID in a path to an int.
+    """
+    if not text.isdigit():
+        raise RequestError(400, "invalid ID: " + repr(text))
+    return int(text)
+
+
+def _json_body(body):
+    """
+    Returns the JSON object of a request body, an empty dictionary for an empty body.
+    """
+    if not body.strip():
+        return {}
+    try:
+        changes = json.loads(body)
+    except ValueError:
+        raise RequestError(400, "invalid JSON body") from None
+    if not isinstance(changes, dict):
+        raise RequestError(400, "the body must be a JSON object")
+    return changes
+
+
+def _truck_status(day, truck_id, query_time):
+    """
+    Returns the miles a truck has driven by a time and the packages on board.
+    """
+    timeline = day.timeline
+    on_board = [package_id for package_id in sorted(timeline.package_events)
+                if timeline.status_code_at(package_id, query_time)[:2] == (STATUS_EN_ROUTE, truck_id)]
+    return {"truck": truck_id, "time": format_time(query_time),
+            "miles": round(timeline.truck_mileage_at(truck_id, query_time), 1), "packages": on_board}
+
+
+def _response(status, payload, keep_alive):
+    """
+    Returns the bytes of an HTTP response with a JSON body.
+    """
+    body = json.dumps(payload).encode()
+    head = ("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+            "Connection: {}\r\n\r\n").format(status, REASONS.get(status, ""), len(body),
+                                             "keep-alive" if keep_alive else "close")
+    return head.encode("latin-1") + body
+
+
+def main(argv=None):
+    """
+    Simulates the day and serves status queries until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Serve package status queries for the delivery day.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on, 0 for any free port")
+    parser.add_argument("--names", default=Main.DIST_NAME_FILE, help="CSV file of location names and addresses")
+    parser.add_argument("--data", default=Main.DIST_DATA_FILE, help="CSV file of lower-triangular distances")
+    parser.add_argument("--packages", default=Main.PACKAGE_FILE, help="package CSV file")
+    parser.add_argument("--improve", action="store_true", help="shorten routes with local search")
+    args = parser.parse_args(argv)
+
+    service = StatusService(args.names, args.data, args.packages, args.improve)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
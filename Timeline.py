@@ -0,0 +1,188 @@
+# Jennifer Pillow pillje@hotmail.com
+
+from bisect import bisect_right
+from Package import STATUS_AT_HUB, STATUS_EN_ROUTE, STATUS_DELIVERED, SECONDS_PER_MINUTE, format_status
+
+
+class DeliveryTimeline:
+    """
+    A class that records a simulated delivery day so that the state at any time of the day can be
+    looked up afterwards without simulating again.
+
+    Each package has a list of status changes and each truck a list of driven legs, both in time
+    order, so a status or mileage query is a binary search.  Pass the timeline as the recorder of a
+    DeliverySimulation and run the simulation to the end of the day.  Times are seconds after
+    midnight of the first day, as in the simulation.
+
+    Attributes
+    ----------
+    package_events : dict
+        package ID -> (times, changes): the times of the status changes and, for each, a tuple of
+        (status code, truck ID, delivery time in seconds after midnight)
+    truck_legs : dict
+        truck ID -> (start times, legs): the start times of the legs and, for each, a tuple of
+        (start time, distance, miles driven before the leg, speed)
+
+    Methods
+    --------
+    clear()
+        Removes everything recorded.
+    on_load(event_time, truck, package)
+        Records a package loaded on a truck.
+    on_deliver(event_time, truck, package)
+        Records a package delivered.
+    on_leg(truck, start_time, distance, speed)
+        Records a truck starting to drive a leg.
+    status_code_at(package_id, query_time)
+        Returns the status code, truck ID and delivery time of a package at a time.
+    status_at(package_id, query_time)
+        Returns the display status of a package at a time.
+    all_statuses_at(package_ids, query_time)
+        Returns the display status of each package at a time.
+    truck_mileage_at(truck_id, query_time)
+        Returns the miles a truck has driven by a time.
+    total_mileage_at(query_time)
+        Returns the miles all trucks have driven by a time.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the DeliveryTimeline class.
+        """
+        self.package_events = {}
+        self.truck_legs = {}
+
+    def clear(self):
+        """
+        Removes everything recorded.
+        """
+        self.package_events.clear()
+        self.truck_legs.clear()
+
+    def on_load(self, event_time, truck, package):
+        """
+        Records a package loaded on a truck.
+
+        :param event_time: the time the truck left with the package
+        :type event_time: int
+        :param truck: the truck the package was loaded on
+        :type truck: Truck
+        :param package: the package
+        :type package: Package
+        """
+        self._add_change(package.package_id, event_time, (STATUS_EN_ROUTE, truck.truck_id, -1))
+
+    def on_deliver(self, event_time, truck, package):
+        """
+        Records a package delivered.
+
+        :param event_time: the time the package was delivered
+        :type event_time: int
+        :param truck: the truck that delivered the package
+        :type truck: Truck
+        :param package: the package
+        :type package: Package
+        """
+        self._add_change(package.package_id, event_time, (STATUS_DELIVERED, truck.truck_id, package.delivery_time))
+
+    def on_leg(self, truck, start_time, distance, speed):
+        """
+        Records a truck starting to drive a leg.
+
+        :param truck: the truck
+        :type truck: Truck
+        :param start_time: the time the truck started the leg
+        :type start_time: int
+        :param distance: the length of the leg in miles
+        :type distance: float
+        :param speed: the truck speed in miles per minute
+        :type speed: float
+        """
+        starts, legs = self.truck_legs.setdefault(truck.truck_id, ([], []))
+        miles_before = 0.0
+        if legs:
+            miles_before = legs[-1][2] + legs[-1][1]
+        starts.append(start_time)
+        legs.append((start_time, distance, miles_before, speed))
+
+    def status_code_at(self, package_id, query_time):
+        """
+        Returns the status code, truck ID and delivery time of a package at a time.
+
+        :param package_id: the package ID
+        :type package_id: int
+        :param query_time: the time to look up, in seconds after midnight
+        :type query_time: int
+        :return: a tuple of (status code, truck ID, delivery time in seconds after midnight)
+        :rtype: tuple
+        """
+        times, changes = self.package_events.get(package_id, ((), ()))
+        i = bisect_right(times, query_time)
+        if i == 0:
+            return STATUS_AT_HUB, 0, -1
+        return changes[i - 1]
+
+    def status_at(self, package_id, query_time):
+        """
+        Returns the display status of a package at a time, e.g. "EN ROUTE ON TRUCK 2".
+
+        :param package_id: the package ID
+        :type package_id: int
+        :param query_time: the time to look up, in seconds after midnight
+        :type query_time: int
+        :return: the status of the package
+        :rtype: str
+        """
+        return format_status(*self.status_code_at(package_id, query_time))
+
+    def all_statuses_at(self, package_ids, query_time):
+        """
+        Returns the display status of each package at a time.
+
+        :param package_ids: the package IDs
+        :type package_ids: iterable
+        :param query_time: the time to look up, in seconds after midnight
+        :type query_time: int
+        :return: a dictionary of package ID -> status
+        :rtype: dict
+        """
+        return {package_id: self.status_at(package_id, query_time) for package_id in package_ids}
+
+    def truck_mileage_at(self, truck_id, query_time):
+        """
+        Returns the miles a truck has driven by a time, including the part of a leg it is driving.
+
+        :param truck_id: the truck ID
+        :type truck_id: int
+        :param query_time: the time to look up, in seconds after midnight
+        :type query_time: int
+        :return: the miles driven
+        :rtype: float
+        """
+        starts, legs = self.truck_legs.get(truck_id, ((), ()))
+        i = bisect_right(starts, query_time)
+        if i == 0:
+            return 0.0
+        start_time, distance, miles_before, speed = legs[i - 1]
+        driven = speed * (query_time - start_time) / SECONDS_PER_MINUTE
+        return miles_before + min(driven, distance)
+
+    def total_mileage_at(self, query_time):
+        """
+        Returns the miles all trucks have driven by a time.
+
+        :param query_time: the time to look up, in seconds after midnight
+        :type query_time: int
+        :return: the miles driven
+        :rtype: float
+        """
+        return sum(self.truck_mileage_at(truck_id, query_time) for truck_id in self.truck_legs)
+
+    def _add_change(self, package_id, event_time, change):
+        """
+        Appends a status change to a package's list.  Events arrive in time order from the
+        simulation, so the lists stay sorted.
+        """
+        times, changes = self.package_events.setdefault(package_id, ([], []))
+        times.append(event_time)
+        changes.append(change)
@@ -1,6 +1,130 @@
 # Jennifer Pillow pillje@hotmail.com
 
-from Package import Package
+from Package import Package, STATUS_AT_HUB
+
+
+class Manifest:
+    """
+    A class used to represent the packages on a truck, filed by the location they are delivered
+    to.  Membership, counting, adding and removing a package take constant time, and the packages
+    for a stop are taken off together in time proportional to their number.  Iterating gives the
+    packages in the order they were added.
+
+    Methods
+    --------
+    add(package)
+        Files a package under its delivery location.
+    remove(package)
+        Takes a package off the manifest.
+    take_stop(location)
+        Takes off and returns all packages for a location.
+    refile(package)
+        Files a package again after its delivery location has changed.
+    stops()
+        Returns the locations with packages still to deliver.
+    clear()
+        Takes all packages off the manifest.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the Manifest class
+        """
+        self._packages = {}     # package -> location it is filed under, in order added
+        self._stops = {}        # location -> {package: None} of the packages for the location
+
+    def __len__(self):
+        """
+        Returns the number of packages on the manifest.
+
+        :return: the number of packages
+        :rtype: int
+        """
+        return len(self._packages)
+
+    def __contains__(self, package):
+        """
+        Returns whether a package is on the manifest.
+
+        :param package: the package
+        :type package: Package
+        :return: True if the package is on the manifest
+        :rtype: bool
+        """
+        return package in self._packages
+
+    def __iter__(self):
+        """
+        Iterates over the packages on the manifest in the order they were added.
+        """
+        return iter(self._packages)
+
+    def add(self, package):
+        """
+        Files a package under its delivery location.
+
+        :param package: the package, not already on the manifest
+        :type package: Package
+        """
+        self._packages[package] = package.location
+        self._stops.setdefault(package.location, {})[package] = None
+
+    def remove(self, package):
+        """
+        Takes a package off the manifest.
+
+        :param package: the package, on the manifest
+        :type package: Package
+        :raises KeyError: if the package is not on the manifest
+        """
+        location = self._packages.pop(package)
+        group = self._stops[location]
+        del group[package]
+        if not group:
+            del self._stops[location]
+
+    def take_stop(self, location):
+        """
+        Takes off all packages for a location.
+
+        :param location: the delivery location
+        :type location: Location
+        :return: the packages for the location, in the order they were added (empty if none)
+        :rtype: list
+        """
+        group = self._stops.pop(location, None)
+        if group is None:
+            return []
+        for package in group:
+            del self._packages[package]
+        return list(group)
+
+    def refile(self, package):
+        """
+        Files a package again under its delivery location, after the location has been changed.
+
+        :param package: the package, on the manifest
+        :type package: Package
+        :raises KeyError: if the package is not on the manifest
+        """
+        self.remove(package)
+        self.add(package)
+
+    def stops(self):
+        """
+        Returns the locations with packages still to deliver.
+
+        :return: the locations, in the order their first package was added
+        :rtype: list
+        """
+        return list(self._stops)
+
+    def clear(self):
+        """
+        Takes all packages off the manifest.
+        """
+        self._packages.clear()
+        self._stops.clear()
 
 
 class Truck:
@@ -8,12 +132,17 @@ class Truck:
 
     Attributes
     ----------
-    packages : list
-        a list of packages that are loaded on the truck
+    manifest : Manifest
+        the packages that are loaded on the truck, filed by delivery location
+    packages : tuple
+        the packages that are loaded on the truck, in the order they were loaded (read only;
+        packages are loaded and delivered through the methods below)
     distance : float
         the total distance travelled by the truck during the delivery day
     truck_id : int
         an identifying number for the truck, should be unique for each instance
+    capacity : int
+        the number of packages the truck can hold
 
     Methods
     --------
@@ -23,6 +152,8 @@ class Truck:
         Adds a package to the trucks package list
     deliver_package(package, del_time)
         Removes the package from the trucks package list and updates the package status
+    deliver_stop(location, del_time)
+        Removes all packages for a location from the trucks package list and updates their status
     drive(dist)
         Increases the truck's distance attribute by the amount of the passed value dist.
     empty_truck()
@@ -33,16 +164,19 @@ class Truck:
         Returns a formatted string representation of the truck.
     """
 
-    def __init__(self, tr_id):
+    def __init__(self, tr_id, capacity=16):
         """
         Constructor for the Truck class
 
         :param tr_id: The identifying number for the truck, should be unique
         :type tr_id: int
+        :param capacity: optional number of packages the truck can hold (default 16)
+        :type capacity: int
         """
-        self.packages = []
+        self.manifest = Manifest()
         self.distance = 0.0
         self.truck_id = tr_id
+        self.capacity = capacity
 
     def get_num_packages(self):
         """
@@ -51,24 +185,37 @@ class Truck:
         :return: The number of packages in the truck's package list
         :rtype: int
         """
-        return len(self.packages)
+        return len(self.manifest)
+
+    @property
+    def packages(self):
+        """
+        Returns the packages loaded on the truck, in the order they were loaded, as a tuple that
+        cannot be changed: packages go on and off the truck only through load_package and the
+        deliver methods, and a changed address is filed again with manifest.refile.  Code that
+        only iterates over the packages can use the manifest itself and skip the copy.
+
+        :return: the packages
+        :rtype: tuple
+        """
+        return tuple(self.manifest)
 
     def load_package(self, package):
         """
         Adds a package to the truck's package list.
 
         Only adds package if: the package is not None type, not already in the truck's package list,
-        the truck's package list has less than 16 packages, and the package status is "AT HUB".
+        the truck's package list has fewer packages than the truck's capacity, and the package status is "AT HUB".
 
         :param package: The package to add to the truck
         :type package: Package
         :return: The success of adding the package to the truck
         :rtype: bool
         """
-        if package is not None and package not in self.packages:
-            if self.get_num_packages() < 16 and package.status == "AT HUB":
-                self.packages.append(package)
-                package.status = ("EN ROUTE ON TRUCK " + str(self.truck_id))
+        if package is not None and package not in self.manifest:
+            if len(self.manifest) < self.capacity and package.status_code == STATUS_AT_HUB:
+                self.manifest.add(package)
+                package.load(self.truck_id)
                 return True
         # print("package", package.package_id, " load error on truck", self.truck_id)
         return False
@@ -79,15 +226,31 @@ class Truck:
 
         :param package: package to deliver
         :type package: Package
-        :param del_time: delivery time
-        :type del_time: str
+        :param del_time: delivery time in seconds after midnight
+        :type del_time: int
         """
-        if package in self.packages:
-            package.status = "Delivered at " + del_time  # add delivery time
-            self.packages.remove(package)
+        if package in self.manifest:
+            package.deliver(del_time)  # add delivery time
+            self.manifest.remove(package)
         else:
             print("delivery error for package ", package.package_id)
 
+    def deliver_stop(self, location, del_time):
+        """
+        Removes all packages for a location from the truck's package list and changes their status.
+
+        :param location: the location the truck is at
+        :type location: Location
+        :param del_time: delivery time in seconds after midnight
+        :type del_time: int
+        :return: the packages delivered, in the order they were loaded
+        :rtype: list
+        """
+        delivered = self.manifest.take_stop(location)
+        for package in delivered:
+            package.deliver(del_time)
+        return delivered
+
     def drive(self, dist):
         """
         Increases the truck's distance attribute by the amount of the passed value dist.
@@ -101,7 +264,7 @@ class Truck:
         """
         Removes all packages from the truck's package list
         """
-        self.packages.clear()
+        self.manifest.clear()
 
     def __repr__(self):
         """
@@ -116,7 +279,7 @@ class Truck:
         """
         ret_str = "Truck " + str(self.truck_id)
         ret_str += " # of Packages: " + str(self.get_num_packages()) + "  Package IDs: "
-        for package in self.packages:
+        for package in self.manifest:
             ret_str += str(package.package_id) + ", "
         ret_str = ret_str[:-2]
         ret_str += "  Distance Travelled: " + str(self.distance)
@@ -0,0 +1,57 @@
+# Compares the memory used by the dictionary distance store of Graph with the compact
+# DistanceMatrix store for complete graphs of increasing size.
+#
+# Usage: python benchmarks/distance_memory.py [size ...]
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import Location, Graph
+
+
+def build_complete_graph(size, compact, seed=0):
+    """
+    Builds a complete graph of size locations with random distances between every pair.
+    """
+    rng = random.Random(seed)
+    graph = Graph(compact=compact)
+    locations = []
+    for i in range(size):
+        location = Location("Stop " + str(i), str(i) + " Main St", "84000")
+        graph.add_location(location)
+        locations.append(location)
+    for i in range(size):
+        for j in range(i):
+            graph.add_distance(locations[i], locations[j], round(rng.uniform(0.5, 15.0), 1))
+    return graph
+
+
+def measure(size, compact):
+    """
+    Returns the memory held by a complete graph after it is built, in bytes, and the build time.
+    """
+    tracemalloc.start()
+    begin = time.perf_counter()
+    graph = build_complete_graph(size, compact)
+    secs = time.perf_counter() - begin
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph
+    return used, secs
+
+
+def main(sizes):
+    for size in sizes:
+        dict_bytes, dict_secs = measure(size, compact=False)
+        matrix_bytes, matrix_secs = measure(size, compact=True)
+        print("locations: {:>6}  dict: {:9.1f} MB ({:6.2f}s)  matrix: {:7.1f} MB ({:6.2f}s)  ratio: {:5.1f}x".format(
+            size, dict_bytes / 2 ** 20, dict_secs, matrix_bytes / 2 ** 20, matrix_secs, dict_bytes / matrix_bytes))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [250, 500, 1000])
@@ -0,0 +1,88 @@
+# Compares the routes of plan_route, plan_improved_route and plan_exact_route through synthetic
+# truckloads of up to EXACT_MAX_STOPS stops, with a mix of deadlines, in miles and time taken.
+#
+# Usage: python benchmarks/exact_routes.py [stops ...] [--loads 5] [--seed S]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import all_pairs_shortest_path
+from ExactRoute import EXACT_MAX_STOPS, numpy
+from Package import Package, SECONDS_PER_MINUTE
+from Routing import plan_route, plan_improved_route, plan_exact_route, route_length, travel_seconds
+from shortest_paths import synthetic_graph
+
+SPEED = 0.3
+DEPART_TIME = 8 * 60 * SECONDS_PER_MINUTE
+
+
+def synthetic_load(stops, rng):
+    """
+    Returns a graph of a synthetic instance of the given number of stops and one package per
+    stop, with a mix of deadlines.
+    """
+    graph = synthetic_graph(stops + 1, rng.randrange(1 << 30))
+    graph.shortest = all_pairs_shortest_path(graph)
+    packages = []
+    for i, location in enumerate(graph.get_locations()[1:], 1):
+        package = Package(i, location.address, "Salt Lake City", "UT", "84000",
+                          rng.choice(("10:30 AM", "EOD", "EOD", "EOD")), "1", "")
+        package.location = location
+        packages.append(package)
+    return graph, packages
+
+
+def late_stops(graph, start_loc, route, packages):
+    """
+    Returns the number of stops of a route reached after their earliest package deadline, on the
+    simulation clock.
+    """
+    deadline = {}
+    for package in packages:
+        deadline[package.location] = min(deadline.get(package.location, package.deadline_time), package.deadline_time)
+    late = 0
+    arrival = DEPART_TIME
+    curr_loc = start_loc
+    for next_loc in route:
+        arrival += travel_seconds(graph.get_distance(curr_loc, next_loc), SPEED)
+        late += arrival > deadline[next_loc]
+        curr_loc = next_loc
+    return late
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark exact routes of small truckloads.")
+    parser.add_argument("stops", type=int, nargs="*", default=[8, 12, EXACT_MAX_STOPS])
+    parser.add_argument("--loads", type=int, default=5, help="synthetic loads of each size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print("exact routes with {}, up to {} stops".format("NumPy" if numpy is not None else "pure Python",
+                                                        EXACT_MAX_STOPS))
+    rng = random.Random(args.seed)
+    planners = (("greedy", plan_route), ("improved", plan_improved_route), ("exact", plan_exact_route))
+    for stops in args.stops:
+        miles = {name: 0.0 for name, planner in planners}
+        seconds = dict.fromkeys(miles, 0.0)
+        late = dict.fromkeys(miles, 0)
+        for i in range(args.loads):
+            graph, packages = synthetic_load(stops, rng)
+            hub = graph.get_locations()[0]
+            for name, planner in planners:
+                begin = time.perf_counter()
+                route = planner(graph, hub, packages, DEPART_TIME, SPEED)
+                seconds[name] = max(seconds[name], time.perf_counter() - begin)
+                miles[name] += route_length(graph, hub, route)
+                late[name] += late_stops(graph, hub, route, packages)
+        print("{:3d} stops: ".format(stops) + "  ".join(
+            "{} {:7.1f} mi, {} late (max {:.3f}s)".format(name, miles[name] / args.loads, late[name], seconds[name])
+            for name, planner in planners))
+
+
+if __name__ == "__main__":
+    main()
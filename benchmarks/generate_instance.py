@@ -0,0 +1,136 @@
+# Generates synthetic delivery days in the format of the shipped CSV files: a Distance Names
+# file, a lower-triangular Distance Data file and a Package File, all from a seed so the same
+# arguments always give the same files.
+#
+# Usage: python benchmarks/generate_instance.py directory [--locations N] [--packages M] [--seed S]
+
+import argparse
+import csv
+import os
+import random
+
+HUB = ("Western Governors University", "4001 South 700 East", "84107")
+STREETS = ("Main St", "State St", "Redwood Rd", "Highland Dr", "Parkway Blvd", "Canyon Rd", "Oakland Ave",
+           "Dalton Ave S", "Lester St", "Pioneer Rd", "Bennett Cir", "Taylorsville Blvd", "Elm St")
+GRID = 200  # locations are on a 20 x 20 mile grid of 0.1 mile blocks
+DEADLINES = (("EOD", 60), ("10:30 AM", 24), ("9:00 AM", 6), ("12:00 PM", 5), ("3:00 PM", 5))
+NUM_TRUCKS = 3
+
+
+def generate_locations(count, seed=0):
+    """
+    Returns count locations, the first of them the hub, as (name, address, zipcode, x, y) tuples
+    with grid coordinates in tenths of a mile.
+    """
+    rng = random.Random(seed)
+    locations = [HUB + (GRID // 2, GRID // 2)]
+    addresses = {HUB[1]}
+    while len(locations) < count:
+        address = "{} {}".format(rng.randrange(100, 9999), rng.choice(STREETS))
+        if address in addresses:
+            continue
+        addresses.add(address)
+        x, y = rng.randrange(GRID + 1), rng.randrange(GRID + 1)
+        zipcode = "84{:03d}".format(100 + (x // 40) * 5 + y // 40)
+        locations.append(("Stop " + str(len(locations)), address, zipcode, x, y))
+    return locations
+
+
+def write_distance_files(names_file, data_file, locations):
+    """
+    Writes the Distance Names file and the lower-triangular Distance Data file for the locations.
+    Distances are street (Manhattan) distances on the 0.1 mile grid, so they are exact to one
+    decimal and always meet the triangle inequality.
+    """
+    with open(names_file, 'w', newline='') as names:
+        writer = csv.writer(names)
+        for name, address, zipcode, x, y in locations:
+            writer.writerow((name, address, zipcode))
+    count = len(locations)
+    with open(data_file, 'w', newline='') as data:
+        for i, (_, _, _, x, y) in enumerate(locations):
+            row = ["{:.1f}".format((abs(x - other[3]) + abs(y - other[4])) / 10) for other in locations[:i + 1]]
+            data.write(",".join(row) + "," * (count - i - 1) + "\n")
+
+
+def write_package_file(package_file, locations, count, seed=0):
+    """
+    Writes a Package File of count packages for random locations other than the hub, with a mix
+    of deadlines and of the notes found in the shipped file: truck restrictions, delayed
+    packages, a corrected address available after 10:20, and small groups of packages that must
+    be delivered together.  Delayed packages are never due before 10:30 AM.
+    """
+    rng = random.Random(seed)
+    deadlines = [deadline for deadline, weight in DEADLINES for _ in range(weight)]
+    stops = locations[1:]
+    rows = []
+    package_id = 1
+    while package_id <= count:
+        name, address, zipcode, x, y = rng.choice(stops)
+        deadline = rng.choice(deadlines)
+        notes = ""
+        roll = rng.random()
+        if roll < 0.02:
+            notes = "Can only be on truck {}".format(rng.randint(1, NUM_TRUCKS))
+        elif roll < 0.05:
+            notes = "Delayed on flight---will not arrive to depot until 9:05 am"
+            if deadline == "9:00 AM":
+                deadline = "10:30 AM"
+        elif roll < 0.055:
+            notes = "Deliver after 10:20"
+            deadline = "EOD"
+        elif roll < 0.065 and package_id + 2 <= count:
+            # a group of three: this package names the next two, which are due by the same time
+            group = (package_id, package_id + 1, package_id + 2)
+            for member in group:
+                others = ", ".join(str(other) for other in group if other != member)
+                name, address, zipcode, x, y = rng.choice(stops)
+                rows.append((member, address, "Salt Lake City", "UT", zipcode, deadline, rng.randint(1, 90),
+                             "Must be delivered with " + others))
+            package_id += 3
+            continue
+        rows.append((package_id, address, "Salt Lake City", "UT", zipcode, deadline, rng.randint(1, 90), notes))
+        package_id += 1
+
+    with open(package_file, 'w', newline='') as packages:
+        csv.writer(packages).writerows(rows)
+
+
+def generate_instance(directory, num_locations, num_packages, seed=0):
+    """
+    Writes the three CSV files of a synthetic delivery day into a directory.
+
+    :param directory: the directory to write the files to, created if needed
+    :type directory: str
+    :param num_locations: the number of locations, including the hub
+    :type num_locations: int
+    :param num_packages: the number of packages
+    :type num_packages: int
+    :param seed: optional random seed
+    :type seed: int
+    :return: the paths of the Distance Names, Distance Data and Package File files
+    :rtype: tuple
+    """
+    os.makedirs(directory, exist_ok=True)
+    names_file = os.path.join(directory, "Distance Names.csv")
+    data_file = os.path.join(directory, "Distance Data.csv")
+    package_file = os.path.join(directory, "Package File.csv")
+    locations = generate_locations(num_locations, seed)
+    write_distance_files(names_file, data_file, locations)
+    write_package_file(package_file, locations, num_packages, seed)
+    return names_file, data_file, package_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic delivery day.")
+    parser.add_argument("directory", help="directory to write the CSV files to")
+    parser.add_argument("--locations", type=int, default=27, help="number of locations, including the hub")
+    parser.add_argument("--packages", type=int, default=40, help="number of packages")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+    for path in generate_instance(args.directory, args.locations, args.packages, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
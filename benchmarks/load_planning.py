@@ -0,0 +1,109 @@
+# Times the load planner on synthetic days of many packages and checks that every plan loads
+# each package once, within truck capacity and the truck, delay and delivered-with notes.  The
+# fleet grows with the packages, one driver for every PACKAGES_PER_DRIVER packages, and the
+# packages the plan would deliver after their deadline are counted.
+#
+# Usage: python benchmarks/load_planning.py [packages ...]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import all_pairs_shortest_path
+from LoadPlanner import build_units, plan_loads
+from Package import SECONDS_PER_MINUTE, Package, format_time, link_delivery_groups, parse_clock
+from Truck import Truck
+from shortest_paths import synthetic_graph
+
+LOCATIONS = 300
+PACKAGES_PER_DRIVER = 50
+SPARE_TRUCKS = 2
+SPEED = 0.3
+
+
+def synthetic_packages(graph, count, trucks, seed=0):
+    """
+    Returns packages for random locations of the graph, with a mix of deadlines and notes.
+    """
+    rng = random.Random(seed)
+    locations = graph.get_locations()[1:]
+    packages = []
+    for package_id in range(1, count + 1):
+        notes = ""
+        roll = rng.random()
+        if roll < 0.02:
+            notes = "Can only be on truck " + str(rng.randint(1, trucks))
+        elif roll < 0.05:
+            notes = "Delayed on flight---will not arrive to depot until 9:05 am"
+        elif roll < 0.06 and package_id > 2:
+            notes = "Must be delivered with {}, {}".format(package_id - 1, package_id - 2)
+        location = rng.choice(locations)
+        package = Package(package_id, location.address, "Salt Lake City", "UT", "84000",
+                          rng.choice(("9:00 AM", "10:30 AM", "EOD", "EOD", "EOD", "EOD")), "5", notes)
+        package.location = location
+        packages.append(package)
+    link_delivery_groups(packages)
+    return packages
+
+
+def check(packages, trips):
+    """
+    Returns a list of the ways the trips break the package constraints or the truck capacity.
+    """
+    problems = []
+    trip_of = {}
+    for number, (truck, trip_packages, ready_time) in enumerate(trips):
+        if len(trip_packages) > truck.capacity:
+            problems.append("trip {} carries {} packages".format(number, len(trip_packages)))
+        for package in trip_packages:
+            if package.package_id in trip_of:
+                problems.append("package {} planned twice".format(package.package_id))
+            trip_of[package.package_id] = number
+            if not package.can_go_on(truck.truck_id):
+                problems.append("package {} on truck {}".format(package.package_id, truck.truck_id))
+            if ready_time < package.available_minutes * SECONDS_PER_MINUTE:
+                problems.append("package {} leaves before it arrives".format(package.package_id))
+    for package in packages:
+        if package.package_id not in trip_of:
+            problems.append("package {} not planned".format(package.package_id))
+    for unit in build_units(packages, 16):
+        if len({trip_of.get(package.package_id) for package in unit.packages}) > 1:
+            problems.append("unit of package {} split".format(unit.packages[0].package_id))
+    return problems
+
+
+def run(count):
+    graph = synthetic_graph(LOCATIONS + 1, count)
+    graph.shortest = all_pairs_shortest_path(graph)
+    drivers = max(1, count // PACKAGES_PER_DRIVER)
+    num_trucks = drivers + SPARE_TRUCKS
+    packages = synthetic_packages(graph, count, num_trucks, count)
+    trucks = [Truck(truck_id) for truck_id in range(1, num_trucks + 1)]
+    start = parse_clock('0800')
+
+    late = []
+    begin = time.perf_counter()
+    try:
+        trips = plan_loads(graph, packages, trucks, [start] * num_trucks, drivers, SPEED, late=late)
+    except ValueError as error:
+        print("{:>6} packages, {} drivers: {}".format(count, drivers, error))
+        return
+    secs = time.perf_counter() - begin
+    problems = check(packages, trips)
+    print("{:>6} packages, {:3d} drivers: {:5d} trips in {:6.2f}s, last trip leaves {}  late: {}  "
+          "problems: {}".format(count, drivers, len(trips), secs, format_time(trips[-1][2]), len(late),
+                                len(problems)))
+    for problem in problems[:10]:
+        print("  " + problem)
+
+
+def main(counts):
+    for count in counts:
+        run(count)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000])
@@ -0,0 +1,68 @@
+# Compares the time plan_route takes to order one large deadline bucket by measuring every stop
+# left at each step, and by walking the sorted neighbor lists of NeighborIndex.
+#
+# Usage: python benchmarks/neighbor_routes.py [--stops 500 1000 2000] [--seed S]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import Main
+import Routing
+from DistanceGraph import Graph
+from Package import EOD_TIME
+from generate_instance import generate_locations, write_distance_files
+
+
+class Stop:
+    """
+    A package with only the fields plan_route reads.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self.deadline_time = EOD_TIME
+
+
+def time_route(graph, hub, stops, walk_min):
+    Routing.NEIGHBOR_WALK_MIN = walk_min
+    begin = time.perf_counter()
+    route = Routing.plan_route(graph, hub, stops)
+    return time.perf_counter() - begin, route
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark greedy route ordering with a neighbor index.")
+    parser.add_argument("--stops", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    walk_min = Routing.NEIGHBOR_WALK_MIN
+    for count in args.stops:
+        with tempfile.TemporaryDirectory() as directory:
+            names_file = os.path.join(directory, "names.csv")
+            data_file = os.path.join(directory, "data.csv")
+            write_distance_files(names_file, data_file, generate_locations(count + 1, args.seed))
+            graph = Graph(compact=True)
+            Main.load_graph(graph, names_file, data_file)
+        # generated distances are street distances on a grid, already the shortest paths
+        graph.shortest = graph.edge_matrix()
+        locations = graph.get_locations()
+        stops = [Stop(location) for location in locations[1:]]
+
+        begin = time.perf_counter()
+        graph.neighbor_index()
+        build = time.perf_counter() - begin
+        scan, scan_route = time_route(graph, locations[0], stops, len(stops))
+        walk, walk_route = time_route(graph, locations[0], stops, walk_min)
+        print("{:6d} stops: scan {:8.4f}s  neighbor walk {:8.4f}s (index built in {:.4f}s)  same route: {}".format(
+            count, scan, walk, build, scan_route == walk_route))
+    Routing.NEIGHBOR_WALK_MIN = walk_min
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# Times each stage of the dispatch pipeline on synthetic days of increasing size, records the
+# peak memory of each stage, and writes the results as JSON so runs on different revisions can
+# be compared.
+#
+# Usage: python benchmarks/pipeline.py [--tiers small medium large] [--seed S]
+#                                      [--output results.json] [--compare old_results.json]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import Main
+from DistanceGraph import Graph, dijkstra_shortest_path, shortest_path, all_pairs_shortest_path, numpy
+from HashTable import HashTable
+from Package import SECONDS_PER_DAY, parse_clock
+from LoadPlanner import plan_loads
+from Routing import plan_route
+from Truck import Truck
+from generate_instance import generate_instance
+
+# name -> (locations, packages, trucks, drivers)
+TIERS = {
+    "tiny": (27, 40, 3, 2),
+    "small": (50, 200, 4, 3),
+    "medium": (200, 2000, 30, 30),
+    "large": (500, 10000, 120, 120),
+}
+SPEED = 0.3
+HORIZON_DAYS = 30     # days the simulated day may run over, for the tiers that need more than one
+HORIZON_END = HORIZON_DAYS * SECONDS_PER_DAY
+
+
+def stage_load_graph(context):
+    context["graph"] = Graph(compact=True)
+    Main.load_graph(context["graph"], context["names_file"], context["data_file"])
+
+
+def stage_dijkstra_one_source(context):
+    # the legacy search on a dictionary graph, from the hub only
+    graph = Graph()
+    locations = Main.load_graph(graph, context["names_file"], context["data_file"])
+    begin = time.perf_counter()
+    dijkstra_shortest_path(graph, locations[0])
+    return time.perf_counter() - begin
+
+
+def stage_shortest_path_one_source(context):
+    graph = context["graph"]
+    shortest_path(graph, graph.get_locations()[0])
+
+
+def stage_all_pairs(context):
+    context["graph"].shortest = all_pairs_shortest_path(context["graph"])
+
+
+def stage_ingest(context):
+    context["table"] = HashTable()
+    report = Main.load_packages(context["table"], context["graph"], context["package_file"])
+    context["packages"] = list(context["table"])
+    return None, {"rows_per_second": round(report.rows_per_second), "rejected": report.rejected}
+
+
+def stage_search(context):
+    table = context["table"]
+    for package in context["packages"]:
+        table.search(package.package_id)
+
+
+def stage_plan_loads(context):
+    trucks, drivers = context["trucks"], context["drivers"]
+    start = parse_clock("0800")
+    context["fleet"] = [Truck(truck_id) for truck_id in range(1, trucks + 1)]
+    context["ready_times"] = [start] * trucks
+    context["trips"] = plan_loads(context["graph"], context["packages"], context["fleet"], context["ready_times"],
+                                  drivers, SPEED, day_end=HORIZON_END)
+    return None, {"trips": len(context["trips"])}
+
+
+def stage_plan_routes(context):
+    graph = context["graph"]
+    hub = graph.get_locations()[0]
+    for truck, packages, ready_time in context["trips"]:
+        plan_route(graph, hub, packages)
+
+
+def stage_simulate_day(context):
+    context["table"].reset_packages()
+    for truck in context["fleet"]:
+        truck.reset_truck()
+    end = Main.simulate_day(context["graph"], context["packages"], context["fleet"], context["ready_times"],
+                            context["drivers"], SPEED, HORIZON_END, day_end=HORIZON_END)
+    late = sum(1 for package in context["packages"] if package.delivery_time > package.deadline_time)
+    undelivered = sum(1 for package in context["packages"] if package.delivery_time < 0)
+    return None, {"miles": round(sum(truck.distance for truck in context["fleet"]), 1), "late": late,
+                  "undelivered": undelivered, "end": str(end)}
+
+
+STAGES = (
+    ("load_graph", stage_load_graph),
+    ("dijkstra_one_source", stage_dijkstra_one_source),
+    ("shortest_path_one_source", stage_shortest_path_one_source),
+    ("all_pairs_shortest_path", stage_all_pairs),
+    ("ingest_packages", stage_ingest),
+    ("hash_table_search", stage_search),
+    ("plan_loads", stage_plan_loads),
+    ("plan_routes", stage_plan_routes),
+    ("simulate_day", stage_simulate_day),
+)
+
+
+def run_stages(context, trace_memory):
+    """
+    Runs every stage in order and returns {stage: seconds} or, when tracing memory,
+    {stage: peak bytes}.  A stage may return its own timing, to leave out its setup, and extra
+    values to report.
+    """
+    results = {}
+    for name, stage in STAGES:
+        if trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        begin = time.perf_counter()
+        returned = stage(context)
+        seconds = time.perf_counter() - begin
+        extra = {}
+        if isinstance(returned, tuple):
+            returned, extra = returned
+        if returned is not None:
+            seconds = returned
+        if trace_memory:
+            results[name] = tracemalloc.get_traced_memory()[1] - base
+        else:
+            results[name] = dict(seconds=round(seconds, 6), **extra)
+    return results
+
+
+def run_tier(name, seed, directory):
+    """
+    Generates the files for a tier and returns its results.
+    """
+    num_locations, num_packages, trucks, drivers = TIERS[name]
+    names_file, data_file, package_file = generate_instance(os.path.join(directory, name), num_locations,
+                                                            num_packages, seed)
+    context = dict(names_file=names_file, data_file=data_file, package_file=package_file,
+                   trucks=trucks, drivers=drivers)
+    stages = run_stages(dict(context), False)
+    tracemalloc.start()
+    try:
+        peaks = run_stages(dict(context), True)
+    finally:
+        tracemalloc.stop()
+    for stage_name, peak in peaks.items():
+        stages[stage_name]["peak_bytes"] = peak
+    return {"tier": name, "locations": num_locations, "packages": num_packages, "trucks": trucks,
+            "drivers": drivers, "seed": seed, "stages": stages}
+
+
+def revision():
+    """
+    Returns the git revision of the program, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_results):
+    """
+    Prints the change in time of every stage from an earlier results file.
+    """
+    old_tiers = {tier["tier"]: tier for tier in old_results["tiers"]}
+    for tier in results["tiers"]:
+        old = old_tiers.get(tier["tier"])
+        if old is None:
+            continue
+        for stage, values in tier["stages"].items():
+            old_values = old["stages"].get(stage)
+            if old_values and old_values["seconds"] > 0:
+                print("{:<8} {:<26} {:9.4f}s -> {:9.4f}s  x{:.2f}".format(
+                    tier["tier"], stage, old_values["seconds"], values["seconds"],
+                    values["seconds"] / old_values["seconds"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dispatch pipeline on synthetic days.")
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["tiny", "small", "medium"])
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generated days")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", default=None, help="earlier JSON results file to compare with")
+    args = parser.parse_args(argv)
+
+    results = {
+        "revision": revision(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": numpy is not None,
+        "tiers": [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.tiers:
+            tier = run_tier(name, args.seed, directory)
+            results["tiers"].append(tier)
+            for stage, values in tier["stages"].items():
+                print("{:<8} {:<26} {:9.4f}s  peak {:8.1f} KiB".format(
+                    name, stage, values["seconds"], values["peak_bytes"] / 1024))
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print("results written to " + args.output)
+    if args.compare is not None:
+        with open(args.compare) as old:
+            compare(results, json.load(old))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Times Replanner.replan on a generated day with a large fleet in the middle of its routes:
+# address corrections on a share of the trucks, and delayed packages arriving while some trucks
+# are at the hub.
+#
+# Usage: python benchmarks/replanning.py [--trucks 100] [--locations 500] [--affected 0.2 1.0]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import Main
+from DistanceGraph import Graph
+from HashTable import HashTable
+from Package import STATUS_AT_HUB, parse_clock
+from Replanner import TruckState, ChangeSet, replan
+from Routing import plan_route
+from Truck import Truck
+from generate_instance import generate_instance
+
+SPEED = 0.3
+AT_HUB_SHARE = 0.1      # share of the trucks back at the hub when the change set comes in
+
+
+def build_states(graph, packages, num_trucks, rng):
+    """
+    Loads full trucks and puts each one part way along its greedy route, except for a share
+    that is back at the hub.  Returns the states and the packages left at the hub.
+    """
+    hub = graph.get_locations()[0]
+    now = parse_clock("1030")
+    states = {}
+    remaining = list(packages)
+    for truck_id in range(1, num_trucks + 1):
+        truck = Truck(truck_id)
+        if truck_id <= num_trucks * AT_HUB_SHARE:
+            states[truck_id] = TruckState(truck, hub, now, rng.uniform(20, 40))
+            continue
+        load = [package for package in remaining[:truck.capacity * 2] if package.can_go_on(truck_id)][:truck.capacity]
+        for package in load:
+            truck.load_package(package)
+            remaining.remove(package)
+        route = plan_route(graph, hub, truck.packages)
+        done = rng.randrange(len(route) // 2)
+        delivered = set(route[:done])
+        for package in list(truck.packages):
+            if package.location in delivered:
+                truck.deliver_package(package, 36000)
+        location = route[done - 1] if done else hub
+        states[truck_id] = TruckState(truck, location, now, rng.uniform(10, 40), route[done:])
+    return states, [package for package in remaining if package.status_code == STATUS_AT_HUB]
+
+
+def run(graph, table, num_trucks, affected, seed):
+    """
+    Re-plans once after changing a package on a share of the trucks and returns the result.
+    """
+    rng = random.Random(seed)
+    table.reset_packages()
+    states, at_hub = build_states(graph, list(table), num_trucks, rng)
+    addresses = [location.address for location in graph.get_locations()[1:]]
+    loaded = [state for state in states.values() if state.truck.packages]
+    changes = ChangeSet()
+    for state in rng.sample(loaded, round(len(loaded) * affected)):
+        package = rng.choice(state.truck.packages)
+        changes.addresses[package.package_id] = rng.choice(addresses)
+    changes.arrived = [package.package_id for package in at_hub[:num_trucks]]
+    return replan(graph, states, changes, SPEED, at_hub)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark incremental re-planning.")
+    parser.add_argument("--trucks", type=int, default=100)
+    parser.add_argument("--locations", type=int, default=500)
+    parser.add_argument("--affected", type=float, nargs="+", default=[0.2, 1.0],
+                        help="shares of the trucks with a changed package")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        names_file, data_file, package_file = generate_instance(directory, args.locations, args.trucks * 20,
+                                                                args.seed)
+        graph = Graph(compact=True)
+        Main.build_graph(graph, names_file, data_file, None)
+        table = HashTable()
+        Main.load_packages(table, graph, package_file)
+
+    for affected in args.affected:
+        times = []
+        for i in range(args.repeat):
+            result = run(graph, table, args.trucks, affected, args.seed + i)
+            times.append(result.seconds)
+        times.sort()
+        print("{} trucks, {:4.0%} affected: {} routes re-planned, {} pending, median {:.2f} ms, max {:.2f} ms".format(
+            args.trucks, affected, len(result.routes), len(result.pending), times[len(times) // 2] * 1000,
+            times[-1] * 1000))
+
+
+if __name__ == "__main__":
+    main()
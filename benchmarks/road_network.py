@@ -0,0 +1,91 @@
+# Loads a synthetic sparse city, a grid of intersections with some road segments missing, as an
+# edge list, and times the on-demand shortest distances between delivery stops over it.
+#
+# Usage: python benchmarks/road_network.py [--size 200] [--stops 40] [--seed S]
+#        (--size 448 is a city of about 200,000 intersections)
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import Graph
+from Package import EOD_TIME
+from RoadNetwork import load_road_graph
+from Routing import plan_route
+
+MISSING = 0.1   # share of the grid's road segments left out
+
+
+class Stop:
+    """
+    A package with only the fields plan_route reads.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self.deadline_time = EOD_TIME
+
+
+def write_city(edge_file, names_file, size, stops, seed):
+    """
+    Writes the edge list of a size x size grid of intersections with segments of 0.05 to 0.2
+    miles, and a names file of delivery stops at random intersections, the first one the hub.
+    """
+    rng = random.Random(seed)
+    with open(edge_file, 'w') as edges:
+        edges.write("from,to,miles\n")
+        for y in range(size):
+            for x in range(size):
+                node = y * size + x
+                # keep the first row and column whole so every intersection stays reachable
+                if x + 1 < size and (y == 0 or rng.random() >= MISSING):
+                    edges.write("{},{},{:.2f}\n".format(node, node + 1, rng.uniform(0.05, 0.2)))
+                if y + 1 < size and (x == 0 or rng.random() >= MISSING):
+                    edges.write("{},{},{:.2f}\n".format(node, node + size, rng.uniform(0.05, 0.2)))
+    with open(names_file, 'w') as names:
+        for i, node in enumerate(rng.sample(range(size * size), stops)):
+            names.write("Stop {0},{0} Main St,84100,{1}\n".format(i, node))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark a sparse road network.")
+    parser.add_argument("--size", type=int, default=200, help="intersections along each side of the grid")
+    parser.add_argument("--stops", type=int, default=40, help="delivery stops, including the hub")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        edge_file = os.path.join(directory, "edges.csv")
+        names_file = os.path.join(directory, "names.csv")
+        write_city(edge_file, names_file, args.size, args.stops, args.seed)
+
+        begin = time.perf_counter()
+        graph = Graph(compact=True)
+        network = load_road_graph(graph, names_file, edge_file)
+        load = time.perf_counter() - begin
+        # a second load for the peak memory, as tracing slows it down
+        tracemalloc.start()
+        load_road_graph(Graph(compact=True), names_file, edge_file)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print("{:,} intersections, {:,} segments loaded in {:.2f}s, peak {:.1f} MiB".format(
+        len(network), len(network.targets) // 2, load, peak / 2 ** 20))
+
+    locations = graph.get_locations()
+    begin = time.perf_counter()
+    graph.get_distance(locations[0], locations[1])
+    print("first stop-to-stop distance in {:.3f}s".format(time.perf_counter() - begin))
+    begin = time.perf_counter()
+    route = plan_route(graph, locations[0], [Stop(location) for location in locations[1:]])
+    print("greedy route of {} stops in {:.2f}s, {} of {} rows computed".format(
+        len(route), time.perf_counter() - begin, graph.shortest.rows_computed, len(locations)))
+
+
+if __name__ == "__main__":
+    main()
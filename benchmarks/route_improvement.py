@@ -0,0 +1,85 @@
+# Reports the miles saved by improving the greedy routes with 2-opt and Or-opt moves, on the
+# shipped data and on synthetic instances with many stops.
+#
+# Usage: python benchmarks/route_improvement.py [stops ...]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import Main
+from DistanceGraph import all_pairs_shortest_path
+from Package import Package, SECONDS_PER_HOUR
+from Routing import plan_route, improve_route, route_length, stop_deadlines
+from shortest_paths import synthetic_graph
+
+TIME_BUDGET = 5.0   # seconds per synthetic route
+DEPART_TIME = 8 * SECONDS_PER_HOUR
+
+
+def shipped_day():
+    """
+    Runs the shipped day with greedy and with improved routes and reports the miles per truck.
+    """
+    Main.build_graph(Main.dist_graph, cache_dir=None)
+    Main.setup_hash_table()
+    trucks = (Main.truck_1, Main.truck_2, Main.truck_3)
+    miles = {}
+    for improve in (False, True):
+        Main.reset()
+        Main.sim_day(improve=improve)
+        late = sum(1 for package in Main.hash_table if package.delivery_time > package.deadline_time)
+        miles[improve] = ([truck.distance for truck in trucks], late)
+    for truck, greedy, improved in zip(trucks, miles[False][0], miles[True][0]):
+        print("shipped truck {}: greedy {:7.1f} mi  improved {:7.1f} mi  saved {:5.1f} mi".format(
+            truck.truck_id, greedy, improved, greedy - improved))
+    greedy_total, improved_total = sum(miles[False][0]), sum(miles[True][0])
+    print("shipped total:   greedy {:7.1f} mi  improved {:7.1f} mi  saved {:5.1f} mi ({:.1f}%)  "
+          "late packages: {} -> {}".format(greedy_total, improved_total, greedy_total - improved_total,
+                                          100 * (greedy_total - improved_total) / greedy_total,
+                                          miles[False][1], miles[True][1]))
+
+
+def synthetic_route(stops, seed=0):
+    """
+    Improves a greedy route through a synthetic instance of the given number of stops, one package
+    per stop, with a mix of deadlines.
+    """
+    rng = random.Random(seed)
+    graph = synthetic_graph(stops + 1, seed)
+    graph.shortest = all_pairs_shortest_path(graph)
+    locations = graph.get_locations()
+    packages = []
+    for i, location in enumerate(locations[1:], 1):
+        package = Package(i, location.address, "Salt Lake City", "UT", "84000",
+                          rng.choice(("9:00 AM", "10:30 AM", "EOD", "EOD", "EOD")), "1", "")
+        package.location = location
+        packages.append(package)
+
+    begin = time.perf_counter()
+    route = plan_route(graph, locations[0], packages)
+    greedy_secs = time.perf_counter() - begin
+    greedy = route_length(graph, locations[0], route)
+
+    for deadlines, speed, label in ((None, None, "no deadlines"), (stop_deadlines(packages), 3.0, "deadlines")):
+        begin = time.perf_counter()
+        improved_route = improve_route(graph, locations[0], route, deadlines, DEPART_TIME, speed, TIME_BUDGET)
+        improve_secs = time.perf_counter() - begin
+        improved = route_length(graph, locations[0], improved_route)
+        print("synthetic {:>4} stops, {:<12}: greedy {:7.1f} mi ({:5.2f}s)  improved {:7.1f} mi ({:5.2f}s)  "
+              "saved {:6.1f} mi ({:.1f}%)".format(stops, label, greedy, greedy_secs, improved, improve_secs,
+                                                  greedy - improved, 100 * (greedy - improved) / greedy))
+
+
+def main(sizes):
+    shipped_day()
+    for stops in sizes:
+        synthetic_route(stops)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 500])
@@ -0,0 +1,114 @@
+# Benchmarks the all-pairs shortest path engine and the heap-based single-source search
+# against the per-location Dijkstra loop that Main.main() used at startup, and checks that
+# they all give the same distances (up to the rounding of the sums, for the all-pairs engine).
+#
+# Usage: python benchmarks/shortest_paths.py [size ...]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import Location, Graph, dijkstra_shortest_path, shortest_path, all_pairs_shortest_path
+from Main import load_graph
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+def shipped_graph():
+    """
+    Builds the graph from the shipped Distance Names.csv and Distance Data.csv files.
+    """
+    graph = Graph()
+    load_graph(graph, os.path.join(DATA_DIR, "Distance Names.csv"), os.path.join(DATA_DIR, "Distance Data.csv"))
+    return graph
+
+
+def synthetic_graph(size, seed=0):
+    """
+    Builds a complete graph of random points on a 20 x 20 mile grid with rounded, slightly
+    inflated street distances, so some direct routes are longer than a path through a third stop.
+    """
+    rng = random.Random(seed)
+    graph = Graph()
+    points = []
+    for i in range(size):
+        location = Location("Stop " + str(i), str(i) + " Main St", "84000")
+        graph.add_location(location)
+        points.append((rng.uniform(0, 20), rng.uniform(0, 20)))
+    for i in range(size):
+        for j in range(i):
+            dx = abs(points[i][0] - points[j][0])
+            dy = abs(points[i][1] - points[j][1])
+            dist = round((dx + dy) * rng.uniform(1.0, 1.3), 1)
+            graph.add_distance(graph.get_locations()[i], graph.get_locations()[j], dist)
+    return graph
+
+
+def legacy_startup(graph):
+    """
+    The startup loop Main.main() used: dijkstra_shortest_path once per location.
+    """
+    for loc in graph.adj_list:
+        dijkstra_shortest_path(graph, loc)
+
+
+def legacy_reference(graph):
+    """
+    Runs dijkstra_shortest_path from every location with the location state and route distances
+    restored before each run, and returns the resulting distances as a matrix.
+    """
+    locations = graph.get_locations()
+    edges = dict(graph.distance)
+    reference = []
+    for start_loc in locations:
+        graph.distance = dict(edges)
+        for loc in locations:
+            loc.distance = float("inf")
+            loc.pred_loc = None
+        dijkstra_shortest_path(graph, start_loc)
+        reference.append([loc.distance for loc in locations])
+    graph.distance = edges
+    return reference
+
+
+def run(name, make_graph):
+    reference = legacy_reference(make_graph())
+
+    graph = make_graph()
+    begin = time.perf_counter()
+    legacy_startup(graph)
+    legacy_secs = time.perf_counter() - begin
+
+    graph = make_graph()
+    begin = time.perf_counter()
+    shortest = all_pairs_shortest_path(graph)
+    engine_secs = time.perf_counter() - begin
+
+    graph = make_graph()
+    begin = time.perf_counter()
+    heap_rows = [list(shortest_path(graph, loc).dist) for loc in graph.get_locations()]
+    heap_secs = time.perf_counter() - begin
+
+    mismatches = count_mismatches(shortest, reference)
+    heap_mismatches = count_mismatches(heap_rows, reference)
+    print("{:<12} locations: {:>5}  legacy: {:8.3f}s  all-pairs: {:8.3f}s ({} mismatches)  "
+          "heap dijkstra: {:8.3f}s ({} mismatches)".format(name, len(shortest), legacy_secs, engine_secs,
+                                                           mismatches, heap_secs, heap_mismatches))
+
+
+def count_mismatches(matrix, reference):
+    return sum(1 for row, ref_row in zip(matrix, reference) for a, b in zip(row, ref_row)
+               if a != b and not abs(a - b) <= 1e-9 * abs(b))
+
+
+def main(sizes):
+    run("shipped", shipped_graph)
+    for size in sizes:
+        run("synthetic", lambda: synthetic_graph(size))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 200])
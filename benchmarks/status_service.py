@@ -0,0 +1,143 @@
+# Load test of StatusService.py: many concurrent keep-alive connections send a mix of package,
+# truck and all-packages queries, optionally with re-simulations running, and the latency
+# percentiles are printed.
+#
+# Usage: python benchmarks/status_service.py [--spawn] [--host 127.0.0.1] [--port 8080]
+#                                            [--connections 50] [--requests 20000]
+#                                            [--resimulate-every 2000]
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# (weight, target) of the query mix; {id} is a package ID, {truck} a truck ID and {time} a time
+QUERIES = ((70, "/packages/{id}?time={time}"), (20, "/trucks/{truck}?time={time}"), (10, "/packages?time={time}"))
+
+
+async def request(reader, writer, method, target, body=b""):
+    """
+    Sends one request on an open connection and returns the status and body of the response.
+    """
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n".format(
+        method, target, len(body)).encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, targets, latencies, errors):
+    """
+    Sends requests from the shared list of targets on one connection until the list is empty.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while targets:
+            target = targets.pop()
+            begin = time.perf_counter()
+            status, _ = await request(reader, writer, "GET", target)
+            latencies.append(time.perf_counter() - begin)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def resimulator(host, port, targets, every, started):
+    """
+    Starts a re-simulation each time another `every` requests have been sent.
+    """
+    total = len(targets)
+    next_at = total - every
+    while targets:
+        if len(targets) <= next_at:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, _ = await request(reader, writer, "POST", "/resimulate")
+            writer.close()
+            if status == 202:
+                started.append(total - len(targets))
+            next_at -= every
+        await asyncio.sleep(0.001)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    weights = [weight for weight, _ in QUERIES]
+    targets = []
+    for _ in range(args.requests):
+        template = rng.choices([target for _, target in QUERIES], weights)[0]
+        targets.append(template.format(id=rng.randint(1, 40), truck=rng.randint(1, 3),
+                                       time="{:02d}{:02d}".format(rng.randint(8, 13), rng.randint(0, 59))))
+    latencies, errors, started = [], [], []
+    begin = time.perf_counter()
+    tasks = [client(args.host, args.port, targets, latencies, errors) for _ in range(args.connections)]
+    if args.resimulate_every:
+        tasks.append(resimulator(args.host, args.port, targets, args.resimulate_every, started))
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - begin
+
+    latencies.sort()
+    print("{} requests on {} connections in {:.2f}s: {:,.0f} requests/s, {} errors".format(
+        len(latencies), args.connections, seconds, len(latencies) / seconds, len(errors)))
+    for name, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("max", 1.0)):
+        print("{} {:8.3f} ms".format(name, latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000))
+    if args.resimulate_every:
+        print("{} re-simulations started".format(len(started)))
+
+
+async def wait_ready(host, port, seconds=30):
+    """
+    Waits until the service accepts connections.
+    """
+    deadline = time.monotonic() + seconds
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the status service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--spawn", action="store_true", help="start the service for the test")
+    parser.add_argument("--connections", type=int, default=50, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=20000, help="total requests")
+    parser.add_argument("--resimulate-every", type=int, default=0,
+                        help="start a re-simulation every N requests (default: never)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the query mix")
+    args = parser.parse_args(argv)
+
+    service = None
+    if args.spawn:
+        service = subprocess.Popen([sys.executable, os.path.join(ROOT, "StatusService.py"), "--host", args.host,
+                                    "--port", str(args.port)], cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready(args.host, args.port))
+        asyncio.run(run(args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Times loading a high-capacity van and delivering it stop by stop, with the truck's manifest
+# filed by location and with the list scans it replaced (a membership test on every load, and
+# every package on board checked at every stop).
+#
+# Usage: python benchmarks/truck_manifest.py [--packages 200 500 2000] [--stops 40] [--seed S]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from DistanceGraph import Location
+from Package import Package
+from Truck import Truck
+
+
+def make_packages(count, stops, rng):
+    """
+    Returns packages for random locations among a number of stops, and the stops.
+    """
+    locations = [Location("Stop {}".format(i), "{} Main St".format(i), "84100") for i in range(stops)]
+    packages = []
+    for package_id in range(1, count + 1):
+        package = Package(package_id, "", "Salt Lake City", "UT", "84100", "EOD", "5", "")
+        package.location = rng.choice(locations)
+        packages.append(package)
+    return packages, locations
+
+
+def run_manifest(packages, locations):
+    truck = Truck(1, capacity=len(packages))
+    for package in packages:
+        truck.load_package(package)
+    for location in locations:
+        truck.deliver_stop(location, 36000)
+    return truck.get_num_packages()
+
+
+def run_list_scan(packages, locations):
+    on_board = []
+    for package in packages:
+        if package not in on_board:
+            on_board.append(package)
+            package.load(1)
+    for location in locations:
+        for package in reversed(on_board):
+            if package.location is location:
+                package.deliver(36000)
+                on_board.remove(package)
+    return len(on_board)
+
+
+def timed(run, packages, locations):
+    for package in packages:
+        package.reset()
+    begin = time.perf_counter()
+    left = run(packages, locations)
+    return time.perf_counter() - begin, left
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the truck manifest on high-capacity vans.")
+    parser.add_argument("--packages", type=int, nargs="+", default=[200, 500, 2000])
+    parser.add_argument("--stops", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    for count in args.packages:
+        packages, locations = make_packages(count, args.stops, rng)
+        scan, scan_left = timed(run_list_scan, packages, locations)
+        manifest, manifest_left = timed(run_manifest, packages, locations)
+        print("{:6d} packages, {} stops: list scan {:8.4f}s  manifest {:8.4f}s  left on board: {} / {}".format(
+            count, args.stops, scan, manifest, scan_left, manifest_left))
+
+
+if __name__ == "__main__":
+    main()